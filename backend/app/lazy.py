@@ -0,0 +1,66 @@
+import importlib
+import threading
+
+import click
+
+
+def import_string(import_name):
+    module_name, attribute = import_name.split(':')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class LazyGroup(click.Group):
+    """Click group imported from import_name the first time it is listed or run.
+
+    on_load is called once after the import, e.g. to initialise the extension
+    the commands belong to.
+    """
+
+    def __init__(self, name, import_name, on_load=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.import_name = import_name
+        self.on_load = on_load
+        self._group = None
+
+    def _load(self):
+        if self._group is None:
+            self._group = import_string(self.import_name)
+            if self.on_load is not None:
+                self.on_load()
+        return self._group
+
+    def list_commands(self, ctx):
+        return self._load().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._load().get_command(ctx, name)
+
+
+class LazyBlueprints:
+    """WSGI wrapper that imports and registers blueprints on the first request.
+
+    CLI commands and workers that never serve a request skip importing the
+    route modules; call load() to register them up front (e.g. for
+    ``flask routes``).
+    """
+
+    def __init__(self, app, blueprints):
+        self.app = app
+        self.blueprints = blueprints
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            for import_name, url_prefix, options in self.blueprints:
+                self.app.register_blueprint(import_string(import_name), url_prefix=url_prefix, **options)
+            self._loaded = True
+
+    def __call__(self, environ, start_response):
+        if not self._loaded:
+            self.load()
+        return self._wsgi_app(environ, start_response)
@@ -0,0 +1,314 @@
+"""ASGI entry point: ``uvicorn asgi:app``.
+
+The hot read endpoints (book and sale listings, book search, purchases,
+single books) are served on SQLAlchemy's asyncio extension, so a request
+waiting on the database holds a coroutine rather than a worker thread. They
+run the same statements and row serializers as the Flask routes. The live
+event stream is served here too: an open stream is a coroutine waiting on
+the broker instead of one of the pool's threads. Every other request is
+handed to the Flask app on a bounded thread pool, so behaviour stays
+identical to the WSGI deployment.
+"""
+import asyncio
+import json
+import math
+import re
+from urllib.parse import parse_qs
+
+import jwt
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from app import create_app
+from models.models import Book, BookSale, Branch
+from routes.events import start_seq, stream_frames
+from routes.books import BOOK_COLUMNS, _book_row, book_filters, books_statement, search_statement
+from routes.purchases import PURCHASE_COLUMNS, _purchase_row, purchase_filters, purchases_statement
+from routes.sales import SALE_COLUMNS, _sale_row, filtered_sales_statement, sale_filters
+from services.compression import COMPRESSIBLE_MIMETYPES, _compress, brotli
+from services.concurrency import etag
+from services.events import broker
+from services.revocation import revocation_list
+from services.serialization import MSGPACK_MIMETYPE, columnar_payload, listing_format, msgpack
+
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(uri):
+    url = make_url(uri)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+class Request:
+    def __init__(self, scope, params):
+        self.scope = scope
+        self.params = params
+        self.args = {key: values[0] for key, values in parse_qs(scope['query_string'].decode()).items()}
+        self.headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        self.identity = None
+        self.claims = {}
+        self.branch_scoped = False
+        self.response_headers = []
+
+
+class AsyncAPI:
+    """Serves the hot read routes natively and delegates the rest to Flask."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+
+        uri = config['ASYNC_DATABASE_URI'] or async_database_uri(config['SQLALCHEMY_DATABASE_URI'])
+        # A fixed pool: connections scale with ASYNC_POOL_SIZE, not with waiting clients
+        self.engine = create_async_engine(uri, poolclass=AsyncAdaptedQueuePool, pool_size=config['ASYNC_POOL_SIZE'],
+                                          max_overflow=0, pool_pre_ping=True)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        self.wsgi = WSGIMiddleware(flask_app, workers=config['ASYNC_WSGI_WORKERS'])
+        # Endpoint names match the Flask views so rate limit costs apply to both
+        self.routes = [(re.compile(pattern), endpoint, handler) for pattern, endpoint, handler in (
+            (r'/api/books/?', 'books.get_books', self.get_books),
+            (r'/api/books/search', 'books.search_books', self.search_books),
+            (r'/api/books/(?P<book_id>\d+)', 'books.get_book', self.get_book),
+            (r'/api/sales/?', 'sales.get_sales', self.get_sales),
+            (r'/api/purchases/?', 'purchases.get_purchases', self.get_purchases),
+        )]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] == '/api/events/stream':
+            await self.stream_events(Request(scope, {}), receive, send)
+            return
+
+        handler = None
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, endpoint, route_handler in self.routes:
+                match = pattern.fullmatch(scope['path'])
+                if match:
+                    handler = route_handler
+                    break
+
+        if handler is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        request = Request(scope, match.groupdict())
+        status, body, content_type = (self._authenticate(request) or await self._rate_limit(request, endpoint)
+                                      or await handler(request) or (None, None, None))
+        if status is None:
+            # The handler declined (e.g. archive reads), let Flask serve it
+            await self.wsgi(scope, receive, send)
+            return
+
+        await self._respond(request, send, status, body, content_type)
+
+    def _cors_headers(self, request):
+        origin = request.headers.get('origin')
+        if origin not in self.flask_app.config['CORS_ORIGINS']:
+            return []
+        return [(b'access-control-allow-origin', origin.encode()),
+                (b'access-control-allow-credentials', b'true'),
+                (b'access-control-expose-headers', b'Retry-After, ETag'),
+                (b'vary', b'Origin')]
+
+    async def _respond(self, request, send, status, body, content_type):
+        headers = [(b'content-type', content_type.encode())] + request.response_headers
+        body = self._compress(request, body, content_type, headers)
+        headers.append((b'content-length', str(len(body)).encode()))
+        headers += self._cors_headers(request)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _authenticate(self, request):
+        # Same checks as @jwt_required() for access tokens in the Authorization header
+        config = self.flask_app.config
+        authorization = request.headers.get('authorization', '')
+        if not authorization.startswith('Bearer '):
+            return self._json({"msg": "Missing Authorization Header"}, 401)
+        try:
+            claims = jwt.decode(authorization[len('Bearer '):], config['JWT_SECRET_KEY'],
+                                algorithms=[config.get('JWT_ALGORITHM', 'HS256')])
+        except jwt.ExpiredSignatureError:
+            return self._json({"msg": "Token has expired"}, 401)
+        except jwt.InvalidTokenError as error:
+            return self._json({"msg": str(error)}, 422)
+        if claims.get('type') != 'access':
+            return self._json({"msg": "Only non-refresh tokens are allowed"}, 422)
+        with self.flask_app.app_context():
+            revoked = revocation_list.is_revoked(claims)
+        if revoked:
+            return self._json({"msg": "Token has been revoked"}, 401)
+        request.identity = claims['sub']
+        request.claims = claims
+        # Branch-scoped stock and sales are served by Flask (services.branches)
+        request.branch_scoped = claims.get('branch_id') is not None or 'x-branch-id' in request.headers
+        return None
+
+    async def _rate_limit(self, request, endpoint):
+        # Same buckets as services.ratelimit for the Flask views; a Redis round trip
+        # runs in a thread so it does not stall the event loop
+        config = self.flask_app.config
+        if not config['RATELIMIT_ENABLED']:
+            return None
+        burst = config['RATELIMIT_BURST']
+        cost = min(config['RATELIMIT_COSTS'].get(endpoint, 1), burst)
+        store = self.flask_app.extensions['ratelimit']
+        args = (f'user:{request.identity}:{endpoint}', cost, config['RATELIMIT_RATE'], burst)
+        allowed, retry_after = await asyncio.to_thread(store.take, *args) if store.blocking else store.take(*args)
+        if allowed:
+            return None
+        request.response_headers.append((b'retry-after', str(max(1, math.ceil(retry_after))).encode()))
+        return self._json({"message": "Too many requests, slow down"}, 429)
+
+    def _compress(self, request, body, content_type, headers):
+        # Same rules as services.compression for the Flask responses
+        config = self.flask_app.config
+        if not config['COMPRESS_ENABLED'] or content_type not in COMPRESSIBLE_MIMETYPES:
+            return body
+        headers.append((b'vary', b'Accept-Encoding'))
+        if len(body) < config['COMPRESS_MIN_SIZE']:
+            return body
+        accept = parse_accept_header(request.headers.get('accept-encoding'))
+        encoding = 'br' if brotli is not None and accept['br'] else 'gzip' if accept['gzip'] else None
+        if encoding is None:
+            return body
+        headers.append((b'content-encoding', encoding.encode()))
+        return _compress(body, encoding, config)
+
+    def _json(self, data, status=200):
+        return status, json.dumps(data).encode(), 'application/json'
+
+    def _listing(self, request, columns, rows):
+        accept = parse_accept_header(request.headers.get('accept'), MIMEAccept)
+        output_format = listing_format(request.args.get('format'), accept.best)
+        if output_format == 'json':
+            return self._json([dict(zip(columns, row)) for row in rows])
+        payload = columnar_payload(columns, rows)
+        if output_format == 'columnar':
+            return self._json(payload)
+        if msgpack is None:
+            return self._json({"message": "msgpack output is not available on this server"}, 406)
+        return 200, msgpack.packb(payload, use_bin_type=True), MSGPACK_MIMETYPE
+
+    async def _rows(self, statement, row_function):
+        async with self.sessions() as session:
+            result = await session.execute(statement)
+            return [row_function(row) for row in result]
+
+    async def get_books(self, request):
+        if request.branch_scoped:
+            return None
+        filters, error = book_filters(request.args)
+        if error:
+            return None  # Flask returns the matching 400 message
+        statement = books_statement(**filters)
+        return self._listing(request, BOOK_COLUMNS, await self._rows(statement, _book_row))
+
+    async def search_books(self, request):
+        if request.branch_scoped:
+            return None
+        search_term = request.args.get('q', '')
+        rows = await self._rows(search_statement(search_term), _book_row) if search_term else []
+        return self._listing(request, BOOK_COLUMNS, rows)
+
+    async def get_book(self, request):
+        if request.branch_scoped:
+            return None
+        statement = books_statement().where(Book.id == int(request.params['book_id']))
+        rows = await self._rows(statement, _book_row)
+        if not rows:
+            return self._json({"message": "Book not found"}, 404)
+        book = dict(zip(BOOK_COLUMNS, rows[0]))
+        request.response_headers.append((b'etag', etag(book['version']).encode()))
+        return self._json(book)
+
+    async def get_sales(self, request):
+        if request.branch_scoped or request.args.get('include_archive', '').lower() in ('1', 'true', 'yes'):
+            return None
+
+        filters, error = sale_filters(request.args)
+        if error:
+            return None  # Flask returns the matching 400 message
+
+        statement = filtered_sales_statement(BookSale, filters)
+        return self._listing(request, SALE_COLUMNS, await self._rows(statement, _sale_row))
+
+    async def get_purchases(self, request):
+        filters, error = purchase_filters(request.args)
+        if error:
+            return None
+        statement = purchases_statement(**filters)
+        return self._listing(request, PURCHASE_COLUMNS, await self._rows(statement, _purchase_row))
+
+    async def _stream_branch_id(self, request):
+        # Same resolution as services.branches: the token's branch, or X-Branch-Id for central staff
+        branch_id = request.claims.get('branch_id')
+        header = request.headers.get('x-branch-id')
+        if branch_id is not None or not header:
+            return branch_id, None
+        try:
+            branch_id = int(header)
+        except ValueError:
+            return None, self._json({"message": "Invalid X-Branch-Id header"}, 400)
+        async with self.sessions() as session:
+            if await session.get(Branch, branch_id) is None:
+                return None, self._json({"message": "Branch not found"}, 404)
+        return branch_id, None
+
+    async def stream_events(self, request, receive, send):
+        # routes/events.py as a coroutine: waiting for events holds no thread
+        error = self._authenticate(request) or await self._rate_limit(request, 'events.stream_events')
+        branch_id = None
+        if error is None:
+            branch_id, error = await self._stream_branch_id(request)
+        if error is not None:
+            await self._respond(request, send, *error)
+            return
+
+        headers = [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                   (b'x-accel-buffering', b'no')] + self._cors_headers(request)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+        heartbeat = self.flask_app.config['EVENTS_HEARTBEAT_INTERVAL']
+        current = start_seq(request.headers.get('last-event-id') or request.args.get('since'))
+        events, complete = broker.since(current)
+        disconnected = asyncio.ensure_future(self._disconnected(receive))
+        try:
+            while True:
+                frames, current = stream_frames(events, complete, current, branch_id)
+                await send({'type': 'http.response.body', 'body': frames.encode(), 'more_body': True})
+                waiting = asyncio.ensure_future(broker.wait_async(current, heartbeat))
+                await asyncio.wait({waiting, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    waiting.cancel()
+                    await asyncio.wait({waiting})  # Lets it unregister from the broker
+                    return
+                events, complete = waiting.result()
+        finally:
+            disconnected.cancel()
+
+    async def _disconnected(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+app = AsyncAPI(create_app())
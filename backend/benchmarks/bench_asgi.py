@@ -0,0 +1,138 @@
+"""Side-by-side load test of the WSGI and the async (asgi.py) serving modes.
+
+Both modes run in one uvicorn process each: "wsgi" is the Flask app on a
+thread pool of ASYNC_WSGI_WORKERS threads, "async" is asgi.app. Clients hit
+the same endpoints at increasing concurrency and the report shows throughput,
+latency and the server's thread count and memory.
+
+The gap only shows when the database is I/O bound, so point
+BENCH_DATABASE_URI at a MySQL server over the network; on the default local
+SQLite file both modes are CPU bound and this mostly measures overhead.
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.common import make_app, auth_headers, report
+
+CONCURRENCY = [1, 16, 64, 256]
+REQUESTS_PER_CLIENT = int(os.environ.get('BENCH_REQUESTS_PER_CLIENT', 10))
+
+
+def endpoints():
+    since = (datetime.utcnow() - timedelta(days=7)).isoformat()
+    return ['/api/books/1', f'/api/sales?start_date={since}', '/api/books/search?q=Title 1']
+
+
+def serve(mode, port):
+    import uvicorn
+
+    if mode == 'async':
+        from asgi import app as asgi_app
+    else:
+        from a2wsgi import WSGIMiddleware
+        flask_app = make_app(database_uri=os.environ['DATABASE_URI'])
+        asgi_app = WSGIMiddleware(flask_app, workers=flask_app.config['ASYNC_WSGI_WORKERS'])
+    uvicorn.run(asgi_app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_stats(pid):
+    # Linux only: (threads, resident MiB) of the server process
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            fields = dict(line.split(':', 1) for line in status)
+        return int(fields['Threads']), int(fields['VmRSS'].split()[0]) // 1024
+    except OSError:
+        return 0, 0
+
+
+async def load(base_url, url, headers, concurrency, pid):
+    latencies = []
+    errors = 0
+    peak_threads = peak_rss = 0
+
+    async def client(http):
+        nonlocal errors
+        for _ in range(REQUESTS_PER_CLIENT):
+            start = time.perf_counter()
+            response = await http.get(url, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    async def sample():
+        nonlocal peak_threads, peak_rss
+        while True:
+            threads, rss = process_stats(pid)
+            peak_threads, peak_rss = max(peak_threads, threads), max(peak_rss, rss)
+            await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as http:
+        sampler = asyncio.create_task(sample())
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        sampler.cancel()
+
+    latencies.sort()
+    return [
+        f'{len(latencies) / elapsed:.0f}',
+        f'{statistics.median(latencies) * 1000:.1f} ms',
+        f'{latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000:.1f} ms',
+        errors,
+        peak_threads,
+        f'{peak_rss} MiB'
+    ]
+
+
+def wait_until_listening(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def main():
+    # Seed once here, the servers reuse the same database through DATABASE_URI
+    app = make_app()
+    headers = auth_headers(app)
+
+    rows = []
+    for mode in ('wsgi', 'async'):
+        port = free_port()
+        server = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_asgi', '--serve', mode, str(port)])
+        try:
+            wait_until_listening(port)
+            for url in endpoints():
+                for concurrency in CONCURRENCY:
+                    stats = asyncio.run(load(f'http://127.0.0.1:{port}', url, headers, concurrency, server.pid))
+                    rows.append([mode, url.split('?')[0], concurrency] + stats)
+        finally:
+            server.terminate()
+            server.wait()
+
+    report(rows, ['mode', 'endpoint', 'clients', 'req/s', 'p50', 'p99', 'errors', 'threads', 'rss'])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--serve':
+        serve(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,38 @@
+"""Payload size and server time of the large listings with and without compression.
+
+Transfer time is estimated for a slow branch link (BENCH_LINK_KBPS, default 2000 kbit/s).
+"""
+import os
+
+from benchmarks.common import make_app, auth_headers, timed, report
+from services import compression
+
+ENDPOINTS = ['/api/books', '/api/sales', '/api/finance/transactions']
+
+
+def main():
+    app = make_app()
+    headers = auth_headers(app)
+    client = app.test_client()
+    link_bytes_per_second = int(os.environ.get('BENCH_LINK_KBPS', 2000)) * 1000 / 8
+
+    encodings = ['identity', 'gzip'] + (['br'] if compression.brotli is not None else [])
+    rows = []
+    for url in ENDPOINTS:
+        for encoding in encodings:
+            request_headers = dict(headers, **{'Accept-Encoding': encoding})
+            seconds, response = timed(lambda: client.get(url, headers=request_headers), repeat=5)
+            size = len(response.get_data())
+            rows.append([
+                url,
+                encoding,
+                f'{size / 1024:.1f} KiB',
+                f'{seconds * 1000:.1f} ms',
+                f'{(seconds + size / link_bytes_per_second) * 1000:.0f} ms'
+            ])
+
+    report(rows, ['endpoint', 'encoding', 'payload', 'server', 'server + transfer'])
+
+
+if __name__ == '__main__':
+    main()
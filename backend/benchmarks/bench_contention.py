@@ -0,0 +1,107 @@
+"""Throughput of concurrent edits to one hot book: version column vs SELECT ... FOR UPDATE.
+
+Each worker thread repeatedly reads the book, spends BENCH_THINK_MS "in the
+view" and writes stock_quantity - 1, the way create_sale does:
+
+  unguarded    plain read-modify-write (what the views did before the version
+               column; shown with it disabled, it loses updates)
+  optimistic   version_id_col check at flush, rollback and retry on conflict
+  for update   the row is locked from the read until the commit
+
+Point BENCH_DATABASE_URI at MySQL for meaningful numbers: SQLite has no row
+locks (FOR UPDATE is not emitted) and serializes every writer on the file.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.orm.exc import StaleDataError
+
+from benchmarks.common import make_app, report
+from models.models import db, Book
+
+THREADS = int(os.environ.get('BENCH_THREADS', 8))
+EDITS = int(os.environ.get('BENCH_EDITS', 50))
+THINK_SECONDS = float(os.environ.get('BENCH_THINK_MS', 1)) / 1000
+
+
+def unguarded(book_id):
+    # Same statements as a view without the version check
+    quantity = db.session.execute(select(Book.stock_quantity).where(Book.id == book_id)).scalar_one()
+    time.sleep(THINK_SECONDS)
+    db.session.execute(update(Book).where(Book.id == book_id).values(stock_quantity=quantity - 1)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    return 0
+
+
+def optimistic(book_id):
+    retries = 0
+    while True:
+        try:
+            book = db.session.get(Book, book_id, populate_existing=True)
+            time.sleep(THINK_SECONDS)
+            book.stock_quantity -= 1
+            db.session.commit()
+            return retries
+        except StaleDataError:
+            db.session.rollback()
+            retries += 1
+
+
+def for_update(book_id):
+    book = db.session.execute(select(Book).where(Book.id == book_id).with_for_update()
+                              .execution_options(populate_existing=True)).scalar_one()
+    time.sleep(THINK_SECONDS)
+    book.stock_quantity -= 1
+    db.session.commit()
+    return 0
+
+
+def run(app, edit, book_id):
+    retries = []
+    errors = []
+
+    def worker():
+        with app.app_context():
+            try:
+                retries.append(sum(edit(book_id) for _ in range(EDITS)))
+            except Exception as error:  # e.g. lock wait timeouts
+                errors.append(error)
+                db.session.rollback()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sum(retries), errors
+
+
+def main():
+    app = make_app(books=10, sales=1)
+    start_stock = THREADS * EDITS * 10
+    rows = []
+    for name, edit in (('unguarded', unguarded), ('optimistic', optimistic), ('for update', for_update)):
+        with app.app_context():
+            book_id = db.session.execute(select(Book.id).order_by(Book.id)).scalars().first()
+            db.session.execute(update(Book).where(Book.id == book_id).values(stock_quantity=start_stock, version=1)
+                               .execution_options(synchronize_session=False))
+            db.session.commit()
+
+        seconds, retries, errors = run(app, edit, book_id)
+
+        with app.app_context():
+            final_stock = db.session.execute(select(Book.stock_quantity).where(Book.id == book_id)).scalar_one()
+            dialect = db.engine.dialect.name
+        edits = THREADS * EDITS
+        rows.append([name, f'{edits / seconds:.0f}/s', retries, start_stock - final_stock, edits, len(errors)])
+
+    print(f'{dialect}: {THREADS} threads x {EDITS} edits, {THINK_SECONDS * 1000:g} ms in each edit')
+    report(rows, ['strategy', 'throughput', 'retries', 'applied', 'expected', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
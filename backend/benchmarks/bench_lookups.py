@@ -0,0 +1,59 @@
+"""Per-call cost of the hot single-row lookups: legacy Query API vs models.lookups.
+
+cold  each call starts from an empty identity map, so every variant runs its SQL
+warm  the object is already held by the session (a request that looked it up
+      before); the by-id lookups answer from the identity map, the by-key
+      lookups still query
+"""
+import os
+import timeit
+
+from benchmarks.common import make_app, report
+from models import lookups
+from models.models import db, Book, BookPurchase, User
+
+CALLS = int(os.environ.get('BENCH_CALLS', 3000))
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        book = Book.query.order_by(Book.id.desc()).first()
+        purchase_id = db.session.query(BookPurchase.id).limit(1).scalar()
+        book_id, isbn = book.id, book.isbn
+
+        cases = [
+            ('book by id', lambda: Book.query.get(book_id), lambda: lookups.get_book(book_id)),
+            ('book by isbn', lambda: Book.query.filter_by(isbn=isbn).first(), lambda: lookups.get_book_by_isbn(isbn)),
+            ('user by id', lambda: User.query.get(1), lambda: lookups.get_user(1)),
+            ('user by username', lambda: User.query.filter_by(username='admin').first(),
+             lambda: lookups.get_user_by_username('admin')),
+        ]
+        if purchase_id is not None:
+            cases.append(('purchase by id', lambda: BookPurchase.query.get(purchase_id),
+                          lambda: lookups.get_purchase(purchase_id)))
+
+        rows = []
+        for name, legacy, prebuilt in cases:
+            row = [name]
+            for warm in (False, True):
+                timings = []
+                for fn in (legacy, prebuilt):
+                    def call(fn=fn, warm=warm):
+                        if not warm:
+                            db.session.expunge_all()
+                        return fn()
+                    # Warms the compiled cache; the identity map only keeps
+                    # instances something still references
+                    held = call()  # noqa: F841
+                    timings.append(timeit.timeit(call, number=CALLS) / CALLS)
+                row += [f'{timings[0] * 1e6:.0f} us', f'{timings[1] * 1e6:.0f} us',
+                        f'{timings[0] / timings[1]:.2f}x']
+            rows.append(row)
+
+    report(rows, ['lookup', 'cold Query API', 'cold lookups', 'speedup',
+                 'warm Query API', 'warm lookups', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
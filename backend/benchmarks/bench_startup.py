@@ -0,0 +1,70 @@
+"""Startup profile: where cold-start time goes and what each entry point costs.
+
+Prints the slowest imports of ``create_app()`` (from ``python -X importtime``)
+and wall times, each in a fresh interpreter, for creating the app, serving the
+first request (which registers the blueprints) and running a CLI command.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import report
+
+TOP_IMPORTS = int(os.environ.get('BENCH_TOP_IMPORTS', 15))
+REPEAT = int(os.environ.get('BENCH_REPEAT', 5))
+
+SCENARIOS = [
+    ('create_app()', [sys.executable, '-c', 'from app import create_app; create_app()']),
+    ('create_app() + first request', [sys.executable, '-c',
+                                      'from app import create_app; create_app().test_client().get("/api/books")']),
+    ('flask reorder --help', [sys.executable, '-m', 'flask', '--app', 'app:create_app()', 'reorder', '--help']),
+    ('flask db --help', [sys.executable, '-m', 'flask', '--app', 'app:create_app()', 'db', '--help']),
+]
+
+
+def import_profile(env):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+                            env=env, capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        depth = (len(fields[2]) - len(fields[2].lstrip()) - 1) // 2
+        imports.append((int(fields[1]), int(fields[0]), depth, fields[2].strip()))
+    return imports
+
+
+def wall_time(command, env):
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, capture_output=True, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URI', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-'), 'startup.db')}")
+
+    # Only top-level imports of the app (depth <= 1) so nested modules are not counted twice
+    imports = sorted((entry for entry in import_profile(env) if entry[2] <= 1), reverse=True)
+    report([[name, f'{cumulative / 1000:.1f} ms', f'{own / 1000:.1f} ms']
+            for cumulative, own, _, name in imports[:TOP_IMPORTS]],
+           ['module', 'cumulative', 'self'])
+    print()
+
+    baseline = wall_time([sys.executable, '-c', 'pass'], env)
+    rows = []
+    for name, command in SCENARIOS:
+        seconds = wall_time(command, env)
+        rows.append([name, f'{seconds * 1000:.0f} ms', f'{(seconds - baseline) * 1000:.0f} ms'])
+    report(rows, ['scenario', 'wall', 'over bare interpreter'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Shared setup for the benchmark scripts.
+
+Run them from the backend directory, e.g. ``python -m benchmarks.bench_compression``.
+Unless DATABASE_URI is set they use a throwaway SQLite file seeded with
+synthetic books and sales.
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def make_app(books=2000, sales=5000, database_uri=None):
+    if database_uri is None:
+        database_uri = os.environ.get('BENCH_DATABASE_URI')
+    if database_uri is None:
+        path = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.db')
+        database_uri = f'sqlite:///{path}'
+    os.environ['DATABASE_URI'] = database_uri
+    # Benchmarks hammer single endpoints on purpose
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+
+    from app import create_app
+    from models.models import db, Book, BookSale, FinancialTransaction, TransactionType, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        app.create_super_admin()
+        admin = User.query.filter_by(username='admin').first()
+
+        if Book.query.count() < books:
+            rng = random.Random(42)
+            now = datetime.utcnow()
+            db.session.execute(db.insert(Book), [{
+                "isbn": f"978-{i:010d}",
+                "title": f"Benchmark Title {i}",
+                "author": f"Author {i % 300}",
+                "publisher": f"Publisher {i % 40}",
+                "retail_price": round(rng.uniform(5, 90), 2),
+                "stock_quantity": rng.randint(0, 200),
+                "created_at": now,
+                "updated_at": now
+            } for i in range(books)])
+            book_ids = [book_id for (book_id,) in db.session.query(Book.id)]
+
+            sale_rows = []
+            transaction_rows = []
+            for i in range(sales):
+                quantity = rng.randint(1, 3)
+                unit_price = round(rng.uniform(5, 90), 2)
+                created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+                sale_rows.append({
+                    "book_id": rng.choice(book_ids),
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "total_price": quantity * unit_price,
+                    "user_id": admin.id,
+                    "created_at": created_at
+                })
+                transaction_rows.append({
+                    "transaction_type": TransactionType.INCOME,
+                    "description": f"Book sale: {quantity} copies",
+                    "amount": quantity * unit_price,
+                    "user_id": admin.id,
+                    "created_at": created_at
+                })
+            db.session.execute(db.insert(BookSale), sale_rows)
+            db.session.execute(db.insert(FinancialTransaction), transaction_rows)
+            db.session.commit()
+
+    return app
+
+
+def auth_headers(app):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def timed(fn, repeat=20):
+    """Run fn repeat times and return (median seconds, last result)."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def report(rows, headers):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    print('  '.join(str(header).ljust(width) for header, width in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(str(value).ljust(width) for value, width in zip(row, widths)))
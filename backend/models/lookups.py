@@ -0,0 +1,60 @@
+"""Hot primary-key and unique-key lookups as prebuilt statements.
+
+Building a legacy Query per call and generating its cache key is most of the
+Python overhead of a single-row lookup. These select() constructs are built
+once at import; their cache key is memoized on the statement object and the
+compiled SQL comes from the engine's compiled cache, so each call only binds
+the parameter and runs the query.
+
+Primary-key lookups first check the session's identity map: an object this
+request already holds (the current user, a book loaded by an earlier lookup)
+comes back without SQL, the way Session.get would, while a miss still takes
+the cheaper prebuilt statement rather than Session.get's own load path.
+"""
+from sqlalchemy import select, bindparam, or_
+from sqlalchemy.orm.util import identity_key
+from models.models import db, Book, BookPurchase, User
+
+_BOOK_BY_ID = select(Book).where(Book.id == bindparam('id'))
+_BOOK_BY_ISBN = select(Book).where(Book.isbn == bindparam('isbn'))
+_BOOKS_BY_ISBN = select(Book).where(or_(Book.isbn_key.in_(bindparam('keys', expanding=True)),
+                                         Book.isbn.in_(bindparam('isbns', expanding=True))))
+_USER_BY_ID = select(User).where(User.id == bindparam('id'))
+_USER_BY_USERNAME = select(User).where(User.username == bindparam('username'))
+_PURCHASE_BY_ID = select(BookPurchase).where(BookPurchase.id == bindparam('id'))
+
+
+def _get(model, statement, primary_key):
+    if isinstance(primary_key, str) and primary_key.isdigit():
+        primary_key = int(primary_key)  # JWT identities are strings
+    if isinstance(primary_key, int) and db.session.identity_map.get(identity_key(model, primary_key)) is not None:
+        # Session.get also handles an expired or deleted instance
+        return db.session.get(model, primary_key)
+    return db.session.execute(statement, {'id': primary_key}).scalar_one_or_none()
+
+
+def get_book(book_id):
+    return _get(Book, _BOOK_BY_ID, book_id)
+
+
+def get_book_by_isbn(isbn):
+    return db.session.execute(_BOOK_BY_ISBN, {'isbn': isbn}).scalar_one_or_none()
+
+
+def get_books_by_isbn(isbns, keys=()):
+    """Books whose isbn is one of isbns or whose isbn_key is one of keys."""
+    if not isbns and not keys:
+        return []
+    return db.session.execute(_BOOKS_BY_ISBN, {'isbns': list(isbns), 'keys': list(keys)}).scalars().all()
+
+
+def get_user(user_id):
+    return _get(User, _USER_BY_ID, user_id)
+
+
+def get_user_by_username(username):
+    return db.session.execute(_USER_BY_USERNAME, {'username': username}).scalar_one_or_none()
+
+
+def get_purchase(purchase_id):
+    return _get(BookPurchase, _PURCHASE_BY_ID, purchase_id)
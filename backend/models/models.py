@@ -2,8 +2,17 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from passlib.hash import pbkdf2_sha256
 import enum
+from models.routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+class Branch(db.Model):
+    __tablename__ = 'branches'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class UserRole(enum.Enum):
     SUPER_ADMIN = "super_admin"
@@ -20,6 +29,8 @@ class User(db.Model):
     gender = db.Column(db.String(10), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     role = db.Column(db.Enum(UserRole), default=UserRole.ADMIN, nullable=False)
+    # Staff of a branch only see and move that branch's stock; None is central staff
+    branch_id = db.Column(db.Integer, db.ForeignKey('branches.id'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -37,6 +48,8 @@ class Book(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     isbn = db.Column(db.String(20), unique=True, nullable=False)
+    # The ISBN as compact ISBN-13 for lookups in any spelling, set on flush by services/isbn.py
+    isbn_key = db.Column(db.String(20), index=True)
     title = db.Column(db.String(200), nullable=False)
     author = db.Column(db.String(100), nullable=False)
     publisher = db.Column(db.String(100), nullable=False)
@@ -44,6 +57,33 @@ class Book(db.Model):
     stock_quantity = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Optimistic concurrency: every ORM UPDATE checks and bumps it (see services/concurrency.py).
+    # Central stock and the sales counters change through Core UPDATEs and leave it alone
+    version = db.Column(db.Integer, default=1, nullable=False)
+    # Sales counters kept by services/sales_counters.py for popularity sorting
+    units_sold = db.Column(db.Integer, default=0, nullable=False)
+    revenue = db.Column(db.Float, default=0, nullable=False)
+    last_sold_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_books_units_sold_id', 'units_sold', 'id'),
+        # Low-stock reads (services/reorder.py) only look at books under the highest reorder point
+        db.Index('ix_books_stock_quantity', 'stock_quantity'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+
+# Stock held by a branch. Book.stock_quantity is the central (unassigned) stock;
+# branch sales only touch their own row here, never the shared book row.
+class BranchStock(db.Model):
+    __tablename__ = 'branch_stock'
+    
+    branch_id = db.Column(db.Integer, db.ForeignKey('branches.id'), primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id'), primary_key=True, index=True)
+    stock_quantity = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, default=1, nullable=False)  # See Book.version
+    
+    __mapper_args__ = {'version_id_col': version}
 
 class PurchaseStatus(enum.Enum):
     PENDING = "pending"
@@ -53,9 +93,14 @@ class PurchaseStatus(enum.Enum):
 
 class BookPurchase(db.Model):
     __tablename__ = 'book_purchases'
+    __table_args__ = (
+        # Listing filters (see routes/purchases.py purchase_filters)
+        db.Index('ix_book_purchases_status_created_at', 'status', 'created_at'),
+        db.Index('ix_book_purchases_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    isbn = db.Column(db.String(20), nullable=False)
+    isbn = db.Column(db.String(20), nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False)
     author = db.Column(db.String(100), nullable=False)
     publisher = db.Column(db.String(100), nullable=False)
@@ -65,8 +110,11 @@ class BookPurchase(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, default=1, nullable=False)  # See Book.version
     
     user = db.relationship('User', backref=db.backref('purchases', lazy=True))
+    
+    __mapper_args__ = {'version_id_col': version}
 
 class TransactionType(enum.Enum):
     INCOME = "income"  # Book sale
@@ -74,18 +122,33 @@ class TransactionType(enum.Enum):
 
 class FinancialTransaction(db.Model):
     __tablename__ = 'financial_transactions'
+    __table_args__ = (
+        db.Index('ix_financial_transactions_branch_id_created_at', 'branch_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
     description = db.Column(db.String(255), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # No foreign key: a branch's ledger may live on its own database (see models/routing.py)
+    branch_id = db.Column(db.Integer)  # None for central transactions
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     user = db.relationship('User', backref=db.backref('transactions', lazy=True))
 
 class BookSale(db.Model):
     __tablename__ = 'book_sales'
+    __table_args__ = (
+        # Covering index for period aggregations (analytics) without touching the table rows
+        db.Index('ix_book_sales_created_at_book_id', 'created_at', 'book_id', 'quantity', 'total_price'),
+        db.Index('ix_book_sales_branch_id_created_at', 'branch_id', 'created_at'),
+        # Listing filters: a clerk's sales of the day, one title's sales (see routes/sales.py sale_filters)
+        db.Index('ix_book_sales_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_book_sales_book_id_created_at', 'book_id', 'created_at'),
+        # Offline tills resend queued sales; one row per (client sale, book) makes replays no-ops
+        db.UniqueConstraint('client_id', 'book_id', name='uq_book_sales_client_id_book_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
@@ -93,7 +156,134 @@ class BookSale(db.Model):
     unit_price = db.Column(db.Float, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # No foreign key: a branch's sales may live on its own database (see models/routing.py)
+    branch_id = db.Column(db.Integer)  # None for central sales
+    client_id = db.Column(db.String(64))  # Id generated by the till, None for older sales
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     book = db.relationship('Book', backref=db.backref('sales', lazy=True))
-    user = db.relationship('User', backref=db.backref('sales', lazy=True)) 
\ No newline at end of file
+    user = db.relationship('User', backref=db.backref('sales', lazy=True)) 
+
+# Archive tables hold rows moved out of book_sales / financial_transactions by the
+# archival job (see services/archive.py). Ids are kept, foreign keys are not.
+class BookSaleArchive(db.Model):
+    __tablename__ = 'book_sales_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    book_id = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)
+    total_price = db.Column(db.Float, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    branch_id = db.Column(db.Integer)
+    # Kept so a till replaying a sale archived in the meantime still finds it
+    client_id = db.Column(db.String(64), index=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class FinancialTransactionArchive(db.Model):
+    __tablename__ = 'financial_transactions_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
+    description = db.Column(db.String(255), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    branch_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class AuditLog(db.Model):
+    __tablename__ = 'audit_logs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: entries must outlive deleted users
+    user_id = db.Column(db.Integer, index=True)
+    action = db.Column(db.String(10), nullable=False)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer)
+    changes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_audit_logs_entity_entity_id', 'entity', 'entity_id'),
+    )
+
+# End-of-day (Z) reports frozen by services/daily_reports.py. Rows are written once
+# per closed day and scope and never updated.
+class DailyReport(db.Model):
+    __tablename__ = 'daily_reports'
+    __table_args__ = (
+        db.UniqueConstraint('business_date', 'branch_id', name='uq_daily_reports_business_date_branch_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    business_date = db.Column(db.Date, nullable=False)  # UTC day, like every created_at
+    # 0 for the unscoped (central) report over all rows on the primary database
+    branch_id = db.Column(db.Integer, nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False)
+    units_sold = db.Column(db.Integer, nullable=False)
+    income = db.Column(db.Float, nullable=False)
+    expense = db.Column(db.Float, nullable=False)
+    clerks = db.Column(db.Text, nullable=False)  # JSON list of per-clerk sales totals
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# Revoked access tokens (see services/revocation.py): one row per logged out token,
+# or with jti None, every token of user_id issued up to revoked_at
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True)
+    user_id = db.Column(db.Integer)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Once past, every token the row covers has expired and it can be purged
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+# Idempotency-Key reservations and their recorded responses (see services/idempotency.py),
+# shared by every worker. status None while the first request is still running.
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    key_hash = db.Column(db.String(64), primary_key=True)  # sha256 of (user, endpoint, path, key)
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 of the request body
+    status = db.Column(db.Integer)
+    body = db.Column(db.LargeBinary(length=2 ** 24))
+    mimetype = db.Column(db.String(100))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+# Cost layers for inventory valuation (see services/costing.py). Each receipt into
+# stock opens a layer; sales consume the oldest layers first (FIFO). No foreign keys
+# so valuation history survives deleted books and archived sales.
+class InventoryCostLayer(db.Model):
+    __tablename__ = 'inventory_cost_layers'
+    __table_args__ = (
+        db.Index('ix_inventory_cost_layers_book_id_received_at', 'book_id', 'received_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, nullable=False)
+    purchase_id = db.Column(db.Integer)  # None for opening layers
+    quantity = db.Column(db.Integer, nullable=False)
+    remaining = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False)
+    # Moving weighted-average unit cost of the book's stock after this receipt
+    average_cost = db.Column(db.Float, nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class CostLayerConsumption(db.Model):
+    __tablename__ = 'cost_layer_consumptions'
+    __table_args__ = (
+        db.Index('ix_cost_layer_consumptions_consumed_at_book_id', 'consumed_at', 'book_id'),
+        db.Index('ix_cost_layer_consumptions_branch_id_sale_id', 'branch_id', 'sale_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    layer_id = db.Column(db.Integer, index=True)  # None when the sale exceeded the costed stock
+    # Sale ids are only unique per database: (branch_id, sale_id) names the sale,
+    # branch_id None for sales on the primary
+    sale_id = db.Column(db.Integer)
+    branch_id = db.Column(db.Integer)
+    book_id = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False)  # FIFO cost of the consumed layer
+    average_cost = db.Column(db.Float, nullable=False)  # Weighted-average cost at the time of sale
+    consumed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,147 @@
+import threading
+import time
+
+from flask import g, has_app_context, has_request_context, request, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.sql.util import find_tables
+
+REPLICA_BIND = 'replica'
+STICKY_COOKIE = 'read_primary_until'
+
+# Tables whose rows belong to one branch and move to the branch's own database
+# when it has one. Statements that also touch shared tables (books, users, ...)
+# stay on the primary, so cross-branch reports only see the primary's rows.
+#
+# A sale of a sharded branch therefore commits on two databases: the sale and
+# its ledger row on the branch's, the branch stock, cost layer consumptions and
+# sales counters on the primary. SQLAlchemy commits them one after the other,
+# so a failure between the two commits leaves the primary's half applied.
+# Set BRANCH_TWOPHASE_COMMIT on servers that support XA / prepared transactions
+# (MySQL, PostgreSQL) to prepare both before committing either.
+BRANCH_TABLES = frozenset(['book_sales', 'financial_transactions'])
+
+
+def branch_bind(branch_id):
+    return f'branch_{branch_id}'
+
+
+def parse_branch_uris(value):
+    """Parse 'branch_id=uri,...' into {branch_id: uri}."""
+    uris = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        branch_id, _, uri = item.partition('=')
+        uris[int(branch_id)] = uri.strip()
+    return uris
+
+
+class ReplicaLagMonitor:
+    """Measures replication lag at most once per REPLICA_LAG_CHECK_INTERVAL seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lag = None
+        self._checked_at = None
+
+    def _measure(self, engine):
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name != 'mysql':
+                    # No replication status to read (e.g. a local SQLite copy), assume it is current
+                    connection.execute(text('SELECT 1'))
+                    return 0
+                try:
+                    row = connection.execute(text('SHOW REPLICA STATUS')).mappings().first()
+                except Exception:
+                    row = connection.execute(text('SHOW SLAVE STATUS')).mappings().first()
+                if row is None:
+                    return 0  # Not a replica, nothing to lag behind
+                lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+                return float('inf') if lag is None else float(lag)
+        except Exception:
+            current_app.logger.warning('Replica lag check failed, routing reads to primary', exc_info=True)
+            return float('inf')
+
+    def lag(self, engine):
+        interval = current_app.config['REPLICA_LAG_CHECK_INTERVAL']
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < interval:
+                return self._lag
+            # Claim the check so concurrent requests keep using the previous value
+            self._checked_at = time.monotonic()
+        lag = self._measure(engine)
+        with self._lock:
+            self._lag = lag
+        return lag
+
+
+lag_monitor = ReplicaLagMonitor()
+
+
+def _should_use_replica(engines):
+    config = current_app.config
+    if REPLICA_BIND not in engines:
+        return False
+    if request.method not in ('GET', 'HEAD') or request.blueprint not in config['REPLICA_READ_BLUEPRINTS']:
+        return False
+
+    # Read-your-writes: the client wrote recently, keep it on the primary
+    try:
+        if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+            return False
+    except ValueError:
+        pass
+
+    lag = lag_monitor.lag(engines[REPLICA_BIND])
+    return lag is not None and lag <= config['REPLICA_MAX_LAG_SECONDS']
+
+
+def _branch_engine(engines, mapper, clause):
+    # g.branch_bind is set by services.branches for requests acting for a sharded branch
+    bind_key = g.get('branch_bind')
+    if bind_key is None:
+        return None
+    if clause is not None:
+        tables = find_tables(clause, include_crud=True, include_joins=True)
+    elif mapper is not None:
+        tables = mapper.tables
+    else:
+        return None
+    if tables and all(table.name in BRANCH_TABLES for table in tables):
+        return engines[bind_key]
+    return None
+
+
+class RoutingSession(Session):
+    """Session that sends a sharded branch's rows to its bind and reads from
+    whitelisted GET endpoints to the replica bind."""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        # Read at commit time by SQLAlchemy: prepare every bind, then commit them
+        self.twophase = has_app_context() and current_app.config.get('BRANCH_TWOPHASE_COMMIT', False)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            engine = _branch_engine(self._db.engines, mapper, clause)
+            if engine is not None:
+                return engine
+        if bind is None and not self._flushing and has_request_context():
+            use_replica = g.get('_use_replica')
+            if use_replica is None:
+                use_replica = g._use_replica = _should_use_replica(self._db.engines)
+            if use_replica:
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def init_app(app):
+    @app.after_request
+    def pin_to_primary_after_write(response):
+        if (REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {})
+                and request.method in ('POST', 'PUT', 'DELETE')
+                and response.status_code < 400):
+            sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(STICKY_COOKIE, str(time.time() + sticky_seconds),
+                                max_age=sticky_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,216 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from sqlalchemy import select, func
+from models.models import db, Book, BookSale, BookPurchase, BranchStock, PurchaseStatus
+from services import branches, listing
+from services.cache import TTLCache
+from services.compression import mark_cacheable
+from datetime import datetime, timedelta
+
+analytics_bp = Blueprint('analytics', __name__)
+
+# Results are cached per endpoint, branch and requested period
+_cache = TTLCache(maxsize=512)
+
+def _parse_period(default_days=None):
+    start_datetime, error = listing.parse_datetime(request.args, 'start_date')
+    if error:
+        return None, None, (jsonify({"message": error}), 400)
+    end_datetime, error = listing.parse_datetime(request.args, 'end_date')
+    if error:
+        return None, None, (jsonify({"message": error}), 400)
+
+    if start_datetime is None and default_days:
+        start_datetime = (end_datetime or datetime.utcnow()) - timedelta(days=default_days)
+
+    return start_datetime, end_datetime, None
+
+def _int_arg(name, default, maximum):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        value = default
+    return max(1, min(value, maximum))
+
+def _sales_totals(start_datetime, end_datetime, branch_id):
+    # Grouped on book_sales alone, so a sharded branch's totals are read from its own
+    # database (models/routing.py); book details are looked up by id afterwards
+    statement = select(
+        BookSale.book_id,
+        func.count(BookSale.id).label('sales_count'),
+        func.sum(BookSale.quantity).label('units'),
+        func.sum(BookSale.total_price).label('revenue')
+    )
+    if branch_id is not None:
+        statement = statement.where(BookSale.branch_id == branch_id)
+    if start_datetime:
+        statement = statement.where(BookSale.created_at >= start_datetime)
+    if end_datetime:
+        statement = statement.where(BookSale.created_at <= end_datetime)
+    return statement.group_by(BookSale.book_id)
+
+def _books(book_ids, *columns):
+    # {book_id: row} of the books still in the catalog
+    if not book_ids:
+        return {}
+    statement = select(Book.id, *columns).where(Book.id.in_(list(book_ids)))
+    return {row.id: row for row in db.session.execute(statement)}
+
+def _cached(name, compute):
+    mark_cacheable()
+    key = (name, branches.current_branch_id(), tuple(sorted(request.args.items())))
+    return _cache.get_or_set(key, compute, current_app.config['ANALYTICS_CACHE_TTL'])
+
+@analytics_bp.route('/top-books', methods=['GET'])
+@jwt_required()
+def get_top_books():
+    start_datetime, end_datetime, error = _parse_period()
+    if error:
+        return error
+
+    limit = _int_arg('limit', 10, 100)
+    sort = request.args.get('sort', 'units')
+    if sort not in ('units', 'revenue'):
+        return jsonify({"message": "Invalid sort. Use 'units' or 'revenue'"}), 400
+
+    branch_id = branches.current_branch_id()
+
+    def compute():
+        statement = _sales_totals(start_datetime, end_datetime, branch_id)
+        rows = db.session.execute(statement.order_by(statement.selected_columns[sort].desc()).limit(limit)).all()
+        books = _books([row.book_id for row in rows], Book.isbn, Book.title, Book.author)
+
+        return [{
+            "book_id": row.book_id,
+            "isbn": books[row.book_id].isbn,
+            "title": books[row.book_id].title,
+            "author": books[row.book_id].author,
+            "sales_count": row.sales_count,
+            "units": int(row.units or 0),
+            "revenue": float(row.revenue or 0)
+        } for row in rows if row.book_id in books]
+
+    return jsonify(_cached('top-books', compute)), 200
+
+@analytics_bp.route('/sales-velocity', methods=['GET'])
+@jwt_required()
+def get_sales_velocity():
+    days = _int_arg('days', 30, 3650)
+    start_datetime, end_datetime, error = _parse_period(default_days=days)
+    if error:
+        return error
+
+    book_id = request.args.get('book_id', type=int)
+    limit = _int_arg('limit', 50, 1000)
+    branch_id = branches.current_branch_id()
+
+    def compute():
+        period_end = end_datetime or datetime.utcnow()
+        period_days = max((period_end - start_datetime).total_seconds() / 86400, 1)
+
+        statement = _sales_totals(start_datetime, end_datetime, branch_id)
+        if book_id:
+            statement = statement.where(BookSale.book_id == book_id)
+        rows = db.session.execute(statement.order_by(statement.selected_columns.units.desc()).limit(limit)).all()
+        books = _books([row.book_id for row in rows], Book.isbn, Book.title, Book.stock_quantity)
+        stock = {book_id: book.stock_quantity for book_id, book in books.items()}
+        if branch_id is not None:
+            # A branch sells from its own stock, a book it never received has none
+            stock = dict(db.session.execute(
+                select(BranchStock.book_id, BranchStock.stock_quantity)
+                .where(BranchStock.branch_id == branch_id, BranchStock.book_id.in_(list(books)))
+            ).all()) if books else {}
+
+        velocity_list = []
+        for row in rows:
+            book = books.get(row.book_id)
+            if book is None:
+                continue
+            units = int(row.units or 0)
+            units_per_day = units / period_days
+            stock_quantity = stock.get(row.book_id, 0)
+            velocity_list.append({
+                "book_id": row.book_id,
+                "isbn": book.isbn,
+                "title": book.title,
+                "units": units,
+                "units_per_day": round(units_per_day, 4),
+                "stock_quantity": stock_quantity,
+                "days_of_cover": round(stock_quantity / units_per_day, 1) if units_per_day else None
+            })
+        return velocity_list
+
+    return jsonify(_cached('sales-velocity', compute)), 200
+
+@analytics_bp.route('/margin', methods=['GET'])
+@jwt_required()
+def get_margin():
+    start_datetime, end_datetime, error = _parse_period()
+    if error:
+        return error
+
+    limit = _int_arg('limit', 100, 1000)
+    branch_id = branches.current_branch_id()
+
+    def compute():
+        # Every book sold in the period: the totals cover all of them, items only the top `limit`
+        statement = _sales_totals(start_datetime, end_datetime, branch_id)
+        rows = db.session.execute(statement.order_by(statement.selected_columns.revenue.desc())).all()
+        books = _books([row.book_id for row in rows], Book.isbn, Book.title)
+
+        # Landed cost per ISBN is the quantity-weighted average of purchases received into stock
+        costs = dict(db.session.execute(
+            select(
+                BookPurchase.isbn,
+                func.sum(BookPurchase.purchase_price * BookPurchase.quantity) / func.sum(BookPurchase.quantity)
+            ).where(
+                BookPurchase.status == PurchaseStatus.ADDED_TO_INVENTORY,
+                BookPurchase.isbn.in_([book.isbn for book in books.values()])
+            ).group_by(BookPurchase.isbn)
+        ).all()) if books else {}
+
+        items = []
+        total_revenue = 0
+        total_cost = 0
+        total_margin = 0
+        # Revenue of books without a landed cost has no margin to report; kept apart so the
+        # totals reconcile (total_margin = total_revenue - total_cost)
+        uncosted_revenue = 0
+        for row in rows:
+            book = books.get(row.book_id)
+            if book is None:
+                continue
+            units = int(row.units or 0)
+            revenue = float(row.revenue or 0)
+            unit_cost = float(costs[book.isbn]) if costs.get(book.isbn) is not None else None
+            cost = unit_cost * units if unit_cost is not None else None
+            margin = revenue - cost if cost is not None else None
+
+            if cost is None:
+                uncosted_revenue += revenue
+            else:
+                total_revenue += revenue
+                total_cost += cost
+                total_margin += margin
+            if len(items) < limit:
+                items.append({
+                    "book_id": row.book_id,
+                    "isbn": book.isbn,
+                    "title": book.title,
+                    "units": units,
+                    "revenue": revenue,
+                    "unit_cost": unit_cost,
+                    "cost": cost,
+                    "margin": margin,
+                    "margin_percent": round(margin / revenue * 100, 2) if margin is not None and revenue else None
+                })
+
+        return {
+            "items": items,
+            "total_revenue": total_revenue,
+            "total_cost": total_cost,
+            "total_margin": total_margin,
+            "uncosted_revenue": uncosted_revenue
+        }
+
+    return jsonify(_cached('margin', compute)), 200
@@ -0,0 +1,56 @@
+import json
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.models import AuditLog
+from models import lookups
+
+audit_bp = Blueprint('audit', __name__)
+
+@audit_bp.route('', methods=['GET'])
+@jwt_required()
+def get_audit_logs():
+    current_user_id = get_jwt_identity()
+    current_user = lookups.get_user(current_user_id)
+    
+    if not current_user:
+        return jsonify({"message": "User not found"}), 404
+    
+    # Only super admin can read the audit log
+    if not current_user.is_super_admin():
+        return jsonify({"message": "Not authorized"}), 403
+    
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    
+    # Base query
+    query = AuditLog.query
+    
+    # Apply filters if provided
+    if request.args.get('entity'):
+        query = query.filter(AuditLog.entity == request.args.get('entity'))
+    if request.args.get('entity_id'):
+        query = query.filter(AuditLog.entity_id == request.args.get('entity_id', type=int))
+    if request.args.get('user_id'):
+        query = query.filter(AuditLog.user_id == request.args.get('user_id', type=int))
+    if request.args.get('action'):
+        query = query.filter(AuditLog.action == request.args.get('action'))
+    
+    # Fetch one extra row to know whether another page exists without a COUNT(*)
+    entries = query.order_by(AuditLog.id.desc()) \
+        .offset((page - 1) * per_page) \
+        .limit(per_page + 1).all()
+    
+    return jsonify({
+        "items": [{
+            "id": entry.id,
+            "user_id": entry.user_id,
+            "action": entry.action,
+            "entity": entry.entity,
+            "entity_id": entry.entity_id,
+            "changes": json.loads(entry.changes) if entry.changes else None,
+            "created_at": entry.created_at.isoformat()
+        } for entry in entries[:per_page]],
+        "page": page,
+        "per_page": per_page,
+        "has_next": len(entries) > per_page
+    }), 200
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from models.models import db, User
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
+from models.models import db
+from models import lookups
+from services.revocation import revocation_list
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -20,13 +22,13 @@ def login():
     if not data or not data.get('username') or not data.get('password'):
         return jsonify({"message": "Missing username or password"}), 400
     
-    user = User.query.filter_by(username=data.get('username')).first()
+    user = lookups.get_user_by_username(data.get('username'))
     
     if not user or not user.check_password(data.get('password')):
         return jsonify({"message": "Invalid username or password"}), 401
     
-    # Create JWT token
-    access_token = create_access_token(identity=str(user.id))
+    # Create JWT token; the branch claim scopes the token to the user's branch
+    access_token = create_access_token(identity=str(user.id), additional_claims={"branch_id": user.branch_id})
     
     response = jsonify({
         "token": access_token,
@@ -38,13 +40,23 @@ def login():
             "gender": user.gender,
             "age": user.age,
             "role": user.role.value,
-            "is_super_admin": user.is_super_admin()
+            "is_super_admin": user.is_super_admin(),
+            "branch_id": user.branch_id
         }
     })
     response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', ''))
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response, 200
 
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    # Revoke this token; the client drops it as well
+    revocation_list.revoke_token(get_jwt(), user_id=int(get_jwt_identity()))
+    db.session.commit()
+    
+    return jsonify({"message": "Logged out successfully"}), 200
+
 @auth_bp.route('/me', methods=['OPTIONS'])
 def get_me_options():
     response = jsonify({})
@@ -59,7 +71,7 @@ def get_me_options():
 @jwt_required()
 def get_me_get():
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = lookups.get_user(current_user_id)
     
     if not user:
         return jsonify({"message": "User not found"}), 404
@@ -72,7 +84,8 @@ def get_me_get():
         "gender": user.gender,
         "age": user.age,
         "role": user.role.value,
-        "is_super_admin": user.is_super_admin()
+        "is_super_admin": user.is_super_admin(),
+        "branch_id": user.branch_id
     }
     response = jsonify(response_data)
     response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', ''))
@@ -92,7 +105,7 @@ def change_password():
         return response
         
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = lookups.get_user(current_user_id)
     
     if not user:
         return jsonify({"message": "User not found"}), 404
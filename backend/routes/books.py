@@ -1,50 +1,117 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import or_
-from models.models import db, Book, User
+from sqlalchemy import or_, select, func
+from models.models import db, Book, BranchStock
+from models import lookups
+from services.reorder import reorder_engine
+from services.catalog import catalog
+from services.serialization import listing_response
+from services import branches, listing
+from services.isbn import find_books
+from services.concurrency import retry_on_conflict, precondition_failed, etag
 from datetime import datetime
 
 books_bp = Blueprint('books', __name__)
 
-@books_bp.route('', methods=['GET'], strict_slashes=False)
-@jwt_required()
-def get_books():
-    # Get query parameters for search/filter
-    isbn = request.args.get('isbn')
-    title = request.args.get('title')
-    author = request.args.get('author')
-    publisher = request.args.get('publisher')
-    
-    # Base query
-    query = Book.query
+# Listings select these columns directly instead of loading Book objects
+BOOK_FIELDS = (Book.id, Book.isbn, Book.title, Book.author, Book.publisher,
+               Book.retail_price, Book.stock_quantity, Book.created_at, Book.updated_at, Book.version,
+               Book.units_sold, Book.revenue, Book.last_sold_at)
+BOOK_COLUMNS = [field.key for field in BOOK_FIELDS]
+
+BOOK_SORT_KEYS = ('id', 'isbn', 'title', 'author', 'publisher', 'retail_price', 'created_at',
+                  'units_sold', 'revenue', 'last_sold_at')
+
+def _book_row(row):
+    return (
+        row.id, row.isbn, row.title, row.author, row.publisher, row.retail_price, row.stock_quantity,
+        row.created_at.isoformat() if row.created_at else None,
+        row.updated_at.isoformat() if row.updated_at else None,
+        row.version,
+        row.units_sold,
+        row.revenue,
+        row.last_sold_at.isoformat() if row.last_sold_at else None
+    )
+
+def _branch_stock(branch_id):
+    return func.coalesce(
+        select(BranchStock.stock_quantity)
+        .where(BranchStock.branch_id == branch_id, BranchStock.book_id == Book.id)
+        .scalar_subquery(), 0)
+
+def _book_fields(branch_id):
+    if branch_id is None:
+        return BOOK_FIELDS
+    # Branch staff see their branch's stock in place of the central stock
+    return tuple(_branch_stock(branch_id).label('stock_quantity') if field is Book.stock_quantity else field
+                 for field in BOOK_FIELDS)
+
+def book_filters(args):
+    """Parse the get_books query string; returns (filters, error message).
+    
+    sort=popularity is short for -units_sold (best sellers first), which the
+    (units_sold, id) index serves without sorting the table. Shared with the
+    async app in asgi.py.
+    """
+    filters = {name: args.get(name) for name in ('isbn', 'title', 'author', 'publisher')}
+    sort_args = {'sort': '-units_sold' if args.get('sort') == 'popularity' else args.get('sort')}
+    filters['sort'], error = listing.parse_sort(sort_args, BOOK_SORT_KEYS)
+    if error:
+        return None, error
+    page, error = listing.parse_page(args)
+    if error:
+        return None, error
+    filters['limit'], filters['offset'] = page
+    return filters, None
+
+def books_statement(isbn=None, title=None, author=None, publisher=None, branch_id=None,
+                    sort=None, limit=None, offset=0):
+    # Shared with the async app in asgi.py
+    statement = select(*_book_fields(branch_id))
     
     # Apply filters if provided
     if isbn:
-        query = query.filter(Book.isbn.like(f'%{isbn}%'))
+        statement = statement.where(Book.isbn.like(f'%{isbn}%'))
     if title:
-        query = query.filter(Book.title.like(f'%{title}%'))
+        statement = statement.where(Book.title.like(f'%{title}%'))
     if author:
-        query = query.filter(Book.author.like(f'%{author}%'))
+        statement = statement.where(Book.author.like(f'%{author}%'))
     if publisher:
-        query = query.filter(Book.publisher.like(f'%{publisher}%'))
+        statement = statement.where(Book.publisher.like(f'%{publisher}%'))
     
-    books = query.all()
-    book_list = []
+    if sort:
+        statement = statement.order_by(*listing.order_by(sort, {key: getattr(Book, key) for key in BOOK_SORT_KEYS}))
+    if limit is not None:
+        statement = statement.limit(limit)
+    if offset:
+        statement = statement.offset(offset)
     
-    for book in books:
-        book_list.append({
-            "id": book.id,
-            "isbn": book.isbn,
-            "title": book.title,
-            "author": book.author,
-            "publisher": book.publisher,
-            "retail_price": book.retail_price,
-            "stock_quantity": book.stock_quantity,
-            "created_at": book.created_at.isoformat() if book.created_at else None,
-            "updated_at": book.updated_at.isoformat() if book.updated_at else None
-        })
+    return statement
+
+def search_statement(search_term, branch_id=None):
+    # Search in all relevant fields
+    return select(*_book_fields(branch_id)).where(
+        or_(
+            Book.isbn.like(f'%{search_term}%'),
+            Book.title.like(f'%{search_term}%'),
+            Book.author.like(f'%{search_term}%'),
+            Book.publisher.like(f'%{search_term}%')
+        )
+    )
+
+@books_bp.route('', methods=['GET'], strict_slashes=False)
+@jwt_required()
+def get_books():
+    # Get query parameters for search/filter
+    filters, error = book_filters(request.args)
+    if error:
+        return jsonify({"message": error}), 400
     
-    return jsonify(book_list), 200
+    statement = books_statement(**filters, branch_id=branches.current_branch_id())
+    
+    rows = [_book_row(row) for row in db.session.execute(statement)]
+    
+    return listing_response(BOOK_COLUMNS, rows)
 
 @books_bp.route('/search', methods=['GET'])
 @jwt_required()
@@ -53,21 +120,36 @@ def search_books():
     search_term = request.args.get('q', '')
     
     if not search_term:
-        return jsonify([]), 200
+        return listing_response(BOOK_COLUMNS, [])
     
-    # Search in all relevant fields
-    books = Book.query.filter(
-        or_(
-            Book.isbn.like(f'%{search_term}%'),
-            Book.title.like(f'%{search_term}%'),
-            Book.author.like(f'%{search_term}%'),
-            Book.publisher.like(f'%{search_term}%')
-        )
-    ).all()
+    statement = search_statement(search_term, branches.current_branch_id())
+    rows = [_book_row(row) for row in db.session.execute(statement)]
+    
+    return listing_response(BOOK_COLUMNS, rows)
+
+@books_bp.route('/typeahead', methods=['GET'])
+@jwt_required()
+def typeahead_books():
+    # Served from the in-process catalog, no database round trip
+    search_term = request.args.get('q', '')
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    
+    return jsonify([entry.to_dict() for entry in catalog.typeahead(search_term, limit)]), 200
+
+@books_bp.route('/low-stock', methods=['GET'])
+@jwt_required()
+def get_low_stock_books():
+    entries = reorder_engine.low_stock()
+    
+    books = Book.query.filter(Book.id.in_([entry[0] for entry in entries])).all() if entries else []
+    books_by_id = {book.id: book for book in books}
     
     book_list = []
     
-    for book in books:
+    for book_id, stock_quantity, reorder_point, velocity in entries:
+        book = books_by_id.get(book_id)
+        if not book:
+            continue
         book_list.append({
             "id": book.id,
             "isbn": book.isbn,
@@ -76,31 +158,77 @@ def search_books():
             "publisher": book.publisher,
             "retail_price": book.retail_price,
             "stock_quantity": book.stock_quantity,
-            "created_at": book.created_at.isoformat() if book.created_at else None,
-            "updated_at": book.updated_at.isoformat() if book.updated_at else None
+            "reorder_point": reorder_point,
+            "units_per_day": round(velocity, 4)
         })
     
     return jsonify(book_list), 200
 
+ISBN_BATCH_MAX = 500
+
+def _books_by_isbn(isbns):
+    # {requested isbn: book dict or None}, branch staff see their branch's stock
+    found = find_books(isbns)
+    branch_id = branches.current_branch_id()
+    branch_stock = {}
+    book_ids = [book.id for book in found.values() if book is not None]
+    if branch_id is not None and book_ids:
+        branch_stock = dict(db.session.execute(
+            select(BranchStock.book_id, BranchStock.stock_quantity)
+            .where(BranchStock.branch_id == branch_id, BranchStock.book_id.in_(book_ids))).all())
+    
+    books = {}
+    for requested, book in found.items():
+        if book is None:
+            books[requested] = None
+            continue
+        row = dict(zip(BOOK_COLUMNS, _book_row(book)))
+        if branch_id is not None:
+            row["stock_quantity"] = branch_stock.get(book.id, 0)
+        books[requested] = row
+    return books
+
+@books_bp.route('/by-isbn/<path:value>', methods=['GET'])
+@jwt_required()
+def get_book_by_isbn(value):
+    # Exact match on ISBN-10 or ISBN-13, with or without hyphens
+    book = _books_by_isbn([value])[value]
+    
+    if not book:
+        return jsonify({"message": "Book not found"}), 404
+    
+    return jsonify(book), 200
+
+@books_bp.route('/by-isbn', methods=['POST'])
+@jwt_required()
+def get_books_by_isbn():
+    # Batch form: {"isbns": [...]} -> {isbn: book or null}, one query for all of them
+    data = request.get_json()
+    isbns = data.get('isbns') if data else None
+    
+    if not isinstance(isbns, list) or not all(isinstance(value, str) and value.strip() for value in isbns):
+        return jsonify({"message": "isbns must be a list of ISBN strings"}), 400
+    if len(isbns) > ISBN_BATCH_MAX:
+        return jsonify({"message": f"At most {ISBN_BATCH_MAX} ISBNs per request"}), 400
+    
+    return jsonify(_books_by_isbn(isbns)), 200
+
 @books_bp.route('/<int:book_id>', methods=['GET'])
 @jwt_required()
 def get_book(book_id):
-    book = Book.query.get(book_id)
+    entry = catalog.get(book_id)
     
-    if not book:
+    if not entry:
         return jsonify({"message": "Book not found"}), 404
     
-    return jsonify({
-        "id": book.id,
-        "isbn": book.isbn,
-        "title": book.title,
-        "author": book.author,
-        "publisher": book.publisher,
-        "retail_price": book.retail_price,
-        "stock_quantity": book.stock_quantity,
-        "created_at": book.created_at.isoformat() if book.created_at else None,
-        "updated_at": book.updated_at.isoformat() if book.updated_at else None
-    }), 200
+    book = entry.to_dict()
+    branch_id = branches.current_branch_id()
+    if branch_id is not None:
+        stock = db.session.get(BranchStock, (branch_id, book_id))
+        book["stock_quantity"] = stock.stock_quantity if stock else 0
+    
+    # Sent back as If-Match by PUT so edits based on an old copy are refused
+    return jsonify(book), 200, {'ETag': etag(entry.version)}
 
 @books_bp.route('', methods=['POST'], strict_slashes=False)
 @jwt_required()
@@ -114,7 +242,7 @@ def create_book():
             return jsonify({"message": f"Missing required field: {field}"}), 400
     
     # Check if book with same ISBN already exists
-    if Book.query.filter_by(isbn=data.get('isbn')).first():
+    if lookups.get_book_by_isbn(data.get('isbn')):
         return jsonify({"message": "Book with this ISBN already exists"}), 400
     
     # Create new book
@@ -130,6 +258,8 @@ def create_book():
     db.session.add(new_book)
     db.session.commit()
     
+    catalog.invalidate(new_book.id)
+    
     return jsonify({
         "message": "Book created successfully",
         "id": new_book.id
@@ -137,12 +267,17 @@ def create_book():
 
 @books_bp.route('/<int:book_id>', methods=['PUT'])
 @jwt_required()
+@retry_on_conflict
 def update_book(book_id):
-    book = Book.query.get(book_id)
+    book = lookups.get_book(book_id)
     
     if not book:
         return jsonify({"message": "Book not found"}), 404
     
+    precondition = precondition_failed(book.version)
+    if precondition:
+        return precondition
+    
     data = request.get_json()
     
     # Update book fields
@@ -163,16 +298,19 @@ def update_book(book_id):
     
     db.session.commit()
     
+    catalog.invalidate(book_id)
+    
     return jsonify({
         "message": "Book updated successfully",
-        "updated_at": book.updated_at.isoformat() if book.updated_at else None
-    }), 200
+        "updated_at": book.updated_at.isoformat() if book.updated_at else None,
+        "version": book.version
+    }), 200, {'ETag': etag(book.version)}
 
 @books_bp.route('/<int:book_id>', methods=['DELETE'])
 @jwt_required()
 def delete_book(book_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -181,7 +319,7 @@ def delete_book(book_id):
     if not current_user.is_super_admin():
         return jsonify({"message": "Not authorized"}), 403
     
-    book = Book.query.get(book_id)
+    book = lookups.get_book(book_id)
     
     if not book:
         return jsonify({"message": "Book not found"}), 404
@@ -189,4 +327,6 @@ def delete_book(book_id):
     db.session.delete(book)
     db.session.commit()
     
+    catalog.invalidate(book_id)
+    
     return jsonify({"message": "Book deleted successfully"}), 200 
\ No newline at end of file
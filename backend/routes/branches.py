@@ -0,0 +1,134 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from models.models import db, Branch, BranchStock, Book
+from models import lookups
+from services import branches
+from services.stock import stock_changed
+from services.concurrency import retry_on_conflict
+
+branches_bp = Blueprint('branches', __name__)
+
+def _branch_dict(branch):
+    return {
+        "id": branch.id,
+        "code": branch.code,
+        "name": branch.name,
+        "created_at": branch.created_at.isoformat() if branch.created_at else None,
+        "sharded": branches.is_sharded(branch.id)
+    }
+
+@branches_bp.route('', methods=['GET'])
+@jwt_required()
+def get_branches():
+    return jsonify([_branch_dict(branch) for branch in Branch.query.order_by(Branch.id).all()]), 200
+
+@branches_bp.route('', methods=['POST'])
+@jwt_required()
+def create_branch():
+    current_user_id = get_jwt_identity()
+    current_user = lookups.get_user(current_user_id)
+    
+    if not current_user:
+        return jsonify({"message": "User not found"}), 404
+    
+    # Only super admin can open branches
+    if not current_user.is_super_admin():
+        return jsonify({"message": "Not authorized"}), 403
+    
+    data = request.get_json()
+    
+    # Validate required fields
+    required_fields = ['code', 'name']
+    for field in required_fields:
+        if not data.get(field):
+            return jsonify({"message": f"Missing required field: {field}"}), 400
+    
+    if Branch.query.filter_by(code=data.get('code')).first():
+        return jsonify({"message": "Branch code already exists"}), 400
+    
+    branch = Branch(code=data.get('code'), name=data.get('name'))
+    db.session.add(branch)
+    db.session.commit()
+    
+    return jsonify({
+        "message": "Branch created successfully",
+        "id": branch.id
+    }), 201
+
+@branches_bp.route('/<int:branch_id>/stock', methods=['GET'])
+@jwt_required()
+def get_branch_stock(branch_id):
+    # Branch staff can only look at their own branch
+    current_branch_id = branches.current_branch_id()
+    if current_branch_id is not None and current_branch_id != branch_id:
+        return jsonify({"message": "Not authorized"}), 403
+    
+    if not db.session.get(Branch, branch_id):
+        return jsonify({"message": "Branch not found"}), 404
+    
+    statement = select(BranchStock.book_id, Book.isbn, Book.title, BranchStock.stock_quantity, BranchStock.updated_at) \
+        .join(Book, Book.id == BranchStock.book_id) \
+        .where(BranchStock.branch_id == branch_id) \
+        .order_by(BranchStock.book_id)
+    
+    return jsonify([{
+        "book_id": row.book_id,
+        "isbn": row.isbn,
+        "title": row.title,
+        "stock_quantity": row.stock_quantity,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None
+    } for row in db.session.execute(statement)]), 200
+
+@branches_bp.route('/<int:branch_id>/stock/transfer', methods=['POST'])
+@jwt_required()
+@retry_on_conflict
+def transfer_stock(branch_id):
+    # Move copies from the central stock to the branch; a negative quantity sends them back
+    current_user_id = get_jwt_identity()
+    current_user = lookups.get_user(current_user_id)
+    
+    if not current_user:
+        return jsonify({"message": "User not found"}), 404
+    
+    # Only super admin can move stock between branches
+    if not current_user.is_super_admin():
+        return jsonify({"message": "Not authorized"}), 403
+    
+    if not db.session.get(Branch, branch_id):
+        return jsonify({"message": "Branch not found"}), 404
+    
+    data = request.get_json()
+    
+    # Validate required fields
+    required_fields = ['book_id', 'quantity']
+    for field in required_fields:
+        if not data.get(field):
+            return jsonify({"message": f"Missing required field: {field}"}), 400
+    
+    book = lookups.get_book(data.get('book_id'))
+    
+    if not book:
+        return jsonify({"message": "Book not found"}), 404
+    
+    quantity = int(data.get('quantity'))
+    stock = branches.stock_holder(book, branch_id, create=True)
+    
+    # Check if enough stock on the giving side
+    if quantity > 0 and book.stock_quantity < quantity:
+        return jsonify({"message": f"Not enough central stock. Available: {book.stock_quantity}"}), 400
+    if quantity < 0 and stock.stock_quantity < -quantity:
+        return jsonify({"message": f"Not enough branch stock. Available: {stock.stock_quantity}"}), 400
+    
+    central_quantity = branches.move_stock(book, -quantity)
+    branch_quantity = branches.move_stock(stock, quantity)
+    db.session.commit()
+    
+    stock_changed(book.id, central_quantity, -quantity)
+    stock_changed(book.id, branch_quantity, quantity, branch_id)
+    
+    return jsonify({
+        "message": "Stock transferred successfully",
+        "central_stock": central_quantity,
+        "branch_stock": branch_quantity
+    }), 200
@@ -0,0 +1,64 @@
+import json
+from flask import Blueprint, request, Response, stream_with_context, current_app
+from flask_jwt_extended import jwt_required
+from services.events import broker
+from services import branches
+
+events_bp = Blueprint('events', __name__)
+
+def _format_event(seq, event_type, data):
+    return f"id: {seq}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+def _visible(data, branch_id):
+    # Stock and sale events carry the branch they happened in (None for central);
+    # a stream only gets those of the branch it was opened for
+    return 'branch_id' not in data or data['branch_id'] == branch_id
+
+def start_seq(last_id):
+    # Resume after the last event the client saw (EventSource sends Last-Event-ID on reconnect)
+    try:
+        return int(last_id) if last_id else broker.last_seq
+    except ValueError:
+        return broker.last_seq
+
+def stream_frames(events, complete, current, branch_id):
+    """SSE text for one read of the broker and the client's new position; shared with asgi.py."""
+    if not complete:
+        # Missed events are no longer buffered, the client has to reload its listings
+        current = broker.last_seq
+        return _format_event(current, 'reset', {}), current
+    if not events:
+        return ": keep-alive\n\n", current
+    frames = []
+    for event_seq, event_type, data in events:
+        current = event_seq
+        if _visible(data, branch_id):
+            frames.append(_format_event(event_seq, event_type, data))
+        else:
+            # Only move the client's Last-Event-ID on, so a reconnect does not replay it
+            frames.append(f"id: {event_seq}\n\n")
+    return ''.join(frames), current
+
+@events_bp.route('/stream', methods=['GET'])
+@jwt_required()
+def stream_events():
+    # Under WSGI every open stream holds a worker thread for as long as the client stays
+    # connected: run a threaded server (the development server is), gunicorn with gevent
+    # or eventlet workers, or the ASGI entry point, which serves this stream itself as a
+    # coroutine (asgi.py) and never reaches this view
+    seq = start_seq(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_INTERVAL']
+    branch_id = branches.current_branch_id()
+    
+    def generate():
+        current = seq
+        events, complete = broker.since(current)
+        while True:
+            frames, current = stream_frames(events, complete, current, branch_id)
+            yield frames
+            events, complete = broker.wait(current, heartbeat)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,104 +1,130 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.models import db, FinancialTransaction, TransactionType, User
-from datetime import datetime
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func
+from models.models import db, FinancialTransaction, FinancialTransactionArchive, TransactionType
+from models import lookups
+from services.archive import archived_until
+from services import branches, listing
+from services.serialization import listing_response
 
 finance_bp = Blueprint('finance', __name__)
 
+TRANSACTION_COLUMNS = ['id', 'transaction_type', 'description', 'amount', 'user_id', 'created_at', 'user']
+
+def _archive_in_range(start_datetime):
+    # Only touch the archive when the requested range reaches into it
+    archived_until_datetime = archived_until(FinancialTransactionArchive)
+    return archived_until_datetime is not None and (start_datetime is None or start_datetime <= archived_until_datetime)
+
 @finance_bp.route('/transactions', methods=['GET'])
 @jwt_required()
 def get_transactions():
     # Get query parameters
     transaction_type = request.args.get('type')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    # Base query
-    query = FinancialTransaction.query
-    
-    # Apply filters if provided
-    if transaction_type:
-        if transaction_type.lower() == 'income':
-            query = query.filter(FinancialTransaction.transaction_type == TransactionType.INCOME)
-        elif transaction_type.lower() == 'expense':
-            query = query.filter(FinancialTransaction.transaction_type == TransactionType.EXPENSE)
-    
-    if start_date:
-        try:
-            start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            query = query.filter(FinancialTransaction.created_at >= start_datetime)
-        except ValueError:
-            return jsonify({"message": "Invalid start_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)"}), 400
+    include_archive = request.args.get('include_archive', '').lower() in ('1', 'true', 'yes')
     
-    if end_date:
-        try:
-            end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            query = query.filter(FinancialTransaction.created_at <= end_datetime)
-        except ValueError:
-            return jsonify({"message": "Invalid end_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)"}), 400
+    start_datetime, error = listing.parse_datetime(request.args, 'start_date')
+    if error:
+        return jsonify({"message": error}), 400
+    end_datetime, error = listing.parse_datetime(request.args, 'end_date')
+    if error:
+        return jsonify({"message": error}), 400
     
-    # Order by created_at (newest first)
-    transactions = query.order_by(FinancialTransaction.created_at.desc()).all()
+    # Newest rows live in the hot table, so it is listed before the archive
+    models = [FinancialTransaction]
+    if include_archive and _archive_in_range(start_datetime):
+        models.append(FinancialTransactionArchive)
     
-    transaction_list = []
+    rows = []
+    users = {}
+    branch_id = branches.current_branch_id()
     
-    for transaction in transactions:
-        # Get user information
-        user = User.query.get(transaction.user_id)
+    for model in models:
+        # Base query
+        query = model.query
         
-        transaction_data = {
-            "id": transaction.id,
-            "transaction_type": transaction.transaction_type.value,
-            "description": transaction.description,
-            "amount": transaction.amount,
-            "user_id": transaction.user_id,
-            "created_at": transaction.created_at.isoformat(),
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "real_name": user.real_name
-            } if user else None
-        }
+        # Branch staff only see their branch's ledger
+        if branch_id is not None:
+            query = query.filter(model.branch_id == branch_id)
         
-        transaction_list.append(transaction_data)
+        # Apply filters if provided
+        if transaction_type:
+            if transaction_type.lower() == 'income':
+                query = query.filter(model.transaction_type == TransactionType.INCOME)
+            elif transaction_type.lower() == 'expense':
+                query = query.filter(model.transaction_type == TransactionType.EXPENSE)
+        
+        if start_datetime:
+            query = query.filter(model.created_at >= start_datetime)
+        
+        if end_datetime:
+            query = query.filter(model.created_at <= end_datetime)
+        
+        # Order by created_at (newest first)
+        transactions = query.order_by(model.created_at.desc()).all()
+        
+        for transaction in transactions:
+            # Get user information, serialized once per user
+            if transaction.user_id not in users:
+                user = lookups.get_user(transaction.user_id)
+                users[transaction.user_id] = {
+                    "id": user.id,
+                    "username": user.username,
+                    "real_name": user.real_name
+                } if user else None
+            
+            rows.append((
+                transaction.id,
+                transaction.transaction_type.value,
+                transaction.description,
+                transaction.amount,
+                transaction.user_id,
+                transaction.created_at.isoformat(),
+                users[transaction.user_id]
+            ))
     
-    return jsonify(transaction_list), 200
+    return listing_response(TRANSACTION_COLUMNS, rows)
 
 @finance_bp.route('/summary', methods=['GET'])
 @jwt_required()
 def get_financial_summary():
     # Get query parameters
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+    include_archive = request.args.get('include_archive', '').lower() in ('1', 'true', 'yes')
     
-    # Base queries
-    income_query = FinancialTransaction.query.filter(FinancialTransaction.transaction_type == TransactionType.INCOME)
-    expense_query = FinancialTransaction.query.filter(FinancialTransaction.transaction_type == TransactionType.EXPENSE)
+    start_datetime, error = listing.parse_datetime(request.args, 'start_date')
+    if error:
+        return jsonify({"message": error}), 400
+    end_datetime, error = listing.parse_datetime(request.args, 'end_date')
+    if error:
+        return jsonify({"message": error}), 400
     
-    # Apply date filters if provided
-    if start_date:
-        try:
-            start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            income_query = income_query.filter(FinancialTransaction.created_at >= start_datetime)
-            expense_query = expense_query.filter(FinancialTransaction.created_at >= start_datetime)
-        except ValueError:
-            return jsonify({"message": "Invalid start_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)"}), 400
+    models = [FinancialTransaction]
+    if include_archive and _archive_in_range(start_datetime):
+        models.append(FinancialTransactionArchive)
     
-    if end_date:
-        try:
-            end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            income_query = income_query.filter(FinancialTransaction.created_at <= end_datetime)
-            expense_query = expense_query.filter(FinancialTransaction.created_at <= end_datetime)
-        except ValueError:
-            return jsonify({"message": "Invalid end_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)"}), 400
+    # Calculate totals in SQL, one grouped query per table
+    total_income = 0
+    total_expense = 0
+    branch_id = branches.current_branch_id()
+    for model in models:
+        query = db.session.query(model.transaction_type, func.sum(model.amount))
+        if branch_id is not None:
+            query = query.filter(model.branch_id == branch_id)
+        if start_datetime:
+            query = query.filter(model.created_at >= start_datetime)
+        if end_datetime:
+            query = query.filter(model.created_at <= end_datetime)
+        
+        for transaction_type, amount in query.group_by(model.transaction_type).all():
+            if transaction_type == TransactionType.INCOME:
+                total_income += amount or 0
+            elif transaction_type == TransactionType.EXPENSE:
+                total_expense += amount or 0
     
-    # Calculate totals
-    total_income = sum(transaction.amount for transaction in income_query.all())
-    total_expense = sum(transaction.amount for transaction in expense_query.all())
     net_profit = total_income - total_expense
     
     return jsonify({
         "total_income": total_income,
         "total_expense": total_expense,
         "net_profit": net_profit
-    }), 200 
\ No newline at end of file
+    }), 200
@@ -1,46 +1,109 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
 from datetime import datetime
-from models.models import db, BookPurchase, Book, User, PurchaseStatus, FinancialTransaction, TransactionType
+from models.models import db, BookPurchase, Book, PurchaseStatus, FinancialTransaction, TransactionType
+from models import lookups
+from services.stock import stock_changed
+from services import branches, costing, listing
+from services.isbn import find_book
+from services.concurrency import retry_on_conflict, precondition_failed, etag
+from services.idempotency import idempotent
+from services.serialization import listing_response
 
 purchases_bp = Blueprint('purchases', __name__)
 
+PURCHASE_FIELDS = (BookPurchase.id, BookPurchase.isbn, BookPurchase.title, BookPurchase.author,
+                   BookPurchase.publisher, BookPurchase.purchase_price, BookPurchase.quantity,
+                   BookPurchase.status, BookPurchase.user_id, BookPurchase.created_at, BookPurchase.updated_at,
+                   BookPurchase.version)
+PURCHASE_COLUMNS = [field.key for field in PURCHASE_FIELDS]
+
+def _purchase_row(row):
+    return (
+        row.id, row.isbn, row.title, row.author, row.publisher, row.purchase_price, row.quantity,
+        row.status.value, row.user_id, row.created_at.isoformat(), row.updated_at.isoformat(), row.version
+    )
+
+PURCHASE_SORT_KEYS = ('id', 'created_at', 'updated_at', 'isbn', 'status', 'user_id', 'purchase_price', 'quantity', 'amount')
+
+def purchase_filters(args):
+    """Parse the get_purchases query string; returns (filters, error message).
+    
+    Shared with the async app in asgi.py.
+    """
+    filters = {'isbn': args.get('isbn') or None, 'status': None}
+    if args.get('status'):
+        try:
+            filters['status'] = PurchaseStatus(args.get('status'))
+        except ValueError:
+            return None, f"Invalid status: {args.get('status')}"
+    for name in ('start_date', 'end_date'):
+        filters[name], error = listing.parse_datetime(args, name)
+        if error:
+            return None, error
+    for name, number_type in (('user_id', int), ('min_amount', float), ('max_amount', float)):
+        filters[name], error = listing.parse_number(args, name, number_type)
+        if error:
+            return None, error
+    filters['sort'], error = listing.parse_sort(args, PURCHASE_SORT_KEYS)
+    if error:
+        return None, error
+    page, error = listing.parse_page(args)
+    if error:
+        return None, error
+    filters['limit'], filters['offset'] = page
+    return filters, None
+
+def purchases_statement(status=None, isbn=None, user_id=None, start_date=None, end_date=None,
+                        min_amount=None, max_amount=None, sort=None, limit=None, offset=0):
+    # Shared with the async app in asgi.py; takes the purchase_filters keys
+    statement = select(*PURCHASE_FIELDS)
+    amount = BookPurchase.purchase_price * BookPurchase.quantity
+    
+    # Apply status filter if provided (a PurchaseStatus, the column stores the enum names)
+    if status:
+        statement = statement.where(BookPurchase.status == PurchaseStatus(status))
+    if isbn:
+        statement = statement.where(BookPurchase.isbn == isbn)
+    if user_id is not None:
+        statement = statement.where(BookPurchase.user_id == user_id)
+    if start_date:
+        statement = statement.where(BookPurchase.created_at >= start_date)
+    if end_date:
+        statement = statement.where(BookPurchase.created_at <= end_date)
+    if min_amount is not None:
+        statement = statement.where(amount >= min_amount)
+    if max_amount is not None:
+        statement = statement.where(amount <= max_amount)
+    
+    if sort:
+        columns = {key: getattr(BookPurchase, key) for key in PURCHASE_SORT_KEYS if key != 'amount'}
+        columns['amount'] = amount
+        statement = statement.order_by(*listing.order_by(sort, columns))
+    if limit is not None:
+        statement = statement.limit(limit)
+    if offset:
+        statement = statement.offset(offset)
+    
+    return statement
+
 @purchases_bp.route('', methods=['GET'])
 @jwt_required()
 def get_purchases():
-    status = request.args.get('status')
+    # Filters, sort and limit/offset are applied in SQL, see purchase_filters
+    filters, error = purchase_filters(request.args)
+    if error:
+        return jsonify({"message": error}), 400
     
-    # Base query
-    query = BookPurchase.query
+    rows = [_purchase_row(row) for row in db.session.execute(purchases_statement(**filters))]
     
-    # Apply status filter if provided
-    if status:
-        query = query.filter(BookPurchase.status == status)
-    
-    purchases = query.all()
-    purchase_list = []
-    
-    for purchase in purchases:
-        purchase_list.append({
-            "id": purchase.id,
-            "isbn": purchase.isbn,
-            "title": purchase.title,
-            "author": purchase.author,
-            "publisher": purchase.publisher,
-            "purchase_price": purchase.purchase_price,
-            "quantity": purchase.quantity,
-            "status": purchase.status.value,
-            "user_id": purchase.user_id,
-            "created_at": purchase.created_at.isoformat(),
-            "updated_at": purchase.updated_at.isoformat()
-        })
-    
-    return jsonify(purchase_list), 200
+    return listing_response(PURCHASE_COLUMNS, rows)
 
 @purchases_bp.route('/<int:purchase_id>', methods=['GET'])
 @jwt_required()
 def get_purchase(purchase_id):
-    purchase = BookPurchase.query.get(purchase_id)
+    purchase = lookups.get_purchase(purchase_id)
     
     if not purchase:
         return jsonify({"message": "Purchase not found"}), 404
@@ -56,14 +119,16 @@ def get_purchase(purchase_id):
         "status": purchase.status.value,
         "user_id": purchase.user_id,
         "created_at": purchase.created_at.isoformat(),
-        "updated_at": purchase.updated_at.isoformat()
-    }), 200
+        "updated_at": purchase.updated_at.isoformat(),
+        "version": purchase.version
+    }), 200, {'ETag': etag(purchase.version)}
 
 @purchases_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_purchase():
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -85,7 +150,7 @@ def create_purchase():
         
         # If book_id is provided, use existing book info
         if book_data.get('book_id'):
-            book = Book.query.get(book_data.get('book_id'))
+            book = lookups.get_book(book_data.get('book_id'))
             
             if not book:
                 return jsonify({"message": f"Book with ID {book_data.get('book_id')} not found"}), 404
@@ -133,18 +198,24 @@ def create_purchase():
 
 @purchases_bp.route('/<int:purchase_id>/pay', methods=['POST'])
 @jwt_required()
+@idempotent
+@retry_on_conflict
 def pay_purchase(purchase_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
     
-    purchase = BookPurchase.query.get(purchase_id)
+    purchase = lookups.get_purchase(purchase_id)
     
     if not purchase:
         return jsonify({"message": "Purchase not found"}), 404
     
+    precondition = precondition_failed(purchase.version)
+    if precondition:
+        return precondition
+    
     # Can only pay for pending purchases
     if purchase.status != PurchaseStatus.PENDING:
         return jsonify({"message": f"Cannot pay for purchase with status {purchase.status.value}"}), 400
@@ -158,7 +229,8 @@ def pay_purchase(purchase_id):
         transaction_type=TransactionType.EXPENSE,
         description=f"Book purchase: {purchase.quantity} copies of {purchase.title}",
         amount=purchase.purchase_price * purchase.quantity,
-        user_id=current_user_id
+        user_id=current_user_id,
+        branch_id=branches.current_branch_id()
     )
     
     db.session.add(transaction)
@@ -168,18 +240,23 @@ def pay_purchase(purchase_id):
 
 @purchases_bp.route('/<int:purchase_id>/cancel', methods=['POST'])
 @jwt_required()
+@retry_on_conflict
 def cancel_purchase(purchase_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
     
-    purchase = BookPurchase.query.get(purchase_id)
+    purchase = lookups.get_purchase(purchase_id)
     
     if not purchase:
         return jsonify({"message": "Purchase not found"}), 404
     
+    precondition = precondition_failed(purchase.version)
+    if precondition:
+        return precondition
+    
     # Can only cancel pending purchases
     if purchase.status != PurchaseStatus.PENDING:
         return jsonify({"message": f"Cannot cancel purchase with status {purchase.status.value}"}), 400
@@ -194,30 +271,34 @@ def cancel_purchase(purchase_id):
 
 @purchases_bp.route('/<int:purchase_id>/add-to-inventory', methods=['POST'])
 @jwt_required()
+@retry_on_conflict
 def add_to_inventory(purchase_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
     
-    purchase = BookPurchase.query.get(purchase_id)
+    purchase = lookups.get_purchase(purchase_id)
     
     if not purchase:
         return jsonify({"message": "Purchase not found"}), 404
     
+    precondition = precondition_failed(purchase.version)
+    if precondition:
+        return precondition
+    
     # Can only add to inventory paid purchases
     if purchase.status != PurchaseStatus.PAID:
         return jsonify({"message": f"Cannot add to inventory purchase with status {purchase.status.value}"}), 400
     
     data = request.get_json()
     
-    # Check if book already exists
-    book = Book.query.filter_by(isbn=purchase.isbn).first()
+    # Check if book already exists, under either ISBN form
+    book = find_book(purchase.isbn)
     
     if book:
         # Update existing book - use existing retail price
-        book.stock_quantity += purchase.quantity
         # Explicitly update the updated_at timestamp
         book.updated_at = datetime.utcnow()
         # If retail_price is provided, update it (optional)
@@ -237,7 +318,7 @@ def add_to_inventory(purchase_id):
             author=purchase.author,
             publisher=purchase.publisher,
             retail_price=retail_price,
-            stock_quantity=purchase.quantity,
+            stock_quantity=0,
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         )
@@ -247,8 +328,20 @@ def add_to_inventory(purchase_id):
     purchase.status = PurchaseStatus.ADDED_TO_INVENTORY
     purchase.updated_at = datetime.utcnow()
     
+    # Receive into the branch's stock row, or the central stock without a branch
+    db.session.flush()
+    branch_id = branches.current_branch_id()
+    stock = branches.stock_holder(book, branch_id, create=True)
+    stock_quantity = branches.move_stock(stock, purchase.quantity)
+    
+    # Open a cost layer for the received copies
+    costing.receive(book.id, purchase.quantity, purchase.purchase_price, purchase_id=purchase.id)
+    
+    purchase_quantity = purchase.quantity
     db.session.commit()
     
+    stock_changed(book.id, stock_quantity, purchase_quantity, branch_id)
+    
     return jsonify({
         "message": "Purchase added to inventory successfully",
         "is_new_book": book.id is None,
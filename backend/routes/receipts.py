@@ -0,0 +1,142 @@
+from flask import Blueprint, request, jsonify, current_app, make_response
+from flask_jwt_extended import jwt_required
+from datetime import datetime, date, time, timedelta
+import io
+import zipfile
+from models.models import db, Branch, BookSale
+from models import lookups
+from routes.sales import SALE_COLUMNS, sales_statement, _sale_row, _sharded_sale_rows
+from services import branches
+from services.rendering import renderer, pdf_available, MIMETYPES
+
+receipts_bp = Blueprint('receipts', __name__)
+
+def _output_format():
+    # Returns (format, error response)
+    output_format = request.args.get('format', 'html')
+    if output_format not in MIMETYPES:
+        return None, (jsonify({"message": "format must be html or pdf"}), 400)
+    if output_format == 'pdf' and not pdf_available():
+        return None, (jsonify({"message": "PDF output is not available on this server"}), 406)
+    return output_format, None
+
+def _header(branch_id):
+    branch = db.session.get(Branch, branch_id) if branch_id is not None else None
+    return {
+        "store_name": current_app.config['STORE_NAME'],
+        "branch_name": branch.name if branch else None
+    }
+
+def _receipt_documents(statement, branch_id):
+    # Plain dicts for the rendering workers, same rows as get_sales
+    if branches.is_sharded(branch_id):
+        rows = _sharded_sale_rows(statement)
+    else:
+        rows = [_sale_row(row) for row in db.session.execute(statement)]
+    
+    header = _header(branch_id)
+    documents = []
+    for row in rows:
+        sale = dict(zip(SALE_COLUMNS, row))
+        documents.append({
+            **header,
+            "id": sale["id"],
+            "title": (sale["book"] or {}).get("title", "Unknown Book"),
+            "isbn": (sale["book"] or {}).get("isbn", ""),
+            "quantity": sale["quantity"],
+            "unit_price": sale["unit_price"],
+            "total_price": sale["total_price"],
+            "created_at": sale["created_at"],
+            "clerk": (sale["user"] or {}).get("real_name", "")
+        })
+    return documents
+
+def _document_response(body, content_hash, output_format, filename):
+    response = make_response(body)
+    response.mimetype = MIMETYPES[output_format]
+    response.set_etag(content_hash)
+    response.headers['Content-Disposition'] = f'inline; filename="{filename}.{output_format}"'
+    return response.make_conditional(request)
+
+@receipts_bp.route('/sales/<int:sale_id>', methods=['GET'])
+@jwt_required()
+def get_sale_receipt(sale_id):
+    output_format, error = _output_format()
+    if error:
+        return error
+    
+    branch_id = branches.current_branch_id()
+    statement = sales_statement(BookSale, branch_id=branch_id, details=not branches.is_sharded(branch_id)) \
+        .where(BookSale.id == sale_id)
+    documents = _receipt_documents(statement, branch_id)
+    
+    if not documents:
+        return jsonify({"message": "Sale not found"}), 404
+    
+    body, content_hash = renderer.render('receipt', documents[0], output_format)
+    return _document_response(body, content_hash, output_format, f'receipt-{sale_id}')
+
+@receipts_bp.route('/sales', methods=['GET'])
+@jwt_required()
+def get_day_receipts():
+    # Every receipt of one (UTC) day as a zip archive, rendered by the worker pool
+    output_format, error = _output_format()
+    if error:
+        return error
+    
+    try:
+        day = date.fromisoformat(request.args['date']) if request.args.get('date') else datetime.utcnow().date()
+    except ValueError:
+        return jsonify({"message": "Invalid date format. Use YYYY-MM-DD"}), 400
+    
+    branch_id = branches.current_branch_id()
+    start = datetime.combine(day, time.min)
+    batch_max = current_app.config['RECEIPT_BATCH_MAX']
+    statement = sales_statement(BookSale, start, None, branch_id, details=not branches.is_sharded(branch_id)) \
+        .where(BookSale.created_at < start + timedelta(days=1)) \
+        .order_by(BookSale.id).limit(batch_max + 1)
+    documents = _receipt_documents(statement, branch_id)
+    
+    if len(documents) > batch_max:
+        return jsonify({"message": f"More than {batch_max} receipts on {day.isoformat()}, ask for a branch at a time"}), 400
+    
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        rendered = renderer.render_many('receipt', documents, output_format)
+        for document, (body, _) in zip(documents, rendered):
+            zip_file.writestr(f'receipt-{document["id"]}.{output_format}', body)
+    
+    response = make_response(archive.getvalue())
+    response.mimetype = 'application/zip'
+    response.headers['Content-Disposition'] = f'attachment; filename="receipts-{day.isoformat()}.zip"'
+    return response
+
+@receipts_bp.route('/purchases/<int:purchase_id>', methods=['GET'])
+@jwt_required()
+def get_purchase_invoice(purchase_id):
+    output_format, error = _output_format()
+    if error:
+        return error
+    
+    purchase = lookups.get_purchase(purchase_id)
+    
+    if not purchase:
+        return jsonify({"message": "Purchase not found"}), 404
+    
+    user = lookups.get_user(purchase.user_id)
+    document = {
+        **_header(branches.current_branch_id()),
+        "id": purchase.id,
+        "isbn": purchase.isbn,
+        "title": purchase.title,
+        "author": purchase.author,
+        "publisher": purchase.publisher,
+        "purchase_price": purchase.purchase_price,
+        "quantity": purchase.quantity,
+        "status": purchase.status.value,
+        "created_at": purchase.created_at.isoformat(),
+        "clerk": user.real_name if user else ""
+    }
+    
+    body, content_hash = renderer.render('invoice', document, output_format)
+    return _document_response(body, content_hash, output_format, f'invoice-{purchase_id}')
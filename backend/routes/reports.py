@@ -0,0 +1,96 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from models.models import db
+from services.costing import valuation_statement
+from services.daily_reports import CENTRAL, daily_report
+from services import branches, listing
+from datetime import datetime, date, timedelta
+
+reports_bp = Blueprint('reports', __name__)
+
+DAILY_REPORT_MAX_DAYS = 31
+
+def _parse_datetime(name):
+    value = request.args.get(name)
+    if not value:
+        return None, None
+    try:
+        return listing.naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00'))), None
+    except ValueError:
+        return None, (jsonify({"message": f"Invalid {name} format. Use ISO format (YYYY-MM-DDTHH:MM:SS)"}), 400)
+
+@reports_bp.route('/inventory-valuation', methods=['GET'])
+@jwt_required()
+def get_inventory_valuation():
+    as_of, error = _parse_datetime('as_of')
+    if error:
+        return error
+    since, error = _parse_datetime('since')
+    if error:
+        return error
+
+    as_of = as_of or datetime.utcnow()
+
+    items = []
+    totals = {"units": 0, "fifo_value": 0, "average_value": 0, "fifo_cogs": 0, "average_cogs": 0}
+
+    # Single query over the cost layer tables, no replay of purchase/sale history
+    for row in db.session.execute(valuation_statement(as_of, since)):
+        item = {
+            "book_id": row.book_id,
+            "isbn": row.isbn,
+            "title": row.title,
+            "units": int(row.units or 0),
+            "fifo_value": round(float(row.fifo_value or 0), 2),
+            "average_value": round(float(row.average_value or 0), 2),
+            "fifo_cogs": round(float(row.fifo_cogs or 0), 2),
+            "average_cogs": round(float(row.average_cogs or 0), 2)
+        }
+        if not item["units"] and not item["fifo_cogs"] and not item["average_cogs"]:
+            continue
+        for key in totals:
+            totals[key] += item[key]
+        items.append(item)
+
+    return jsonify({
+        "as_of": as_of.isoformat(),
+        "since": since.isoformat() if since else None,
+        "items": items,
+        "totals": {key: round(value, 2) for key, value in totals.items()}
+    }), 200
+
+def _parse_date(name, default=None):
+    value = request.args.get(name)
+    if not value:
+        return default, None
+    try:
+        return date.fromisoformat(value), None
+    except ValueError:
+        return None, (jsonify({"message": f"Invalid {name} format. Use YYYY-MM-DD"}), 400)
+
+@reports_bp.route('/daily', methods=['GET'])
+@jwt_required()
+def get_daily_reports():
+    # Z reports: closed days from the frozen snapshots, today computed live
+    today = datetime.utcnow().date()
+    end_date, error = _parse_date('end_date', today)
+    if error:
+        return error
+    start_date, error = _parse_date('start_date', end_date)
+    if error:
+        return error
+    
+    if start_date > end_date or (end_date - start_date).days >= DAILY_REPORT_MAX_DAYS:
+        return jsonify({"message": f"start_date must be on or before end_date, at most {DAILY_REPORT_MAX_DAYS} days"}), 400
+    
+    # Branch staff get their branch's report, central staff the unscoped one
+    branch_id = branches.current_branch_id()
+    scope = CENTRAL if branch_id is None else branch_id
+    
+    reports = []
+    day = start_date
+    while day <= min(end_date, today):
+        reports.append(daily_report(day, scope, today))
+        day += timedelta(days=1)
+    
+    return jsonify(reports), 200
@@ -1,90 +1,423 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.models import db, BookSale, Book, User, FinancialTransaction, TransactionType
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from types import SimpleNamespace
+from models.models import db, BookSale, BookSaleArchive, Book, User, FinancialTransaction, TransactionType
+from models import lookups
+from services.archive import archived_until
+from services.events import broker
+from services.stock import stock_changed
+from services import branches, costing, listing, sales_counters
+from services.idempotency import idempotent
+from services.concurrency import retry_on_conflict
+from services.serialization import listing_response
 
 sales_bp = Blueprint('sales', __name__)
 
+def _sale_event(sale, book, user):
+    # Same shape as a get_sales row so clients can prepend it directly
+    return {
+        "id": sale.id,
+        "book_id": book.id,
+        "quantity": sale.quantity,
+        "unit_price": sale.unit_price,
+        "total_price": sale.total_price,
+        "user_id": user.id,
+        "branch_id": sale.branch_id,
+        "created_at": sale.created_at.isoformat(),
+        "book": {
+            "id": book.id,
+            "isbn": book.isbn,
+            "title": book.title
+        },
+        "user": {
+            "id": user.id,
+            "username": user.username,
+            "real_name": user.real_name
+        }
+    }
+
+SALE_COLUMNS = ['id', 'book_id', 'quantity', 'unit_price', 'total_price', 'user_id', 'created_at', 'book', 'user']
+
+SALE_SORT_KEYS = ('id', 'created_at', 'book_id', 'user_id', 'quantity', 'unit_price', 'total_price')
+
+def sale_filters(args):
+    """Parse the get_sales query string; returns (filters, error message).
+    
+    Shared with the async app in asgi.py.
+    """
+    filters = {'isbn': args.get('isbn') or None}
+    for name in ('start_date', 'end_date'):
+        filters[name], error = listing.parse_datetime(args, name)
+        if error:
+            return None, error
+    for name, number_type in (('book_id', int), ('user_id', int), ('min_amount', float), ('max_amount', float)):
+        filters[name], error = listing.parse_number(args, name, number_type)
+        if error:
+            return None, error
+    filters['sort'], error = listing.parse_sort(args, SALE_SORT_KEYS)
+    if error:
+        return None, error
+    page, error = listing.parse_page(args)
+    if error:
+        return None, error
+    filters['limit'], filters['offset'] = page
+    return filters, None
+
+def sales_statement(model=BookSale, start_datetime=None, end_datetime=None, branch_id=None, details=True,
+                    book_id=None, isbn=None, user_id=None, min_amount=None, max_amount=None):
+    # Works for both BookSale and BookSaleArchive; shared with the async app in asgi.py
+    # Book and user details come from the same query instead of a lookup per row
+    columns = (model.id, model.book_id, model.quantity, model.unit_price, model.total_price,
+               model.user_id, model.created_at)
+    if details:
+        statement = select(
+            *columns,
+            Book.isbn.label('book_isbn'), Book.title.label('book_title'),
+            User.username.label('user_username'), User.real_name.label('user_real_name')
+        ).outerjoin(Book, Book.id == model.book_id).outerjoin(User, User.id == model.user_id)
+    else:
+        # A sharded branch database has no books or users to join, see _sharded_sale_rows;
+        # resolve an isbn filter to book_id first
+        statement = select(*columns)
+    
+    if branch_id is not None:
+        statement = statement.where(model.branch_id == branch_id)
+    if start_datetime:
+        statement = statement.where(model.created_at >= start_datetime)
+    if end_datetime:
+        statement = statement.where(model.created_at <= end_datetime)
+    if book_id is not None:
+        statement = statement.where(model.book_id == book_id)
+    if isbn:
+        statement = statement.where(model.book_id == select(Book.id).where(Book.isbn == isbn).scalar_subquery())
+    if user_id is not None:
+        statement = statement.where(model.user_id == user_id)
+    if min_amount is not None:
+        statement = statement.where(model.total_price >= min_amount)
+    if max_amount is not None:
+        statement = statement.where(model.total_price <= max_amount)
+    
+    return statement
+
+def filtered_sales_statement(model, filters, branch_id=None, details=True, merged=False):
+    """sales_statement for parsed sale_filters, sorted and paged in SQL.
+    
+    merged: rows of several tables are merged and paged afterwards (see get_sales),
+    so each table returns its first offset + limit rows.
+    """
+    statement = sales_statement(
+        model, filters['start_date'], filters['end_date'], branch_id, details,
+        book_id=filters['book_id'], isbn=filters['isbn'], user_id=filters['user_id'],
+        min_amount=filters['min_amount'], max_amount=filters['max_amount']
+    ).order_by(*listing.order_by(filters['sort'], {key: getattr(model, key) for key in SALE_SORT_KEYS}))
+    
+    if filters['limit'] is not None:
+        if merged:
+            statement = statement.limit(filters['offset'] + filters['limit'])
+        else:
+            statement = statement.limit(filters['limit']).offset(filters['offset'])
+    elif filters['offset'] and not merged:
+        statement = statement.offset(filters['offset'])
+    
+    return statement
+
+def _sale_row(row):
+    return (
+        row.id,
+        row.book_id,
+        row.quantity,
+        row.unit_price,
+        row.total_price,
+        row.user_id,
+        row.created_at.isoformat(),
+        {
+            "id": row.book_id,
+            "isbn": row.book_isbn,
+            "title": row.book_title
+        } if row.book_isbn is not None else None,
+        {
+            "id": row.user_id,
+            "username": row.user_username,
+            "real_name": row.user_real_name
+        } if row.user_username is not None else None
+    )
+
+def _sharded_sale_rows(statement):
+    # Sales come from the branch database, book and user details from the primary,
+    # one IN query each
+    sales = db.session.execute(statement).all()
+    book_ids = {sale.book_id for sale in sales}
+    user_ids = {sale.user_id for sale in sales}
+    books = {row.id: row for row in db.session.execute(
+        select(Book.id, Book.isbn, Book.title).where(Book.id.in_(book_ids)))} if book_ids else {}
+    users = {row.id: row for row in db.session.execute(
+        select(User.id, User.username, User.real_name).where(User.id.in_(user_ids)))} if user_ids else {}
+    
+    rows = []
+    for sale in sales:
+        book = books.get(sale.book_id)
+        user = users.get(sale.user_id)
+        rows.append(_sale_row(SimpleNamespace(
+            **sale._mapping,
+            book_isbn=book.isbn if book else None, book_title=book.title if book else None,
+            user_username=user.username if user else None, user_real_name=user.real_name if user else None
+        )))
+    return rows
+
 @sales_bp.route('', methods=['GET'])
 @jwt_required()
 def get_sales():
-    sales = BookSale.query.all()
-    sale_list = []
+    # Filters, sort and limit/offset are applied in SQL, see sale_filters
+    filters, error = sale_filters(request.args)
+    if error:
+        return jsonify({"message": error}), 400
+    include_archive = request.args.get('include_archive', '').lower() in ('1', 'true', 'yes')
     
-    for sale in sales:
-        # Get user information
-        user = User.query.get(sale.user_id)
-        
-        # Get book information
-        book = Book.query.get(sale.book_id) if sale.book_id else None
-        
-        sale_data = {
-            "id": sale.id,
-            "book_id": sale.book_id,
-            "quantity": sale.quantity,
-            "unit_price": sale.unit_price,
-            "total_price": sale.total_price,
-            "user_id": sale.user_id,
-            "created_at": sale.created_at.isoformat(),
-            "book": {
-                "id": book.id,
-                "isbn": book.isbn,
-                "title": book.title
-            } if book else None,
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "real_name": user.real_name
-            } if user else None
-        }
-        
-        sale_list.append(sale_data)
+    models = [BookSale]
+    if include_archive:
+        # Only touch the archive when the requested range reaches into it
+        archived_until_datetime = archived_until(BookSaleArchive)
+        if archived_until_datetime is not None and (filters['start_date'] is None or filters['start_date'] <= archived_until_datetime):
+            models.append(BookSaleArchive)
+    merged = len(models) > 1
+    
+    rows = []
+    branch_id = branches.current_branch_id()
+    
+    for model in models:
+        if model is BookSale and branches.is_sharded(branch_id):
+            sharded_filters = filters
+            if filters['isbn']:
+                book = lookups.get_book_by_isbn(filters['isbn'])
+                if book is None or filters['book_id'] not in (None, book.id):
+                    continue
+                sharded_filters = dict(filters, isbn=None, book_id=book.id)
+            statement = filtered_sales_statement(model, sharded_filters, branch_id, details=False, merged=merged)
+            rows.extend(_sharded_sale_rows(statement))
+            continue
+        statement = filtered_sales_statement(model, filters, branch_id, merged=merged)
+        rows.extend(_sale_row(row) for row in db.session.execute(statement))
     
-    return jsonify(sale_list), 200
+    if merged:
+        rows = listing.page_rows(listing.sort_rows(rows, filters['sort'], SALE_COLUMNS),
+                                 filters['limit'], filters['offset'])
+    
+    return listing_response(SALE_COLUMNS, rows)
 
 @sales_bp.route('/<int:sale_id>', methods=['GET'])
 @jwt_required()
 def get_sale(sale_id):
-    sale = BookSale.query.get(sale_id)
+    models = [BookSale]
+    if request.args.get('include_archive', '').lower() in ('1', 'true', 'yes'):
+        models.append(BookSaleArchive)
+    
+    branch_id = branches.current_branch_id()
+    row = None
+    for model in models:
+        if model is BookSale and branches.is_sharded(branch_id):
+            statement = sales_statement(model, branch_id=branch_id, details=False).where(model.id == sale_id)
+            row = next(iter(_sharded_sale_rows(statement)), None)
+        else:
+            row = db.session.execute(sales_statement(model, branch_id=branch_id).where(model.id == sale_id)).first()
+            row = _sale_row(row) if row else None
+        if row:
+            break
     
-    if not sale:
+    if not row:
         return jsonify({"message": "Sale not found"}), 404
     
-    # Get user information
-    user = User.query.get(sale.user_id)
+    return jsonify(dict(zip(SALE_COLUMNS, row))), 200
+
+def _client_sale_ids(client_ids):
+    # Sales already recorded for these till ids, {client_id: [sale ids]}; a till can
+    # come back after the archival job moved its sales
+    recorded = {}
+    if client_ids:
+        # One query per table: a sharded branch's book_sales is not on the archive's database
+        for model in (BookSaleArchive, BookSale):
+            statement = select(model.client_id, model.id).where(model.client_id.in_(client_ids)).order_by(model.id)
+            for client_id, sale_id in db.session.execute(statement):
+                recorded.setdefault(client_id, []).append(sale_id)
+    return recorded
+
+def _client_datetime(value, now):
+    # When the till rang the sale up, clamped so a fast till clock cannot date it in the future
+    if not isinstance(value, str):
+        return now
+    try:
+        created_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return now
+    return min(listing.naive_utc(created_at), now)
+
+def _queued_items(queued_sale):
+    # Returns ([(book_id, quantity, unit_price)], error message)
+    items = queued_sale.get('items')
+    if not isinstance(items, list) or not items:
+        return None, "No items provided in sale"
+    lines = []
+    for item in items:
+        try:
+            book_id = int(item['book_id'])
+            quantity = int(item['quantity'])
+            unit_price = float(item['unit_price']) if item.get('unit_price') is not None else None
+        except (KeyError, TypeError, ValueError):
+            return None, "Each item needs a numeric book_id and quantity"
+        if quantity <= 0:
+            return None, "Quantity must be positive"
+        if any(line[0] == book_id for line in lines):
+            return None, f"Book with ID {book_id} appears twice in the sale"
+        lines.append((book_id, quantity, unit_price))
+    return lines, None
+
+@sales_bp.route('/sync', methods=['POST'])
+@jwt_required()
+@retry_on_conflict
+def sync_sales():
+    # Sales queued by a till while offline, applied in one transaction. Every queued sale
+    # gets its own result; replays of an already recorded client_id are reported, not re-applied.
+    current_user_id = get_jwt_identity()
+    current_user = lookups.get_user(current_user_id)
+    
+    if not current_user:
+        return jsonify({"message": "User not found"}), 404
+    
+    data = request.get_json(silent=True) or {}
+    queued = data.get('sales')
+    
+    if not isinstance(queued, list) or not queued:
+        return jsonify({"message": "No sales provided"}), 400
+    
+    max_batch = current_app.config['SALES_SYNC_MAX_BATCH']
+    if len(queued) > max_batch:
+        return jsonify({"message": f"At most {max_batch} sales per sync"}), 400
+    
+    if not all(isinstance(queued_sale, dict) and isinstance(queued_sale.get('client_id'), str)
+               and 0 < len(queued_sale['client_id']) <= 64 for queued_sale in queued):
+        return jsonify({"message": "Every sale needs a client_id of at most 64 characters"}), 400
+    
+    branch_id = branches.current_branch_id()
+    now = datetime.utcnow()
+    
+    # One query for the already recorded sales and one for the books of the whole batch
+    recorded = _client_sale_ids({queued_sale['client_id'] for queued_sale in queued})
+    parsed = [_queued_items(queued_sale) for queued_sale in queued]
+    book_ids = {line[0] for lines, _ in parsed if lines for line in lines}
+    books = {book.id: book for book in Book.query.filter(Book.id.in_(book_ids))} if book_ids else {}
+    
+    results = []
+    stock_changes = {}
+    sale_events = []
+    
+    for queued_sale, (lines, error) in zip(queued, parsed):
+        client_id = queued_sale['client_id']
+        
+        if client_id in recorded:
+            results.append({"client_id": client_id, "status": "duplicate", "sale_ids": recorded[client_id]})
+            continue
+        
+        if error:
+            results.append({"client_id": client_id, "status": "invalid", "message": error})
+            continue
+        
+        # Check every item before touching stock, a sale is applied whole or not at all
+        conflict = None
+        for book_id, quantity, _ in lines:
+            book = books.get(book_id)
+            if not book:
+                conflict = {"book_id": book_id, "message": f"Book with ID {book_id} not found"}
+                break
+            stock = branches.stock_holder(book, branch_id)
+            available = stock.stock_quantity if stock else 0
+            if available < quantity:
+                conflict = {"book_id": book_id, "available": available,
+                            "message": f"Not enough stock available for book: {book.title}. Available: {available}"}
+                break
+        
+        if conflict:
+            results.append({"client_id": client_id, "status": "conflict", **conflict})
+            continue
+        
+        created_at = _client_datetime(queued_sale.get('created_at'), now)
+        sale_ids = []
+        events = []
+        try:
+            with db.session.begin_nested():
+                for book_id, quantity, unit_price in lines:
+                    book = books[book_id]
+                    stock = branches.stock_holder(book, branch_id)
+                    unit_price = book.retail_price if unit_price is None else unit_price
+                    
+                    sale = BookSale(
+                        book_id=book_id,
+                        quantity=quantity,
+                        unit_price=unit_price,
+                        total_price=unit_price * quantity,
+                        user_id=current_user_id,
+                        branch_id=branch_id,
+                        client_id=client_id,
+                        created_at=created_at
+                    )
+                    stock_quantity = branches.move_stock(stock, -quantity)
+                    transaction = FinancialTransaction(
+                        transaction_type=TransactionType.INCOME,
+                        description=f"Book sale: {quantity} copies of {book.title}",
+                        amount=sale.total_price,
+                        user_id=current_user_id,
+                        branch_id=branch_id,
+                        created_at=created_at
+                    )
+                    
+                    db.session.add(sale)
+                    db.session.add(transaction)
+                    db.session.flush()
+                    costing.consume(book_id, sale.id, quantity, created_at, branches.shard_of(branch_id))
+                    sales_counters.record_sale(book_id, quantity, sale.total_price, created_at)
+                    sale_ids.append(sale.id)
+                    events.append((book_id, stock_quantity, -quantity, _sale_event(sale, book, current_user)))
+        except IntegrityError:
+            # Recorded by a concurrent sync of the same queue since the lookup above
+            recorded.update(_client_sale_ids([client_id]))
+            results.append({"client_id": client_id, "status": "duplicate", "sale_ids": recorded.get(client_id, [])})
+            continue
+        
+        recorded[client_id] = sale_ids
+        results.append({"client_id": client_id, "status": "created", "sale_ids": sale_ids})
+        for book_id, stock_quantity, delta, sale_event in events:
+            _, total_delta = stock_changes.get(book_id, (None, 0))
+            stock_changes[book_id] = (stock_quantity, total_delta + delta)
+            sale_events.append(sale_event)
+    
+    db.session.commit()
     
-    # Get book information
-    book = Book.query.get(sale.book_id) if sale.book_id else None
+    for changed_book_id, (stock_quantity, delta) in stock_changes.items():
+        stock_changed(changed_book_id, stock_quantity, delta, branch_id)
+    for sale_event in sale_events:
+        broker.publish('sale', sale_event)
     
     return jsonify({
-        "id": sale.id,
-        "book_id": sale.book_id,
-        "quantity": sale.quantity,
-        "unit_price": sale.unit_price,
-        "total_price": sale.total_price,
-        "user_id": sale.user_id,
-        "created_at": sale.created_at.isoformat(),
-        "book": {
-            "id": book.id,
-            "isbn": book.isbn,
-            "title": book.title
-        } if book else None,
-        "user": {
-            "id": user.id,
-            "username": user.username,
-            "real_name": user.real_name
-        } if user else None
+        "message": "Sales synced",
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "results": results
     }), 200
 
 @sales_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
+@retry_on_conflict
 def create_sale():
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
     
     data = request.get_json()
+    # Branch sales sell from the branch's own stock row, not the shared book row
+    branch_id = branches.current_branch_id()
     
     # Check if data has 'items' array for multiple books
     if data.get('items') and isinstance(data.get('items'), list):
@@ -92,7 +425,28 @@ def create_sale():
         if len(data.get('items')) == 0:
             return jsonify({"message": "No items provided in sale"}), 400
         
+        # One line per book: stock is checked per line, and a client_id sale has
+        # one row per (client_id, book_id)
+        book_ids = [item.get('book_id') for item in data['items'] if isinstance(item, dict)]
+        duplicate = next((book_id for index, book_id in enumerate(book_ids) if book_id in book_ids[:index]), None)
+        if duplicate is not None:
+            return jsonify({"message": f"Book with ID {duplicate} appears twice in the sale"}), 400
+        
+        # A till that timed out may queue the same sale for /sync; both carry its client_id
+        client_id = data.get('client_id')
+        if client_id is not None and not (isinstance(client_id, str) and 0 < len(client_id) <= 64):
+            return jsonify({"message": "client_id must be a string of at most 64 characters"}), 400
+        if client_id:
+            recorded = _client_sale_ids([client_id])
+            if recorded:
+                return jsonify({
+                    "message": "Sale already recorded",
+                    "sale_ids": recorded[client_id]
+                }), 200
+        
         sale_ids = []
+        stock_changes = {}
+        sale_events = []
         
         for item in data['items']:
             # Validate required fields for each item
@@ -105,14 +459,16 @@ def create_sale():
             book_id = item.get('book_id')
             quantity = int(item.get('quantity'))
             
-            book = Book.query.get(book_id)
+            book = lookups.get_book(book_id)
             
             if not book:
                 return jsonify({"message": f"Book with ID {book_id} not found"}), 404
             
             # Check if enough stock
-            if book.stock_quantity < quantity:
-                return jsonify({"message": f"Not enough stock available for book: {book.title}. Available: {book.stock_quantity}"}), 400
+            stock = branches.stock_holder(book, branch_id)
+            available = stock.stock_quantity if stock else 0
+            if available < quantity:
+                return jsonify({"message": f"Not enough stock available for book: {book.title}. Available: {available}"}), 400
             
             # Calculate total price
             unit_price = item.get('unit_price', book.retail_price)
@@ -124,27 +480,40 @@ def create_sale():
                 quantity=quantity,
                 unit_price=unit_price,
                 total_price=total_price,
-                user_id=current_user_id
+                user_id=current_user_id,
+                branch_id=branch_id,
+                client_id=client_id
             )
             
             # Reduce book stock
-            book.stock_quantity -= quantity
+            stock_quantity = branches.move_stock(stock, -quantity)
+            _, delta = stock_changes.get(book.id, (None, 0))
+            stock_changes[book.id] = (stock_quantity, delta - quantity)
             
             # Create financial transaction record for this item
             transaction = FinancialTransaction(
                 transaction_type=TransactionType.INCOME,
                 description=f"Book sale: {quantity} copies of {book.title}",
                 amount=total_price,
-                user_id=current_user_id
+                user_id=current_user_id,
+                branch_id=branch_id
             )
             
             db.session.add(sale)
             db.session.add(transaction)
             db.session.flush()
+            costing.consume(book.id, sale.id, quantity, sale.created_at, branches.shard_of(branch_id))
+            sales_counters.record_sale(book.id, quantity, sale.total_price, sale.created_at)
             sale_ids.append(sale.id)
+            sale_events.append(_sale_event(sale, book, current_user))
         
         db.session.commit()
         
+        for changed_book_id, (stock_quantity, delta) in stock_changes.items():
+            stock_changed(changed_book_id, stock_quantity, delta, branch_id)
+        for sale_event in sale_events:
+            broker.publish('sale', sale_event)
+        
         return jsonify({
             "message": "Sales created successfully",
             "sale_ids": sale_ids
@@ -161,13 +530,14 @@ def create_sale():
         book_id = data.get('book_id')
         quantity = int(data.get('quantity'))
         
-        book = Book.query.get(book_id)
+        book = lookups.get_book(book_id)
         
         if not book:
             return jsonify({"message": "Book not found"}), 404
         
         # Check if enough stock
-        if book.stock_quantity < quantity:
+        stock = branches.stock_holder(book, branch_id)
+        if not stock or stock.stock_quantity < quantity:
             return jsonify({"message": "Not enough stock available"}), 400
         
         # Calculate total price
@@ -180,25 +550,34 @@ def create_sale():
             quantity=quantity,
             unit_price=unit_price,
             total_price=total_price,
-            user_id=current_user_id
+            user_id=current_user_id,
+            branch_id=branch_id
         )
         
         # Reduce book stock
-        book.stock_quantity -= quantity
+        stock_quantity = branches.move_stock(stock, -quantity)
         
         # Create financial transaction record
         transaction = FinancialTransaction(
             transaction_type=TransactionType.INCOME,
             description=f"Book sale: {quantity} copies of {book.title}",
             amount=total_price,
-            user_id=current_user_id
+            user_id=current_user_id,
+            branch_id=branch_id
         )
         
         db.session.add(sale)
         db.session.add(transaction)
+        db.session.flush()
+        costing.consume(book.id, sale.id, quantity, sale.created_at, branches.shard_of(branch_id))
+        sales_counters.record_sale(book.id, quantity, sale.total_price, sale.created_at)
+        sale_event = _sale_event(sale, book, current_user)
         db.session.commit()
         
+        stock_changed(sale_event["book_id"], stock_quantity, -quantity, branch_id)
+        broker.publish('sale', sale_event)
+        
         return jsonify({
             "message": "Sale created successfully",
-            "id": sale.id
+            "id": sale_event["id"]
         }), 201 
\ No newline at end of file
@@ -1,14 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.models import db, User, UserRole
+from sqlalchemy import select, func
+from models.models import db, User, UserRole, Branch, BookSale, BookSaleArchive, BookPurchase, PurchaseStatus
+from models import lookups
+from services.archive import archived_until
+from services.cache import TTLCache
+from services.compression import mark_cacheable
+from services.revocation import revocation_list
+from services import listing
 
 users_bp = Blueprint('users', __name__)
 
+# Stats are cached per requested period (and user, for a clerk's own stats)
+_stats_cache = TTLCache(maxsize=256)
+
 @users_bp.route('', methods=['GET'])
 @jwt_required()
 def get_users():
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -29,16 +39,124 @@ def get_users():
             "gender": user.gender,
             "age": user.age,
             "role": user.role.value,
-            "is_super_admin": user.is_super_admin()
+            "is_super_admin": user.is_super_admin(),
+            "branch_id": user.branch_id
         })
     
     return jsonify(user_list), 200
 
+def _sale_sources(start_datetime):
+    # (model, engine) pairs holding sales: the primary tables, the archive when the
+    # period reaches into it, and every sharded branch database
+    sources = [(BookSale, db.engine)]
+    archived_until_datetime = archived_until(BookSaleArchive)
+    if archived_until_datetime is not None and (start_datetime is None or archived_until_datetime >= start_datetime):
+        sources.append((BookSaleArchive, db.engine))
+    sources += [(BookSale, db.engines[bind_key]) for bind_key in current_app.config['BRANCH_BINDS'].values()]
+    return sources
+
+def _per_user(model, columns, start_datetime, end_datetime, user_id):
+    statement = select(model.user_id, *columns)
+    if start_datetime:
+        statement = statement.where(model.created_at >= start_datetime)
+    if end_datetime:
+        statement = statement.where(model.created_at <= end_datetime)
+    if user_id is not None:
+        statement = statement.where(model.user_id == user_id)
+    return statement.group_by(model.user_id)
+
+def user_stats(start_datetime=None, end_datetime=None, user_id=None):
+    """Sales and purchase totals per user, grouped in SQL over the user_id indexes."""
+    # Compared with the naive UTC timestamps of the database and archived_until()
+    start_datetime, end_datetime = listing.naive_utc(start_datetime), listing.naive_utc(end_datetime)
+    statement = select(User.id, User.username, User.real_name).order_by(User.id)
+    if user_id is not None:
+        statement = statement.where(User.id == user_id)
+    stats = {row.id: {
+        "user_id": row.id,
+        "username": row.username,
+        "real_name": row.real_name,
+        "sales_count": 0,
+        "units_sold": 0,
+        "revenue": 0.0,
+        "last_sale_at": None,
+        "purchase_count": 0,
+        "units_purchased": 0,
+        "purchase_amount": 0.0,
+        "last_purchase_at": None
+    } for row in db.session.execute(statement)}
+    
+    for model, engine in _sale_sources(start_datetime):
+        statement = _per_user(model, (func.count(model.id), func.sum(model.quantity), func.sum(model.total_price),
+                                      func.max(model.created_at)), start_datetime, end_datetime, user_id)
+        for row_user_id, sales_count, units, revenue, last_sale_at in db.session.execute(
+                statement, bind_arguments={'bind': engine}):
+            user = stats.get(row_user_id)
+            if user is None:
+                continue
+            user["sales_count"] += sales_count
+            user["units_sold"] += int(units or 0)
+            user["revenue"] += float(revenue or 0)
+            if last_sale_at is not None and (user["last_sale_at"] is None or last_sale_at > user["last_sale_at"]):
+                user["last_sale_at"] = last_sale_at
+    
+    # Cancelled orders do not count as volume
+    statement = _per_user(BookPurchase, (func.count(BookPurchase.id), func.sum(BookPurchase.quantity),
+                                         func.sum(BookPurchase.purchase_price * BookPurchase.quantity),
+                                         func.max(BookPurchase.created_at)), start_datetime, end_datetime, user_id) \
+        .where(BookPurchase.status != PurchaseStatus.CANCELLED)
+    for row_user_id, purchase_count, units, amount, last_purchase_at in db.session.execute(statement):
+        user = stats.get(row_user_id)
+        if user is None:
+            continue
+        user["purchase_count"] = purchase_count
+        user["units_purchased"] = int(units or 0)
+        user["purchase_amount"] = round(float(amount or 0), 2)
+        user["last_purchase_at"] = last_purchase_at
+    
+    for user in stats.values():
+        user["revenue"] = round(user["revenue"], 2)
+        last_activity = max((value for value in (user["last_sale_at"], user["last_purchase_at"]) if value),
+                            default=None)
+        for key, value in (("last_sale_at", user["last_sale_at"]), ("last_purchase_at", user["last_purchase_at"]),
+                           ("last_activity_at", last_activity)):
+            user[key] = value.isoformat() if value else None
+    return list(stats.values())
+
+@users_bp.route('/stats', methods=['GET'])
+@jwt_required()
+def get_user_stats():
+    # Super admins see every user, anyone else only themselves
+    current_user = lookups.get_user(get_jwt_identity())
+    
+    if not current_user:
+        return jsonify({"message": "User not found"}), 404
+    
+    filters = {}
+    for name in ('start_date', 'end_date'):
+        filters[name], error = listing.parse_datetime(request.args, name)
+        if error:
+            return jsonify({"message": error}), 400
+    user_id, error = listing.parse_number(request.args, 'user_id')
+    if error:
+        return jsonify({"message": error}), 400
+    
+    if not current_user.is_super_admin():
+        if user_id is not None and user_id != current_user.id:
+            return jsonify({"message": "Not authorized"}), 403
+        user_id = current_user.id
+    
+    mark_cacheable()
+    key = (filters['start_date'], filters['end_date'], user_id)
+    stats = _stats_cache.get_or_set(key, lambda: user_stats(filters['start_date'], filters['end_date'], user_id),
+                                    current_app.config['ANALYTICS_CACHE_TTL'])
+    return jsonify(stats), 200
+
 @users_bp.route('/<int:user_id>', methods=['GET'])
 @jwt_required()
 def get_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -47,7 +165,7 @@ def get_user(user_id):
     if not current_user.is_super_admin() and current_user_id != user_id:
         return jsonify({"message": "Not authorized"}), 403
     
-    user = User.query.get(user_id)
+    user = lookups.get_user(user_id)
     
     if not user:
         return jsonify({"message": "User not found"}), 404
@@ -60,14 +178,15 @@ def get_user(user_id):
         "gender": user.gender,
         "age": user.age,
         "role": user.role.value,
-        "is_super_admin": user.is_super_admin()
+        "is_super_admin": user.is_super_admin(),
+        "branch_id": user.branch_id
     }), 200
 
 @users_bp.route('', methods=['POST'])
 @jwt_required()
 def create_user():
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -85,12 +204,15 @@ def create_user():
             return jsonify({"message": f"Missing required field: {field}"}), 400
     
     # Check if username or employee_id already exists
-    if User.query.filter_by(username=data.get('username')).first():
+    if lookups.get_user_by_username(data.get('username')):
         return jsonify({"message": "Username already exists"}), 400
     
     if User.query.filter_by(employee_id=data.get('employee_id')).first():
         return jsonify({"message": "Employee ID already exists"}), 400
     
+    if data.get('branch_id') and not db.session.get(Branch, data.get('branch_id')):
+        return jsonify({"message": "Branch not found"}), 400
+    
     # Create new user
     new_user = User(
         username=data.get('username'),
@@ -98,7 +220,8 @@ def create_user():
         employee_id=data.get('employee_id'),
         gender=data.get('gender'),
         age=data.get('age'),
-        role=UserRole.ADMIN
+        role=UserRole.ADMIN,
+        branch_id=data.get('branch_id')
     )
     
     new_user.set_password(data.get('password'))
@@ -115,7 +238,7 @@ def create_user():
 @jwt_required()
 def update_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -124,7 +247,7 @@ def update_user(user_id):
     if not current_user.is_super_admin() and current_user_id != user_id:
         return jsonify({"message": "Not authorized"}), 403
     
-    user = User.query.get(user_id)
+    user = lookups.get_user(user_id)
     
     if not user:
         return jsonify({"message": "User not found"}), 404
@@ -145,7 +268,7 @@ def update_user(user_id):
     if current_user.is_super_admin():
         if data.get('username'):
             # Check if new username already exists (except current user)
-            existing_user = User.query.filter_by(username=data.get('username')).first()
+            existing_user = lookups.get_user_by_username(data.get('username'))
             if existing_user and existing_user.id != user_id:
                 return jsonify({"message": "Username already exists"}), 400
             user.username = data.get('username')
@@ -156,6 +279,12 @@ def update_user(user_id):
             if existing_user and existing_user.id != user_id:
                 return jsonify({"message": "Employee ID already exists"}), 400
             user.employee_id = data.get('employee_id')
+        
+        # Takes effect on the user's next login
+        if 'branch_id' in data:
+            if data['branch_id'] and not db.session.get(Branch, data['branch_id']):
+                return jsonify({"message": "Branch not found"}), 400
+            user.branch_id = data['branch_id'] or None
     
     db.session.commit()
     
@@ -165,7 +294,7 @@ def update_user(user_id):
 @jwt_required()
 def delete_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -178,7 +307,7 @@ def delete_user(user_id):
     if current_user_id == user_id:
         return jsonify({"message": "Cannot delete your own account"}), 400
     
-    user = User.query.get(user_id)
+    user = lookups.get_user(user_id)
     
     if not user:
         return jsonify({"message": "User not found"}), 404
@@ -187,6 +316,8 @@ def delete_user(user_id):
     if user.is_super_admin():
         return jsonify({"message": "Cannot delete super admin account"}), 400
     
+    # Tokens already issued to the user stop working right away, not at expiry
+    revocation_list.revoke_user(user.id)
     db.session.delete(user)
     db.session.commit()
     
@@ -196,7 +327,7 @@ def delete_user(user_id):
 @jwt_required()
 def update_profile():
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -230,7 +361,7 @@ def update_profile():
 @jwt_required()
 def reset_user_password(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = lookups.get_user(current_user_id)
     
     if not current_user:
         return jsonify({"message": "User not found"}), 404
@@ -239,7 +370,7 @@ def reset_user_password(user_id):
     if not current_user.is_super_admin():
         return jsonify({"message": "Not authorized"}), 403
     
-    user = User.query.get(user_id)
+    user = lookups.get_user(user_id)
     
     if not user:
         return jsonify({"message": "User not found"}), 404
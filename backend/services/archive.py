@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, delete, func
+from models.models import db, BookSale, BookSaleArchive, FinancialTransaction, FinancialTransactionArchive
+
+# (hot model, archive model) pairs moved by the archival job
+ARCHIVED_MODELS = [
+    (BookSale, BookSaleArchive),
+    (FinancialTransaction, FinancialTransactionArchive),
+]
+
+
+def archive_cutoff(retention_months, now=None):
+    """First day of the oldest month that stays in the hot tables."""
+    now = now or datetime.utcnow()
+    month_index = now.year * 12 + (now.month - 1) - retention_months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def archive_rows(model, archive_model, cutoff, batch_size):
+    """Move rows created before cutoff into the archive table, one batch per transaction."""
+    columns = [column.name for column in archive_model.__table__.columns]
+    source_columns = [model.__table__.c[name] for name in columns]
+    moved = 0
+
+    while True:
+        ids = db.session.execute(
+            select(model.id).where(model.created_at < cutoff).order_by(model.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        db.session.execute(
+            insert(archive_model.__table__).from_select(
+                columns, select(*source_columns).where(model.id.in_(ids))
+            )
+        )
+        db.session.execute(delete(model.__table__).where(model.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+
+    return moved
+
+
+def archived_until(archive_model):
+    # Newest archived timestamp; queries starting after it never need the archive
+    return db.session.query(func.max(archive_model.created_at)).scalar()
+
+
+archive_cli = AppGroup('archive', help='Move old sales and transactions to archive tables.')
+
+
+@archive_cli.command('run')
+@click.option('--months', type=int, default=None, help='Months kept in the hot tables (default ARCHIVE_RETENTION_MONTHS).')
+@click.option('--batch-size', type=int, default=5000, show_default=True)
+def run_command(months, batch_size):
+    """Archive whole months older than the retention window (run from cron)."""
+    if months is None:
+        months = current_app.config['ARCHIVE_RETENTION_MONTHS']
+    cutoff = archive_cutoff(months)
+
+    for model, archive_model in ARCHIVED_MODELS:
+        moved = archive_rows(model, archive_model, cutoff, batch_size)
+        click.echo(f'{model.__tablename__}: {moved} rows archived before {cutoff.date().isoformat()}.')
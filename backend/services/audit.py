@@ -0,0 +1,245 @@
+import atexit
+import enum
+import glob
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+import click
+from flask import has_request_context, current_app
+from flask.cli import AppGroup
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, inspect, insert
+from models.models import db, AuditLog, Book, User, BookPurchase
+from models.routing import RoutingSession
+
+AUDITED_MODELS = (Book, User, BookPurchase)
+REDACTED_FIELDS = {'password_hash'}
+
+
+def _json_default(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _current_user_id():
+    if not has_request_context():
+        return None
+    try:
+        identity = get_jwt_identity()
+    except Exception:
+        return None
+    return int(identity) if identity is not None else None
+
+
+def _column_values(obj):
+    mapper = inspect(obj).mapper
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in mapper.column_attrs
+        if attr.key not in REDACTED_FIELDS
+    }
+
+
+def _changed_values(obj):
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if not history.has_changes():
+            continue
+        if attr.key in REDACTED_FIELDS:
+            changes[attr.key] = '[changed]'
+        else:
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            changes[attr.key] = [old, new]
+    return changes
+
+
+def _entry(action, obj, changes):
+    return {
+        "user_id": _current_user_id(),
+        "action": action,
+        "entity": obj.__tablename__,
+        "entity_id": obj.id,
+        "changes": json.dumps(changes, default=_json_default),
+        "created_at": datetime.utcnow()
+    }
+
+
+def _collect(session, flush_context):
+    # Runs after each flush: ids of new rows are known and attribute history is still intact
+    pending = session.info.setdefault('audit_pending', [])
+    for obj in session.new:
+        if isinstance(obj, AUDITED_MODELS):
+            pending.append(_entry('create', obj, _column_values(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, AUDITED_MODELS) and session.is_modified(obj, include_collections=False):
+            changes = _changed_values(obj)
+            if changes:
+                pending.append(_entry('update', obj, changes))
+    for obj in session.deleted:
+        if isinstance(obj, AUDITED_MODELS):
+            pending.append(_entry('delete', obj, _column_values(obj)))
+
+
+def _on_commit(session):
+    pending = session.info.pop('audit_pending', None)
+    if pending:
+        writer.enqueue(pending)
+
+
+def _on_rollback(session):
+    if session.in_nested_transaction():
+        # Only a savepoint rolled back: drop the entries collected inside it, keep the rest
+        mark = session.info.get('audit_savepoints', {}).pop(session.get_nested_transaction(), None)
+        if mark is not None:
+            del session.info.get('audit_pending', [])[mark:]
+        return
+    session.info.pop('audit_pending', None)
+    session.info.pop('audit_savepoints', None)
+
+
+def _on_transaction_create(session, transaction):
+    # Remember how many entries were pending when a savepoint began
+    if transaction.nested:
+        session.info.setdefault('audit_savepoints', {})[transaction] = len(session.info.get('audit_pending', []))
+
+
+def _on_transaction_end(session, transaction):
+    if transaction.nested:
+        session.info.get('audit_savepoints', {}).pop(transaction, None)
+
+
+class AuditWriter:
+    """Buffers audit entries in a bounded queue and bulk-inserts them from a background thread.
+
+    Entries that cannot be queued (queue full) or inserted (database error)
+    are appended as JSON lines to AUDIT_SPILL_PATH; 'flask audit replay'
+    loads them back.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self._queue = queue.Queue(maxsize=app.config['AUDIT_QUEUE_SIZE'])
+        atexit.register(self.flush)
+
+    def _spill(self, entries):
+        path = self._app.config['AUDIT_SPILL_PATH']
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as spill_file:
+            for entry in entries:
+                spill_file.write(json.dumps(entry, default=_json_default) + '\n')
+
+    def _write(self, entries):
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(insert(AuditLog.__table__), entries)
+        except Exception:
+            self._app.logger.exception('Audit flush failed, spilling %d entries to disk', len(entries))
+            self._spill(entries)
+
+    def _drain(self, limit):
+        entries = []
+        while len(entries) < limit:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    def _run(self):
+        config = self._app.config
+        while True:
+            try:
+                first = self._queue.get(timeout=config['AUDIT_FLUSH_INTERVAL'])
+            except queue.Empty:
+                continue
+            entries = [first] + self._drain(config['AUDIT_BATCH_SIZE'] - 1)
+            self._write(entries)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                    self._thread.start()
+
+    def enqueue(self, entries):
+        if self._app is None:
+            return
+        self._ensure_started()
+        overflow = []
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                overflow.append(entry)
+        if overflow:
+            # Never block the request on auditing
+            self._spill(overflow)
+
+    def flush(self):
+        """Synchronously write everything still queued."""
+        if self._queue is None:
+            return
+        entries = self._drain(self._queue.qsize())
+        if entries:
+            self._write(entries)
+
+
+writer = AuditWriter()
+
+
+def init_app(app):
+    writer.init_app(app)
+    if not event.contains(RoutingSession, 'after_flush', _collect):
+        event.listen(RoutingSession, 'after_flush', _collect)
+        event.listen(RoutingSession, 'after_commit', _on_commit)
+        event.listen(RoutingSession, 'after_rollback', _on_rollback)
+        event.listen(RoutingSession, 'after_transaction_create', _on_transaction_create)
+        event.listen(RoutingSession, 'after_transaction_end', _on_transaction_end)
+
+
+audit_cli = AppGroup('audit', help='Audit log maintenance.')
+
+
+@audit_cli.command('replay')
+def replay_command():
+    """Insert entries spilled to AUDIT_SPILL_PATH.
+
+    The spill file is renamed before it is read, so workers spilling meanwhile
+    start a new file instead of losing lines to a truncate. A renamed batch is
+    deleted once inserted; one left by a failed replay is retried next time.
+    """
+    path = current_app.config['AUDIT_SPILL_PATH']
+    try:
+        os.rename(path, f'{path}.{datetime.utcnow():%Y%m%d%H%M%S%f}')
+    except FileNotFoundError:
+        pass
+
+    count = 0
+    for batch_path in sorted(glob.glob(glob.escape(path) + '.*')):
+        with open(batch_path, encoding='utf-8') as spill_file:
+            entries = [json.loads(line) for line in spill_file if line.strip()]
+        for entry in entries:
+            entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+        if entries:
+            with db.engine.begin() as connection:
+                connection.execute(insert(AuditLog.__table__), entries)
+        os.remove(batch_path)
+        count += len(entries)
+    click.echo(f'{count} audit entries replayed.')
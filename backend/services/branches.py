@@ -0,0 +1,123 @@
+import click
+from flask import request, jsonify, g, current_app
+from flask.cli import AppGroup
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from models.models import db, Book, Branch, BranchStock
+from models.routing import BRANCH_TABLES, branch_bind
+from services.schema import upgrade
+
+BRANCH_HEADER = 'X-Branch-Id'
+
+# Central stock moves in place and only while it stays non-negative; like the sales
+# counters it bypasses the ORM so it does not change Book.version (the book's ETag)
+_MOVE_CENTRAL_STOCK = update(Book.__table__).where(
+    Book.__table__.c.id == bindparam('book_id'),
+    Book.__table__.c.stock_quantity + bindparam('delta') >= 0
+).values(stock_quantity=Book.__table__.c.stock_quantity + bindparam('delta'))
+
+
+def _resolve_branch_id():
+    # Staff of a branch are pinned to it by the branch_id claim of their token;
+    # central staff may act for a branch by sending the X-Branch-Id header
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+    except Exception:
+        claims = {}
+    branch_id = claims.get('branch_id')
+    if branch_id is None and claims and request.headers.get(BRANCH_HEADER):
+        branch_id = int(request.headers[BRANCH_HEADER])
+    return branch_id
+
+
+def current_branch_id():
+    """Branch the current request acts for, None for central (unscoped) access."""
+    if 'branch_id' not in g:
+        g.branch_id = _resolve_branch_id()
+    return g.branch_id
+
+
+def is_sharded(branch_id):
+    """True when the branch's sales and ledger live on its own database."""
+    return branch_id is not None and branch_id in current_app.config['BRANCH_BINDS']
+
+
+def shard_of(branch_id):
+    """branch_id if the branch has its own database, else None (the primary)."""
+    return branch_id if is_sharded(branch_id) else None
+
+
+def stock_holder(book, branch_id, create=False):
+    """Row holding the stock a branch sells from: its BranchStock row, or the book itself
+    (central stock) without a branch. Both expose stock_quantity. Does not commit."""
+    if branch_id is None:
+        return book
+    stock = db.session.get(BranchStock, (branch_id, book.id))
+    if stock is None and create:
+        stock = BranchStock(branch_id=branch_id, book_id=book.id, stock_quantity=0)
+        db.session.add(stock)
+    return stock
+
+
+def move_stock(stock, delta):
+    """Add delta (negative for copies leaving) to a stock_holder row and return its new
+    stock_quantity. Does not commit.
+
+    Central stock is changed with one UPDATE ... SET stock_quantity = stock_quantity + delta,
+    so sales and receipts do not invalidate the ETag of a client editing the book. When a
+    concurrent sale left too few copies it raises StaleDataError, like a lost race on a
+    versioned row, and @retry_on_conflict re-runs the view. Branch rows keep their version check.
+    """
+    if not isinstance(stock, Book):
+        stock.stock_quantity += delta
+        return stock.stock_quantity
+    if db.session.execute(_MOVE_CENTRAL_STOCK, {'book_id': stock.id, 'delta': delta}).rowcount != 1:
+        raise StaleDataError(f'Not enough central stock left for book {stock.id}')
+    stock_quantity = db.session.scalar(select(Book.stock_quantity).where(Book.id == stock.id))
+    set_committed_value(stock, 'stock_quantity', stock_quantity)
+    return stock_quantity
+
+
+def init_app(app):
+    @app.before_request
+    def resolve_branch():
+        if request.method == 'OPTIONS':
+            return None
+        header = request.headers.get(BRANCH_HEADER)
+        if header is None and not app.config['BRANCH_BINDS']:
+            return None  # Resolved lazily by the views that need it
+
+        try:
+            branch_id = current_branch_id()
+        except ValueError:
+            return jsonify({"message": f"Invalid {BRANCH_HEADER} header"}), 400
+        if header is not None and branch_id is not None and db.session.get(Branch, branch_id) is None:
+            return jsonify({"message": "Branch not found"}), 404
+
+        # Picked up by RoutingSession.get_bind for the branch tables
+        if is_sharded(branch_id):
+            g.branch_bind = branch_bind(branch_id)
+        return None
+
+
+branches_cli = AppGroup('branches', help='Store branches and their databases.')
+
+
+@branches_cli.command('create-schema')
+@click.argument('branch_id', type=int)
+def create_schema_command(branch_id):
+    """Create (or bring up to date) the sharded branch tables on the branch's own database.
+
+    Foreign keys are left out: books and users stay on the primary.
+    """
+    bind_key = branch_bind(branch_id)
+    if branch_id not in current_app.config['BRANCH_BINDS']:
+        raise click.ClickException(f'No database configured for branch {branch_id} (BRANCH_DATABASE_URIS).')
+
+    engine = db.engines[bind_key]
+    tables = [table for table in db.metadata.sorted_tables if table.name in BRANCH_TABLES]
+    upgrade(engine, tables, foreign_keys=False)
+    click.echo(f'Branch tables ready on {engine.url.render_as_string(hide_password=True)}.')
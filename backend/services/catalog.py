@@ -0,0 +1,199 @@
+import bisect
+import threading
+import time
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import select
+from models.models import db, Book
+
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+class CatalogEntry:
+    __slots__ = ('id', 'isbn', 'title', 'author', 'publisher', 'retail_price',
+                 'stock_quantity', 'created_at', 'updated_at', 'version', 'units_sold', 'revenue', 'last_sold_at')
+
+    def __init__(self, book):
+        self.id = book.id
+        self.isbn = book.isbn
+        self.title = book.title
+        self.author = book.author
+        self.publisher = book.publisher
+        self.retail_price = book.retail_price
+        self.stock_quantity = book.stock_quantity
+        self.created_at = book.created_at
+        self.updated_at = book.updated_at
+        self.version = book.version
+        self.units_sold = book.units_sold
+        self.revenue = book.revenue
+        self.last_sold_at = book.last_sold_at
+
+    def tokens(self):
+        words = f'{self.title} {self.author} {self.publisher}'.lower().split()
+        return set(words) | {self.title.lower(), self.isbn.lower(), self.isbn.replace('-', '')}
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "isbn": self.isbn,
+            "title": self.title,
+            "author": self.author,
+            "publisher": self.publisher,
+            "retail_price": self.retail_price,
+            "stock_quantity": self.stock_quantity,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "version": self.version,
+            "units_sold": self.units_sold,
+            "revenue": self.revenue,
+            "last_sold_at": self.last_sold_at.isoformat() if self.last_sold_at else None
+        }
+
+
+class HotCatalog:
+    """In-process copy of the book catalog keyed by id and ISBN.
+
+    Changes made by other processes are pulled every CATALOG_REFRESH_INTERVAL
+    seconds by loading only rows updated since the last seen watermark, less a
+    minute, so rows committed late by a slow transaction are not missed. The
+    same poll reads the list of book ids: entries whose book was deleted are
+    dropped, and books the watermark missed entirely are loaded. A full reload
+    every CATALOG_RELOAD_INTERVAL seconds remains as a backstop. Writes in this
+    process call invalidate() so the next lookup reads the row back from the
+    database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_isbn = {}
+        self._tokens = []
+        self._tokens_dirty = True
+        self._stale_ids = set()
+        self._watermark = None
+        self._loaded_at = None
+        self._refreshed_at = None
+
+    def _store(self, book):
+        entry = CatalogEntry(book)
+        previous = self._by_id.get(entry.id)
+        if previous is not None and previous.isbn != entry.isbn:
+            self._by_isbn.pop(previous.isbn, None)
+        self._by_id[entry.id] = entry
+        self._by_isbn[entry.isbn] = entry
+        self._tokens_dirty = True
+        if entry.updated_at and (self._watermark is None or entry.updated_at > self._watermark):
+            self._watermark = entry.updated_at
+
+    def _drop(self, book_id):
+        entry = self._by_id.pop(book_id, None)
+        if entry is not None:
+            self._by_isbn.pop(entry.isbn, None)
+            self._tokens_dirty = True
+
+    def reload(self):
+        books = Book.query.all()
+        with self._lock:
+            self._by_id = {}
+            self._by_isbn = {}
+            self._stale_ids = set()
+            self._watermark = None
+            for book in books:
+                self._store(book)
+            self._loaded_at = self._refreshed_at = time.monotonic()
+
+    def refresh(self):
+        config = current_app.config
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at > config['CATALOG_RELOAD_INTERVAL']:
+            self.reload()
+            return
+
+        with self._lock:
+            stale_ids = self._stale_ids
+            self._stale_ids = set()
+            poll = now - self._refreshed_at > config['CATALOG_REFRESH_INTERVAL']
+            if poll:
+                self._refreshed_at = now
+            watermark = self._watermark
+
+        if not stale_ids and not poll:
+            return
+
+        changed = []
+        book_ids = None
+        if poll:
+            query = Book.query
+            if watermark is not None:
+                query = query.filter(Book.updated_at >= watermark - REFRESH_OVERLAP)
+            changed = query.all()
+            book_ids = set(db.session.execute(select(Book.id)).scalars())
+        changed_ids = {book.id for book in changed}
+        with self._lock:
+            known_ids = set(self._by_id)
+        missing_ids = stale_ids - changed_ids
+        if book_ids is not None:
+            missing_ids |= book_ids - known_ids - changed_ids
+        if missing_ids:
+            changed.extend(Book.query.filter(Book.id.in_(missing_ids)).all())
+
+        with self._lock:
+            found_ids = {book.id for book in changed}
+            deleted_ids = stale_ids - found_ids
+            if book_ids is not None:
+                deleted_ids |= set(self._by_id) - book_ids - found_ids
+            for book_id in deleted_ids:
+                self._drop(book_id)
+            for book in changed:
+                self._store(book)
+
+    def invalidate(self, *book_ids):
+        with self._lock:
+            self._stale_ids.update(book_ids)
+
+    def get(self, book_id):
+        self.refresh()
+        return self._by_id.get(book_id)
+
+    def get_by_isbn(self, isbn):
+        self.refresh()
+        return self._by_isbn.get(isbn)
+
+    def typeahead(self, term, limit=20):
+        """Match entries whose title, author, publisher words or ISBN start with term's first word."""
+        self.refresh()
+        words = term.lower().split()
+        if not words:
+            return []
+
+        with self._lock:
+            if self._tokens_dirty:
+                self._tokens = sorted(
+                    (token, entry.id) for entry in self._by_id.values() for token in entry.tokens()
+                )
+                self._tokens_dirty = False
+            tokens = self._tokens
+            by_id = self._by_id
+
+        prefix = words[0]
+        matches = []
+        seen = set()
+        index = bisect.bisect_left(tokens, (prefix,))
+        while index < len(tokens) and len(matches) < limit:
+            token, book_id = tokens[index]
+            if not token.startswith(prefix):
+                break
+            index += 1
+            entry = by_id.get(book_id)
+            if entry is None or book_id in seen:
+                continue
+            seen.add(book_id)
+            # Remaining words narrow the match anywhere in the entry
+            haystack = f'{entry.isbn} {entry.title} {entry.author} {entry.publisher}'.lower()
+            if all(word in haystack for word in words[1:]):
+                matches.append(entry)
+        return matches
+
+
+catalog = HotCatalog()
@@ -0,0 +1,54 @@
+"""Optimistic concurrency for the versioned rows (Book, BookPurchase, BranchStock).
+
+Their version column is the mapper's version_id_col: every ORM UPDATE runs as
+UPDATE ... WHERE id = ? AND version = <version read> and bumps it, so a
+concurrent write is detected at flush time as a StaleDataError instead of
+being silently overwritten, without holding row locks while the view runs.
+"""
+from functools import wraps
+
+from flask import request, jsonify, current_app
+from sqlalchemy.orm.exc import StaleDataError
+from models.models import db
+
+
+def retry_on_conflict(view):
+    """Re-run the view when its flush lost a race on a versioned row.
+
+    The transaction is rolled back and the view reads the rows again; after
+    OPTIMISTIC_RETRIES attempts the client gets a 409. Views must not have
+    side effects before their commit (events are published after it).
+    Apply below @idempotent so a replayed key sees only the final response.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        retries = current_app.config['OPTIMISTIC_RETRIES']
+        for attempt in range(retries + 1):
+            try:
+                return view(*args, **kwargs)
+            except StaleDataError:
+                db.session.rollback()
+                current_app.logger.info('Concurrent update in %s, attempt %d', request.endpoint, attempt + 1)
+        return jsonify({"message": "The record was modified concurrently, please try again"}), 409
+    return wrapper
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def precondition_failed(version):
+    """412 response when If-Match does not name the row's current version, else None.
+
+    Without If-Match the write goes ahead (last writer wins on the fields it sets).
+    """
+    if_match = request.headers.get('If-Match')
+    if if_match is None or if_match.strip() == '*':
+        return None
+    tags = [tag.strip().removeprefix('W/') for tag in if_match.split(',')]
+    if etag(version) in tags:
+        return None
+    return jsonify({
+        "message": "The record was modified since it was read",
+        "version": version
+    }), 412, {'ETag': etag(version)}
@@ -0,0 +1,168 @@
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, insert, case, select, true, union
+from models.models import db, Book, BookPurchase, PurchaseStatus, InventoryCostLayer, CostLayerConsumption
+
+
+def _costed_stock(book_id):
+    return db.session.query(func.coalesce(func.sum(InventoryCostLayer.remaining), 0)) \
+        .filter(InventoryCostLayer.book_id == book_id, InventoryCostLayer.remaining > 0) \
+        .scalar()
+
+
+def _latest_average_cost(book_id):
+    # The moving average only changes on receipts, so the newest layer carries it
+    return db.session.query(InventoryCostLayer.average_cost) \
+        .filter(InventoryCostLayer.book_id == book_id) \
+        .order_by(InventoryCostLayer.received_at.desc(), InventoryCostLayer.id.desc()) \
+        .limit(1).scalar()
+
+
+def receive(book_id, quantity, unit_cost, purchase_id=None, received_at=None):
+    """Open a cost layer for stock received into inventory. Does not commit."""
+    on_hand = _costed_stock(book_id)
+    previous_average = _latest_average_cost(book_id)
+    if previous_average is None or on_hand + quantity <= 0:
+        average_cost = unit_cost
+    else:
+        average_cost = (on_hand * previous_average + quantity * unit_cost) / (on_hand + quantity)
+
+    layer = InventoryCostLayer(
+        book_id=book_id,
+        purchase_id=purchase_id,
+        quantity=quantity,
+        remaining=quantity,
+        unit_cost=unit_cost,
+        average_cost=average_cost,
+        received_at=received_at or datetime.utcnow()
+    )
+    db.session.add(layer)
+    return layer
+
+
+def consume(book_id, sale_id, quantity, consumed_at=None, branch_id=None):
+    """Consume quantity units from the oldest open layers for a sale. Does not commit.
+
+    branch_id is the sale's database when it lives on a sharded branch (None otherwise).
+    """
+    consumed_at = consumed_at or datetime.utcnow()
+    average_cost = _latest_average_cost(book_id) or 0
+    layers = InventoryCostLayer.query \
+        .filter(InventoryCostLayer.book_id == book_id, InventoryCostLayer.remaining > 0) \
+        .order_by(InventoryCostLayer.received_at, InventoryCostLayer.id) \
+        .with_for_update()
+
+    remaining = quantity
+    for layer in layers:
+        if remaining <= 0:
+            break
+        taken = min(layer.remaining, remaining)
+        layer.remaining -= taken
+        remaining -= taken
+        db.session.add(CostLayerConsumption(
+            layer_id=layer.id, sale_id=sale_id, branch_id=branch_id, book_id=book_id, quantity=taken,
+            unit_cost=layer.unit_cost, average_cost=average_cost, consumed_at=consumed_at
+        ))
+
+    if remaining > 0:
+        # Stock that predates cost tracking: cost it at the running average
+        db.session.add(CostLayerConsumption(
+            layer_id=None, sale_id=sale_id, branch_id=branch_id, book_id=book_id, quantity=remaining,
+            unit_cost=average_cost, average_cost=average_cost, consumed_at=consumed_at
+        ))
+
+
+def valuation_statement(as_of, since=None):
+    """Per-book stock units, FIFO and weighted-average value as of as_of, and COGS.
+
+    COGS covers consumptions in (since, as_of], or everything up to as_of
+    without since. FIFO value is received cost minus FIFO cost consumed;
+    average value is received cost minus average cost consumed. Uncosted
+    consumptions (layer_id None, sales beyond the costed stock) never came out
+    of a layer, so they only count in COGS.
+    """
+    received = select(
+        InventoryCostLayer.book_id.label('book_id'),
+        func.sum(InventoryCostLayer.quantity).label('units_in'),
+        func.sum(InventoryCostLayer.quantity * InventoryCostLayer.unit_cost).label('cost_in')
+    ).where(InventoryCostLayer.received_at <= as_of) \
+        .group_by(InventoryCostLayer.book_id).subquery()
+
+    in_period = CostLayerConsumption.consumed_at > since if since else true()
+    costed = CostLayerConsumption.layer_id.isnot(None)
+    consumed = select(
+        CostLayerConsumption.book_id.label('book_id'),
+        func.sum(case((costed, CostLayerConsumption.quantity), else_=0)).label('units_out'),
+        func.sum(case((costed, CostLayerConsumption.quantity * CostLayerConsumption.unit_cost), else_=0)).label('fifo_out'),
+        func.sum(case((costed, CostLayerConsumption.quantity * CostLayerConsumption.average_cost), else_=0)).label('average_out'),
+        func.sum(case((in_period, CostLayerConsumption.quantity * CostLayerConsumption.unit_cost), else_=0)).label('fifo_cogs'),
+        func.sum(case((in_period, CostLayerConsumption.quantity * CostLayerConsumption.average_cost), else_=0)).label('average_cogs')
+    ).where(CostLayerConsumption.consumed_at <= as_of) \
+        .group_by(CostLayerConsumption.book_id).subquery()
+
+    # Books with layers, consumptions or both (a book sold before any receipt has only COGS)
+    book_ids = union(select(received.c.book_id), select(consumed.c.book_id)).subquery()
+
+    return select(
+        book_ids.c.book_id, Book.isbn, Book.title,
+        (func.coalesce(received.c.units_in, 0) - func.coalesce(consumed.c.units_out, 0)).label('units'),
+        (func.coalesce(received.c.cost_in, 0) - func.coalesce(consumed.c.fifo_out, 0)).label('fifo_value'),
+        (func.coalesce(received.c.cost_in, 0) - func.coalesce(consumed.c.average_out, 0)).label('average_value'),
+        func.coalesce(consumed.c.fifo_cogs, 0).label('fifo_cogs'),
+        func.coalesce(consumed.c.average_cogs, 0).label('average_cogs')
+    ).outerjoin(received, received.c.book_id == book_ids.c.book_id) \
+        .outerjoin(consumed, consumed.c.book_id == book_ids.c.book_id) \
+        .outerjoin(Book, Book.id == book_ids.c.book_id) \
+        .order_by(book_ids.c.book_id)
+
+
+inventory_cli = AppGroup('inventory', help='Inventory cost layers.')
+
+
+@inventory_cli.command('open-layers')
+def open_layers_command():
+    """Open a layer for stock not yet covered by cost layers (run once after upgrading).
+
+    The layer is costed at the quantity-weighted average price of the book's
+    received purchases; books without any are skipped.
+    """
+    costed = dict(
+        db.session.query(InventoryCostLayer.book_id, func.sum(InventoryCostLayer.remaining))
+        .filter(InventoryCostLayer.remaining > 0)
+        .group_by(InventoryCostLayer.book_id)
+    )
+    purchase_costs = dict(
+        db.session.query(
+            BookPurchase.isbn,
+            func.sum(BookPurchase.purchase_price * BookPurchase.quantity) / func.sum(BookPurchase.quantity)
+        ).filter(BookPurchase.status == PurchaseStatus.ADDED_TO_INVENTORY)
+        .group_by(BookPurchase.isbn)
+    )
+
+    now = datetime.utcnow()
+    rows = []
+    skipped = 0
+    for book_id, isbn, stock_quantity in db.session.query(Book.id, Book.isbn, Book.stock_quantity).filter(Book.stock_quantity > 0):
+        uncosted = stock_quantity - (costed.get(book_id) or 0)
+        if uncosted <= 0:
+            continue
+        unit_cost = purchase_costs.get(isbn)
+        if unit_cost is None:
+            skipped += 1
+            continue
+        rows.append({
+            "book_id": book_id,
+            "purchase_id": None,
+            "quantity": uncosted,
+            "remaining": uncosted,
+            "unit_cost": float(unit_cost),
+            "average_cost": float(unit_cost),
+            "received_at": now
+        })
+
+    if rows:
+        db.session.execute(insert(InventoryCostLayer), rows)
+        db.session.commit()
+    click.echo(f'{len(rows)} opening layers created, {skipped} books skipped without purchase costs.')
@@ -0,0 +1,149 @@
+"""End-of-day (Z) reports.
+
+A closed day's totals never change, so they are computed once and frozen in
+daily_reports: by `flask zreport close` run from cron after midnight (UTC), or
+by the first request that asks for a closed day the job has not reached yet.
+Only the open day (today) is aggregated live. Like a till's Z report, sales
+synced by an offline till after its day was closed stay out of that report.
+"""
+import json
+from datetime import datetime, time, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from models.models import (db, Branch, BookSale, BookSaleArchive, DailyReport, FinancialTransaction,
+                           FinancialTransactionArchive, TransactionType, User)
+from models.routing import branch_bind
+from services.archive import archived_until
+from services import branches
+
+CENTRAL = 0  # DailyReport.branch_id of the unscoped report
+
+
+def _bind_arguments(model, branch_id):
+    # Outside a request RoutingSession has no g.branch_bind, so pick the branch database here
+    if model in (BookSale, FinancialTransaction) and branches.is_sharded(branch_id):
+        return {'bind': db.engines[branch_bind(branch_id)]}
+    return None
+
+
+def _models(hot_model, archive_model, start):
+    # The archive only when the day reaches into it
+    archived_until_datetime = archived_until(archive_model)
+    if archived_until_datetime is not None and archived_until_datetime >= start:
+        return [hot_model, archive_model]
+    return [hot_model]
+
+
+def compute_day(business_date, branch_id=CENTRAL):
+    """Totals of one UTC day, grouped in SQL; branch_id CENTRAL for every branch."""
+    start = datetime.combine(business_date, time.min)
+    end = start + timedelta(days=1)
+
+    clerks = {}
+    for model in _models(BookSale, BookSaleArchive, start):
+        statement = select(model.user_id, func.count(model.id), func.sum(model.quantity), func.sum(model.total_price)) \
+            .where(model.created_at >= start, model.created_at < end).group_by(model.user_id)
+        if branch_id != CENTRAL:
+            statement = statement.where(model.branch_id == branch_id)
+        for user_id, sales_count, units_sold, revenue in db.session.execute(
+                statement, bind_arguments=_bind_arguments(model, branch_id)):
+            clerk = clerks.setdefault(user_id, {"user_id": user_id, "sales_count": 0, "units_sold": 0, "revenue": 0})
+            clerk["sales_count"] += sales_count
+            clerk["units_sold"] += int(units_sold or 0)
+            clerk["revenue"] += float(revenue or 0)
+
+    totals = {TransactionType.INCOME: 0, TransactionType.EXPENSE: 0}
+    for model in _models(FinancialTransaction, FinancialTransactionArchive, start):
+        statement = select(model.transaction_type, func.sum(model.amount)) \
+            .where(model.created_at >= start, model.created_at < end).group_by(model.transaction_type)
+        if branch_id != CENTRAL:
+            statement = statement.where(model.branch_id == branch_id)
+        for transaction_type, amount in db.session.execute(statement, bind_arguments=_bind_arguments(model, branch_id)):
+            totals[transaction_type] += float(amount or 0)
+
+    # Names are frozen with the report, clerks may be renamed or deleted later
+    usernames = dict(db.session.execute(
+        select(User.id, User.username).where(User.id.in_(list(clerks)))).all()) if clerks else {}
+    for clerk in clerks.values():
+        clerk["username"] = usernames.get(clerk["user_id"])
+        clerk["revenue"] = round(clerk["revenue"], 2)
+
+    return {
+        "business_date": business_date.isoformat(),
+        "branch_id": None if branch_id == CENTRAL else branch_id,
+        "sales_count": sum(clerk["sales_count"] for clerk in clerks.values()),
+        "units_sold": sum(clerk["units_sold"] for clerk in clerks.values()),
+        "income": round(totals[TransactionType.INCOME], 2),
+        "expense": round(totals[TransactionType.EXPENSE], 2),
+        "net_profit": round(totals[TransactionType.INCOME] - totals[TransactionType.EXPENSE], 2),
+        "clerks": sorted(clerks.values(), key=lambda clerk: clerk["user_id"]),
+        "closed": False
+    }
+
+
+def _report_dict(report):
+    return {
+        "business_date": report.business_date.isoformat(),
+        "branch_id": None if report.branch_id == CENTRAL else report.branch_id,
+        "sales_count": report.sales_count,
+        "units_sold": report.units_sold,
+        "income": report.income,
+        "expense": report.expense,
+        "net_profit": round(report.income - report.expense, 2),
+        "clerks": json.loads(report.clerks),
+        "closed": True,
+        "closed_at": report.closed_at.isoformat()
+    }
+
+
+def close_day(business_date, branch_id=CENTRAL):
+    """Freeze a closed day's report; returns (report dict, True if this call created it). Commits."""
+    statement = select(DailyReport).where(DailyReport.business_date == business_date,
+                                          DailyReport.branch_id == branch_id)
+    report = db.session.execute(statement).scalar_one_or_none()
+    if report is not None:
+        return _report_dict(report), False
+
+    totals = compute_day(business_date, branch_id)
+    report = DailyReport(business_date=business_date, branch_id=branch_id, sales_count=totals["sales_count"],
+                         units_sold=totals["units_sold"], income=totals["income"], expense=totals["expense"],
+                         clerks=json.dumps(totals["clerks"]))
+    db.session.add(report)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Closed concurrently by the job or another request; theirs is the same day, keep it
+        db.session.rollback()
+        return _report_dict(db.session.execute(statement).scalar_one()), False
+    return _report_dict(report), True
+
+
+def daily_report(business_date, branch_id=CENTRAL, today=None):
+    """Frozen report for a closed day, live totals for today (UTC)."""
+    today = today or datetime.utcnow().date()
+    if business_date >= today:
+        return compute_day(business_date, branch_id)
+    return close_day(business_date, branch_id)[0]
+
+
+zreport_cli = AppGroup('zreport', help='End-of-day (Z) report snapshots.')
+
+
+@zreport_cli.command('close')
+@click.option('--date', 'business_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Last UTC day to close (default yesterday).')
+@click.option('--days', type=int, default=1, show_default=True, help='Number of days to close, back from --date.')
+def close_command(business_date, days):
+    """Freeze the central report and every branch's report of closed days (run from cron)."""
+    last_day = business_date.date() if business_date else datetime.utcnow().date() - timedelta(days=1)
+    if last_day >= datetime.utcnow().date():
+        raise click.ClickException('Only past days can be closed.')
+
+    scopes = [CENTRAL] + db.session.execute(select(Branch.id).order_by(Branch.id)).scalars().all()
+    for offset in range(days - 1, -1, -1):
+        day = last_day - timedelta(days=offset)
+        created = sum(close_day(day, branch_id)[1] for branch_id in scopes)
+        click.echo(f'{day.isoformat()}: {created} reports closed, {len(scopes) - created} already closed.')
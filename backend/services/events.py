@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from collections import deque
+
+
+class EventBroker:
+    """In-process publish/subscribe with a bounded replay buffer.
+
+    Every event gets a monotonically increasing sequence number so that a
+    reconnecting client can ask for everything after the last id it saw.
+    When that id has already fallen out of the buffer the client is told to
+    reload instead.
+
+    wait() blocks a thread; wait_async() is the same for coroutines (the
+    ASGI stream in asgi.py), woken through their event loop by publish().
+    """
+
+    def __init__(self, history=1000):
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=history)
+        self._seq = 0
+        self._waiters = set()
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def publish(self, event_type, data):
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, event_type, data))
+            self._condition.notify_all()
+            waiters = list(self._waiters)
+            seq = self._seq
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(waiter.set)
+            except RuntimeError:
+                pass  # Loop already closed
+        return seq
+
+    def since(self, seq):
+        """Return (events after seq, complete) where complete is False if some were dropped."""
+        with self._condition:
+            if self._events and seq < self._events[0][0] - 1:
+                return [], False
+            if seq > self._seq:
+                # Sequence from an earlier server process, the client must reload
+                return [], False
+            return [event for event in self._events if event[0] > seq], True
+
+    def wait(self, seq, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > seq, timeout)
+        return self.since(seq)
+
+    async def wait_async(self, seq, timeout):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            ready = self._seq > seq
+            if not ready:
+                self._waiters.add(waiter)
+        if not ready:
+            try:
+                await asyncio.wait_for(waiter[1].wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._condition:
+                    self._waiters.discard(waiter)
+        return self.since(seq)
+
+
+broker = EventBroker()
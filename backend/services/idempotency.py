@@ -0,0 +1,206 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import request, jsonify, make_response, current_app
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from models.models import db, IdempotencyKey
+
+_IN_PROGRESS = object()
+
+
+class IdempotencyStore:
+    """Bounded LRU of completed responses keyed by (user, endpoint, Idempotency-Key).
+
+    Entries are (expires_at, fingerprint, status, body, mimetype) tuples and
+    expire after their TTL; when full, the least recently used entry is
+    evicted.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key, fingerprint, ttl):
+        """Reserve key; returns (state, entry) with state 'new', 'replay', 'in_progress' or 'mismatch'."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self._entries[key] = (now + ttl, fingerprint, _IN_PROGRESS, None, None)
+                self._evict()
+                return 'new', None
+
+            self._entries.move_to_end(key)
+            if entry[1] != fingerprint:
+                return 'mismatch', entry
+            if entry[2] is _IN_PROGRESS:
+                return 'in_progress', entry
+            return 'replay', entry
+
+    def complete(self, key, fingerprint, status, body, mimetype, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, fingerprint, status, body, mimetype)
+            self._evict()
+
+    def release(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class DatabaseIdempotencyStore:
+    """Same interface backed by the idempotency_keys table, shared by every worker.
+
+    A key is reserved by inserting its row on a connection of its own, committed
+    at once, so a retry that lands on another worker sees the reservation. A
+    reservation left by a crashed worker expires after lock_timeout seconds,
+    not the full TTL. When the database cannot be reached the request falls
+    back to the in-process store, so the key is then only checked per worker.
+    """
+
+    def __init__(self, fallback, lock_timeout=300, purge_interval=60):
+        self.fallback = fallback
+        self.lock_timeout = lock_timeout
+        self.purge_interval = purge_interval
+        self._purged_at = None
+        self._table = IdempotencyKey.__table__
+
+    @staticmethod
+    def _hash(key):
+        return hashlib.sha256(json.dumps(key, default=str).encode()).hexdigest()
+
+    def _purge(self, now):
+        # Expired rows of keys that never came back
+        monotonic_now = time.monotonic()
+        if self._purged_at is not None and monotonic_now - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = monotonic_now
+        with db.engine.begin() as connection:
+            connection.execute(delete(self._table).where(self._table.c.expires_at < now))
+
+    def begin(self, key, fingerprint, ttl):
+        """Reserve key; returns (state, entry) with state 'new', 'replay', 'in_progress' or 'mismatch'."""
+        table = self._table
+        key_hash = self._hash(key)
+        now = datetime.utcnow()
+        try:
+            self._purge(now)
+            with db.engine.begin() as connection:
+                # An expired row of the same key is taken over
+                connection.execute(delete(table).where(table.c.key_hash == key_hash, table.c.expires_at < now))
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(insert(table).values(
+                        key_hash=key_hash, fingerprint=fingerprint,
+                        expires_at=now + timedelta(seconds=min(ttl, self.lock_timeout))))
+                return 'new', None
+            except IntegrityError:
+                with db.engine.connect() as connection:
+                    row = connection.execute(select(table).where(table.c.key_hash == key_hash)).one_or_none()
+        except SQLAlchemyError:
+            current_app.logger.exception('Idempotency store unavailable, checking %s in this worker only', request.path)
+            return self.fallback.begin(key, fingerprint, ttl)
+
+        if row is None:
+            # Released by its first request in the meantime
+            return self.begin(key, fingerprint, ttl)
+        entry = (row.expires_at, row.fingerprint, _IN_PROGRESS if row.status is None else row.status,
+                 row.body, row.mimetype)
+        if row.fingerprint != fingerprint:
+            return 'mismatch', entry
+        if row.status is None:
+            return 'in_progress', entry
+        return 'replay', entry
+
+    def complete(self, key, fingerprint, status, body, mimetype, ttl):
+        table = self._table
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(update(table).where(table.c.key_hash == self._hash(key)).values(
+                    status=status, body=body, mimetype=mimetype,
+                    expires_at=datetime.utcnow() + timedelta(seconds=ttl)))
+        except SQLAlchemyError:
+            current_app.logger.exception('Idempotency store unavailable, response of %s kept in this worker', request.path)
+        # Also answers retries reaching this worker if the reservation went to the fallback
+        self.fallback.complete(key, fingerprint, status, body, mimetype, ttl)
+
+    def release(self, key):
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(delete(self._table).where(self._table.c.key_hash == self._hash(key)))
+        except SQLAlchemyError:
+            current_app.logger.exception('Idempotency store unavailable, reservation of %s expires on its own', request.path)
+        self.fallback.release(key)
+
+
+store = IdempotencyStore()
+
+
+def init_app(app):
+    # 'database' (default) shares keys between workers; 'memory' keeps them per process
+    if app.config['IDEMPOTENCY_STORAGE'] == 'memory':
+        app.extensions['idempotency'] = store
+    else:
+        app.extensions['idempotency'] = DatabaseIdempotencyStore(store, lock_timeout=app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+
+
+def idempotent(view):
+    """Replay the first response for a repeated Idempotency-Key instead of re-running the view.
+
+    Must be applied below @jwt_required() so the key is scoped to the caller.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key:
+            return view(*args, **kwargs)
+
+        if len(idempotency_key) > 255:
+            return jsonify({"message": "Idempotency-Key must be at most 255 characters"}), 400
+
+        ttl = current_app.config['IDEMPOTENCY_KEY_TTL']
+        key = (get_jwt_identity(), request.endpoint, request.path, idempotency_key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+        key_store = current_app.extensions.get('idempotency', store)
+        state, entry = key_store.begin(key, fingerprint, ttl)
+        if state == 'mismatch':
+            return jsonify({"message": "Idempotency-Key was already used with a different request body"}), 422
+        if state == 'in_progress':
+            return jsonify({"message": "A request with this Idempotency-Key is still being processed"}), 409
+        if state == 'replay':
+            _, _, status, body, mimetype = entry
+            response = make_response(body, status)
+            response.mimetype = mimetype
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            key_store.release(key)
+            raise
+
+        # Server errors are not cached so that the client can retry them
+        if response.status_code >= 500:
+            key_store.release(key)
+        else:
+            key_store.complete(key, fingerprint, response.status_code, response.get_data(), response.mimetype, ttl)
+        return response
+
+    return wrapper
@@ -0,0 +1,94 @@
+"""ISBN-10 / ISBN-13 normalization for exact book lookups.
+
+Books keep the ISBN as it was typed (with or without hyphens, in either form)
+and, in the indexed isbn_key column, as compact ISBN-13 (set on every flush
+below). A lookup normalizes its input the same way, so '978-0-306-40615-7',
+'9780306406157' and '0-306-40615-2' all find the same book with one IN over
+the index instead of a LIKE scan. Rows written before isbn_key existed are
+still matched on the compact spellings of variants() until
+`flask books index-isbns` fills their key.
+"""
+import click
+from sqlalchemy import event, select, update, bindparam
+from models.models import db, Book
+from models import lookups
+from services.sales_counters import books_cli
+
+
+def compact(value):
+    """Digits (and a trailing X) only, e.g. '978-0-306-40615-7' -> '9780306406157'."""
+    return ''.join(char for char in value.upper() if char.isdigit() or char == 'X')
+
+
+def _check_digit_13(digits):
+    total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+def _check_digit_10(digits):
+    remainder = (11 - sum(int(digit) * (10 - index) for index, digit in enumerate(digits)) % 11) % 11
+    return 'X' if remainder == 10 else str(remainder)
+
+
+def key(value):
+    """Compact ISBN-13 of an ISBN in any spelling; other values just compacted."""
+    number = compact(value)
+    if len(number) == 10 and number[:9].isdigit():
+        return '978' + number[:9] + _check_digit_13('978' + number[:9])
+    return number
+
+
+@event.listens_for(Book, 'before_insert')
+@event.listens_for(Book, 'before_update')
+def _set_key(mapper, connection, book):
+    book.isbn_key = key(book.isbn)
+
+
+def variants(value):
+    """Spellings under which a book with this ISBN may be stored, the input first."""
+    value = value.strip()
+    spellings = [value]
+    number = compact(value)
+    if len(number) == 10 and number[:9].isdigit():
+        spellings += [number, '978' + number[:9] + _check_digit_13('978' + number[:9])]
+    elif len(number) == 13 and number.isdigit():
+        spellings.append(number)
+        if number.startswith('978'):
+            spellings.append(number[3:12] + _check_digit_10(number[3:12]))
+    return list(dict.fromkeys(spellings))
+
+
+def find_books(values):
+    """{requested value: Book or None} for many ISBNs, one query."""
+    keys = {value: key(value) for value in values}
+    spellings = {value: variants(value) for value in values}
+    found = lookups.get_books_by_isbn(
+        [spelling for candidates in spellings.values() for spelling in candidates], set(keys.values()))
+    by_key = {book.isbn_key: book for book in found if book.isbn_key}
+    by_isbn = {book.isbn: book for book in found}
+    return {value: by_key.get(keys[value]) or next(
+                (by_isbn[spelling] for spelling in spellings[value] if spelling in by_isbn), None)
+            for value in values}
+
+
+def find_book(value):
+    return find_books([value])[value]
+
+
+@books_cli.command('index-isbns')
+@click.option('--chunk-size', type=int, default=1000, show_default=True)
+def index_isbns_command(chunk_size):
+    """Fill isbn_key of books stored before it existed."""
+    table = Book.__table__
+    # Core UPDATE: a derived column, not an edit, so Book.version stays as it is
+    statement = update(table).where(table.c.id == bindparam('b_id')).values(isbn_key=bindparam('b_key'))
+    indexed = 0
+    while True:
+        rows = db.session.execute(
+            select(Book.id, Book.isbn).where(Book.isbn_key.is_(None)).order_by(Book.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        db.session.execute(statement, [{'b_id': book_id, 'b_key': key(isbn)} for book_id, isbn in rows])
+        db.session.commit()
+        indexed += len(rows)
+    click.echo(f'ISBN keys set for {indexed} books.')
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+
+MAX_LIMIT = 1000
+
+
+def naive_utc(value):
+    """Aware datetimes (e.g. toISOString()'s trailing Z) as naive UTC, the form stored in the database."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_datetime(args, name):
+    """ISO datetime query parameter as naive UTC; returns (value or None, error message)."""
+    value = args.get(name)
+    if not value:
+        return None, None
+    try:
+        return naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00'))), None
+    except ValueError:
+        return None, f"Invalid {name} format. Use ISO format (YYYY-MM-DDTHH:MM:SS)"
+
+
+def parse_number(args, name, number_type=int):
+    """Numeric query parameter; returns (value or None, error message)."""
+    value = args.get(name)
+    if value in (None, ''):
+        return None, None
+    try:
+        return number_type(value), None
+    except ValueError:
+        return None, f"Invalid {name}: {value}"
+
+
+def parse_sort(args, sort_keys, default='id'):
+    """?sort=key1,-key2 checked against sort_keys; returns ([(key, descending)], error message).
+
+    id is appended as a tie breaker so limit/offset pages are stable.
+    """
+    sort = []
+    for key in (args.get('sort') or default).split(','):
+        key = key.strip()
+        descending = key.startswith('-')
+        key = key.lstrip('-')
+        if key not in sort_keys:
+            return None, f"Invalid sort key: {key}. Use one of: {', '.join(sort_keys)}"
+        sort.append((key, descending))
+    if 'id' not in (key for key, _ in sort):
+        sort.append(('id', sort[-1][1]))
+    return sort, None
+
+
+def parse_page(args):
+    """?limit= and ?offset=; returns ((limit or None, offset), error message)."""
+    limit, error = parse_number(args, 'limit')
+    if error:
+        return None, error
+    offset, error = parse_number(args, 'offset')
+    if error:
+        return None, error
+    if (limit is not None and not 0 < limit <= MAX_LIMIT) or (offset is not None and offset < 0):
+        return None, f"limit must be between 1 and {MAX_LIMIT} and offset not negative"
+    return (limit, offset or 0), None
+
+
+def order_by(sort, columns):
+    """ORDER BY clauses for parsed sort keys; columns maps each key to its column."""
+    return [columns[key].desc() if descending else columns[key].asc() for key, descending in sort]
+
+
+def sort_rows(rows, sort, column_names):
+    """Sort row tuples in Python the way order_by sorts them in SQL (for merged tables)."""
+    for key, descending in reversed(sort):
+        index = column_names.index(key)
+        rows.sort(key=lambda row: row[index], reverse=descending)
+    return rows
+
+
+def page_rows(rows, limit, offset):
+    return rows[offset:] if limit is None else rows[offset:offset + limit]
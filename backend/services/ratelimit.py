@@ -0,0 +1,208 @@
+import math
+import threading
+import time
+
+from flask import request, jsonify, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+try:
+    import redis
+except ImportError:  # Redis is optional, the in-process store is the default
+    redis = None
+
+# KEYS[1] bucket; ARGV rate, burst, cost, now. Returns {allowed, retry_after}
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class MemoryStore:
+    """Token buckets and in-flight counters in process memory (per worker)."""
+
+    blocking = False
+
+    def __init__(self, max_buckets=100000):
+        self.max_buckets = max_buckets
+        self._buckets = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, rate, burst):
+        """Take cost tokens from the bucket; returns (allowed, retry_after seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed, retry_after = True, 0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (cost - tokens) / rate
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now, rate, burst)
+        return allowed, retry_after
+
+    def _prune(self, now, rate, burst):
+        # Buckets that have refilled completely carry no state worth keeping
+        self._buckets = {
+            key: (tokens, updated_at) for key, (tokens, updated_at) in self._buckets.items()
+            if tokens + (now - updated_at) * rate < burst
+        }
+
+    def acquire(self, key, limit):
+        with self._lock:
+            count = self._in_flight.get(key, 0)
+            if count >= limit:
+                return False
+            self._in_flight[key] = count + 1
+            return True
+
+    def release(self, key):
+        with self._lock:
+            count = self._in_flight.get(key, 0) - 1
+            if count > 0:
+                self._in_flight[key] = count
+            else:
+                self._in_flight.pop(key, None)
+
+
+class RedisStore:
+    """Same interface backed by a Redis-compatible server, shared by all workers.
+
+    Calls block on the network (with `timeout` seconds at most), so the ASGI
+    app runs them in a thread (`blocking`). When the server is unreachable the
+    limiter fails open: requests are allowed and the outage is logged, at most
+    every `log_interval` seconds.
+    """
+
+    blocking = True
+
+    def __init__(self, url, logger, prefix='ratelimit:', in_flight_ttl=300, timeout=0.25, log_interval=60):
+        if redis is None:
+            raise RuntimeError('RATELIMIT_STORAGE_URI points at Redis but the redis package is not installed')
+        self.logger = logger
+        self.prefix = prefix
+        self.in_flight_ttl = in_flight_ttl
+        self.log_interval = log_interval
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._take = self._client.register_script(_TOKEN_BUCKET_SCRIPT)
+        self._logged_at = None
+
+    def _unavailable(self, operation):
+        now = time.monotonic()
+        if self._logged_at is None or now - self._logged_at >= self.log_interval:
+            self._logged_at = now
+            self.logger.warning('Rate limit store unavailable in %s, allowing requests', operation, exc_info=True)
+
+    def take(self, key, cost, rate, burst):
+        try:
+            allowed, retry_after = self._take(keys=[self.prefix + key], args=[rate, burst, cost, time.time()])
+        except redis.RedisError:
+            self._unavailable('take')
+            return True, 0
+        return bool(allowed), float(retry_after)
+
+    def acquire(self, key, limit):
+        """True or False like MemoryStore; None when the store is unavailable (allowed, nothing to release)."""
+        key = self.prefix + 'in_flight:' + key
+        try:
+            pipeline = self._client.pipeline()
+            pipeline.incr(key)
+            # Counters left behind by a crashed worker expire instead of blocking forever
+            pipeline.expire(key, self.in_flight_ttl)
+            count, _ = pipeline.execute()
+            if count > limit:
+                self._client.decr(key)
+                return False
+        except redis.RedisError:
+            self._unavailable('acquire')
+            return None
+        return True
+
+    def release(self, key):
+        try:
+            self._client.decr(self.prefix + 'in_flight:' + key)
+        except redis.RedisError:
+            # The counter expires after in_flight_ttl
+            self._unavailable('release')
+
+
+def parse_limits(value):
+    """Parse 'endpoint=number,...' into a dict, e.g. 'finance.get_transactions=5'."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, number = item.partition('=')
+        limits[endpoint.strip()] = float(number)
+    return limits
+
+
+def _client_identity():
+    # Rate limit by user where a valid token is present, by address otherwise
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    return f'user:{identity}' if identity is not None else f'ip:{request.remote_addr}'
+
+
+def _too_many_requests(retry_after, message):
+    response = jsonify({"message": message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_app(app):
+    config = app.config
+    storage_uri = config['RATELIMIT_STORAGE_URI']
+    store = RedisStore(storage_uri, app.logger, timeout=config['RATELIMIT_STORAGE_TIMEOUT']) if storage_uri.startswith(('redis://', 'rediss://', 'unix://')) else MemoryStore()
+    app.extensions['ratelimit'] = store
+
+    @app.before_request
+    def check_rate_limit():
+        if not config['RATELIMIT_ENABLED'] or request.method == 'OPTIONS' or request.endpoint in (None, 'static'):
+            return None
+
+        endpoint = request.endpoint
+        rate = config['RATELIMIT_RATE']
+        burst = config['RATELIMIT_BURST']
+        cost = min(config['RATELIMIT_COSTS'].get(endpoint, 1), burst)
+        allowed, retry_after = store.take(f'{_client_identity()}:{endpoint}', cost, rate, burst)
+        if not allowed:
+            return _too_many_requests(retry_after, "Too many requests, slow down")
+
+        # Expensive reports: cap how many run at once across all users
+        limit = config['RATELIMIT_CONCURRENCY'].get(endpoint)
+        if limit is not None:
+            acquired = store.acquire(endpoint, limit)
+            if acquired is False:
+                return _too_many_requests(1, "Too many reports running, try again shortly")
+            if acquired:
+                g.ratelimit_in_flight = endpoint
+        return None
+
+    @app.teardown_request
+    def release_concurrency_slot(exc):
+        endpoint = g.pop('ratelimit_in_flight', None)
+        if endpoint is not None:
+            store.release(endpoint)
@@ -0,0 +1,152 @@
+"""Receipt and invoice rendering in a process pool.
+
+Documents are plain dicts (no ORM objects) so they can be sent to worker
+processes. Rendered bytes are cached under a hash of the document content,
+the format and TEMPLATE_VERSION: a reprint of an unchanged sale is a cache
+hit, and any change to the data gives a new key, so entries never go stale.
+
+This module is imported by the spawned workers and must stay free of Flask
+and model imports. PDF output needs the optional weasyprint package.
+"""
+import atexit
+import hashlib
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from jinja2 import Environment, DictLoader
+
+from services.cache import TTLCache
+
+try:
+    from weasyprint import HTML
+except ImportError:  # weasyprint is optional, HTML output works without it
+    HTML = None
+
+TEMPLATE_VERSION = 1
+
+MIMETYPES = {'html': 'text/html', 'pdf': 'application/pdf'}
+
+_TEMPLATES = {
+    'base.html': """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{{ title }}</title>
+<style>
+body { font-family: sans-serif; font-size: 12px; width: 80mm; margin: 0 auto; }
+table { width: 100%; border-collapse: collapse; }
+td, th { padding: 2px 0; text-align: left; }
+.amount { text-align: right; }
+.total { border-top: 1px solid #000; font-weight: bold; }
+</style></head>
+<body>
+<h2>{{ store_name }}</h2>
+{% if branch_name %}<p>{{ branch_name }}</p>{% endif %}
+{% block body %}{% endblock %}
+</body></html>
+""",
+    'receipt.html': """{% extends 'base.html' %}
+{% block body %}
+<p>Receipt #{{ id }}<br>{{ created_at }}<br>Served by {{ clerk }}</p>
+<table>
+<tr><th>Item</th><th class="amount">Qty</th><th class="amount">Price</th><th class="amount">Total</th></tr>
+<tr><td>{{ title }}<br><small>ISBN {{ isbn }}</small></td><td class="amount">{{ quantity }}</td>
+<td class="amount">{{ '%.2f' % unit_price }}</td><td class="amount">{{ '%.2f' % total_price }}</td></tr>
+<tr class="total"><td colspan="3">Total</td><td class="amount">{{ '%.2f' % total_price }}</td></tr>
+</table>
+{% endblock %}
+""",
+    'invoice.html': """{% extends 'base.html' %}
+{% block body %}
+<p>Purchase order #{{ id }}<br>{{ created_at }}<br>Ordered by {{ clerk }}<br>Status: {{ status }}</p>
+<table>
+<tr><th>Title</th><th class="amount">Qty</th><th class="amount">Cost</th><th class="amount">Total</th></tr>
+<tr><td>{{ title }}<br><small>{{ author }}, {{ publisher }}<br>ISBN {{ isbn }}</small></td>
+<td class="amount">{{ quantity }}</td><td class="amount">{{ '%.2f' % purchase_price }}</td>
+<td class="amount">{{ '%.2f' % (purchase_price * quantity) }}</td></tr>
+<tr class="total"><td colspan="3">Total</td><td class="amount">{{ '%.2f' % (purchase_price * quantity) }}</td></tr>
+</table>
+{% endblock %}
+""",
+}
+
+_environment = Environment(loader=DictLoader(_TEMPLATES), autoescape=True)
+
+
+def pdf_available():
+    return HTML is not None
+
+
+def content_key(kind, document, output_format):
+    payload = json.dumps([TEMPLATE_VERSION, kind, output_format, document], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render(kind, document, output_format='html'):
+    """Render one document ('receipt' or 'invoice') to bytes. Runs in the workers."""
+    html = _environment.get_template(f'{kind}.html').render(**document)
+    if output_format == 'pdf':
+        return HTML(string=html).write_pdf()
+    return html.encode()
+
+
+def _render_job(job):
+    return render(*job)
+
+
+class Renderer:
+    """Cached rendering, with batches fanned out to a process pool of `workers` processes.
+
+    A single document renders in the calling process: a pool round trip costs
+    more than one template. The pool is started on the first batch, with the
+    spawn method so workers do not inherit the server's threads and connections.
+    """
+
+    def __init__(self, workers=0, cache_size=2048, cache_ttl=86400):
+        self.workers = workers
+        self.cache_ttl = cache_ttl
+        self._cache = TTLCache(maxsize=cache_size)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def configure(self, workers, cache_size, cache_ttl):
+        self.shutdown()
+        self.__init__(workers, cache_size, cache_ttl)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def render(self, kind, document, output_format='html'):
+        """Returns (bytes, content hash)."""
+        return self.render_many(kind, [document], output_format)[0]
+
+    def render_many(self, kind, documents, output_format='html'):
+        """[(bytes, content hash)] in the order of documents."""
+        keys = [content_key(kind, document, output_format) for document in documents]
+        results = [self._cache.get(key) for key in keys]
+        missing = [index for index, result in enumerate(results) if result is None]
+
+        jobs = [(kind, documents[index], output_format) for index in missing]
+        if len(jobs) > 1 and self.workers > 0:
+            chunksize = max(1, len(jobs) // (self.workers * 4))
+            rendered = list(self._executor().map(_render_job, jobs, chunksize=chunksize))
+        else:
+            rendered = [_render_job(job) for job in jobs]
+
+        for index, body in zip(missing, rendered):
+            results[index] = body
+            self._cache.set(keys[index], body, self.cache_ttl)
+        return list(zip(results, keys))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+renderer = Renderer()
+atexit.register(renderer.shutdown)
@@ -0,0 +1,154 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, insert
+from models.models import db, Book, BookSale, BookPurchase, PurchaseStatus, User, UserRole
+from models import lookups
+
+
+class ReorderEngine:
+    """Keeps per-book reorder points and finds the books below them.
+
+    Reorder points come from sales velocity over a lookback window and are
+    rebuilt every REORDER_REFRESH_INTERVAL seconds; velocity moves slowly, so
+    a few minutes of staleness does not matter. Stock does not: low_stock()
+    reads current stock from the database on every call, so a sale or receipt
+    handled by any worker shows up at once. Only books under the highest
+    reorder point are read (ix_books_stock_quantity), not the whole table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._velocity = {}
+        self._reorder_points = {}
+        self._max_reorder_point = 0
+
+    def _reorder_point(self, velocity):
+        config = current_app.config
+        cover_days = config['REORDER_LEAD_TIME_DAYS'] + config['REORDER_SAFETY_DAYS']
+        return max(config['REORDER_MIN_POINT'], math.ceil(velocity * cover_days))
+
+    def load(self):
+        config = current_app.config
+        lookback_days = config['REORDER_LOOKBACK_DAYS']
+        since = datetime.utcnow() - timedelta(days=lookback_days)
+
+        units_sold = db.session.query(BookSale.book_id, func.sum(BookSale.quantity)) \
+            .filter(BookSale.created_at >= since) \
+            .group_by(BookSale.book_id) \
+            .all()
+
+        # Books without recent sales get the minimum point, see low_stock()
+        velocity = {book_id: float(units or 0) / lookback_days for book_id, units in units_sold}
+        reorder_points = {book_id: self._reorder_point(v) for book_id, v in velocity.items()}
+
+        with self._lock:
+            self._velocity = velocity
+            self._reorder_points = reorder_points
+            self._max_reorder_point = max(reorder_points.values(), default=self._reorder_point(0))
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        interval = current_app.config['REORDER_REFRESH_INTERVAL']
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > interval:
+            self.load()
+
+    def low_stock(self):
+        """Return (book_id, stock, reorder_point, velocity) tuples, largest shortfall first."""
+        self._ensure_loaded()
+        with self._lock:
+            velocity = self._velocity
+            reorder_points = self._reorder_points
+            max_reorder_point = self._max_reorder_point
+        minimum = self._reorder_point(0)
+
+        candidates = db.session.query(Book.id, Book.stock_quantity) \
+            .filter(Book.stock_quantity < max_reorder_point) \
+            .all()
+        entries = [
+            (book_id, stock, reorder_points.get(book_id, minimum), velocity.get(book_id, 0.0))
+            for book_id, stock in candidates
+            if stock < reorder_points.get(book_id, minimum)
+        ]
+        entries.sort(key=lambda entry: entry[1] - entry[2])
+        return entries
+
+    def draft_purchases(self, user_id):
+        """Bulk-insert pending purchase orders for low-stock books without an open order."""
+        cover_days = current_app.config['REORDER_COVER_DAYS']
+        entries = self.low_stock()
+        if not entries:
+            return 0
+
+        books = Book.query.filter(Book.id.in_([entry[0] for entry in entries])).all()
+        books_by_id = {book.id: book for book in books}
+        isbns = [book.isbn for book in books]
+
+        open_isbns = {
+            isbn for (isbn,) in db.session.query(BookPurchase.isbn)
+            .filter(BookPurchase.isbn.in_(isbns), BookPurchase.status == PurchaseStatus.PENDING)
+            .distinct()
+        }
+
+        # Use the most recent purchase price for each ISBN, falling back to the retail price
+        latest_ids = db.session.query(func.max(BookPurchase.id)) \
+            .filter(BookPurchase.isbn.in_(isbns)) \
+            .group_by(BookPurchase.isbn)
+        last_prices = dict(
+            db.session.query(BookPurchase.isbn, BookPurchase.purchase_price)
+            .filter(BookPurchase.id.in_(latest_ids))
+            .all()
+        )
+
+        now = datetime.utcnow()
+        rows = []
+        for book_id, stock, reorder_point, velocity in entries:
+            book = books_by_id.get(book_id)
+            if not book or book.isbn in open_isbns:
+                continue
+            target = reorder_point + velocity * cover_days
+            rows.append({
+                "isbn": book.isbn,
+                "title": book.title,
+                "author": book.author,
+                "publisher": book.publisher,
+                "purchase_price": last_prices.get(book.isbn, book.retail_price),
+                "quantity": max(math.ceil(target - stock), 1),
+                "status": PurchaseStatus.PENDING,
+                "user_id": user_id,
+                "created_at": now,
+                "updated_at": now
+            })
+
+        if rows:
+            db.session.execute(insert(BookPurchase), rows)
+            db.session.commit()
+        return len(rows)
+
+
+reorder_engine = ReorderEngine()
+
+reorder_cli = AppGroup('reorder', help='Low-stock detection and purchase drafting.')
+
+
+@reorder_cli.command('draft')
+@click.option('--username', default=None, help='User recorded on the drafted purchases (defaults to the first super admin).')
+def draft_command(username):
+    """Draft pending purchases for every book below its reorder point (run from cron)."""
+    if username:
+        user = lookups.get_user_by_username(username)
+    else:
+        user = User.query.filter_by(role=UserRole.SUPER_ADMIN).order_by(User.id).first()
+
+    if not user:
+        raise click.ClickException('No user found to record the drafted purchases')
+
+    reorder_engine.load()
+    count = reorder_engine.draft_purchases(user.id)
+    click.echo(f'{count} purchase orders drafted.')
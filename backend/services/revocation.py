@@ -0,0 +1,119 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from models.models import db, RevokedToken
+
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+def _timestamp(value):
+    # Naive UTC datetimes from the database to epoch seconds, comparable with exp/iat claims
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+class RevocationList:
+    """Revoked tokens held in process memory for the token_in_blocklist_loader.
+
+    Two dicts: jti -> exp for single tokens (logout) and user id -> revocation
+    time for "every token issued before now" (deleted users). Rows added by
+    other processes are pulled every REVOCATION_REFRESH_INTERVAL seconds by
+    reading only rows revoked since the last seen watermark (less a minute, so
+    rows committed late are not missed), so checking a token normally costs no
+    query. Entries are dropped once every token they cover has expired.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._users = {}
+        self._watermark = None
+        self._refreshed_at = None
+
+    def _add(self, jti, user_id, revoked_at, expires_at):
+        if jti is not None:
+            self._tokens[jti] = expires_at
+        elif revoked_at > self._users.get(user_id, (0, 0))[0]:
+            self._users[user_id] = (revoked_at, expires_at)
+
+    def _prune(self, now):
+        self._tokens = {jti: expires_at for jti, expires_at in self._tokens.items() if expires_at > now}
+        self._users = {user_id: entry for user_id, entry in self._users.items() if entry[1] > now}
+
+    def refresh(self):
+        interval = current_app.config['REVOCATION_REFRESH_INTERVAL']
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed_at is not None and now - self._refreshed_at < interval:
+                return
+            # Claim the refresh so concurrent requests keep using the current entries
+            self._refreshed_at = now
+            watermark = self._watermark
+
+        query = db.session.query(RevokedToken.jti, RevokedToken.user_id,
+                                 RevokedToken.revoked_at, RevokedToken.expires_at) \
+            .filter(RevokedToken.expires_at > datetime.utcnow())
+        if watermark is not None:
+            query = query.filter(RevokedToken.revoked_at >= watermark - REFRESH_OVERLAP)
+        rows = query.all()
+
+        with self._lock:
+            for row in rows:
+                self._add(row.jti, row.user_id, _timestamp(row.revoked_at), _timestamp(row.expires_at))
+                if self._watermark is None or row.revoked_at > self._watermark:
+                    self._watermark = row.revoked_at
+            if self._watermark is None:
+                self._watermark = datetime.utcnow()
+            self._prune(time.time())
+
+    def is_revoked(self, claims):
+        self.refresh()
+        jti = claims.get('jti')
+        with self._lock:
+            if jti in self._tokens:
+                return True
+            try:
+                entry = self._users.get(int(claims.get('sub')))
+            except (TypeError, ValueError):
+                entry = None
+        return entry is not None and claims.get('iat', 0) <= entry[0]
+
+    def revoke_token(self, claims, user_id=None):
+        """Revoke one token by its claims. Does not commit."""
+        revoked_at = datetime.utcnow()
+        expires_at = datetime.utcfromtimestamp(claims['exp']) if 'exp' in claims else \
+            revoked_at + timedelta(seconds=current_app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+        db.session.add(RevokedToken(jti=claims['jti'], user_id=user_id, revoked_at=revoked_at, expires_at=expires_at))
+        with self._lock:
+            self._add(claims['jti'], user_id, _timestamp(revoked_at), _timestamp(expires_at))
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to user_id so far. Does not commit."""
+        revoked_at = datetime.utcnow()
+        expires_at = revoked_at + timedelta(seconds=current_app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+        db.session.add(RevokedToken(jti=None, user_id=user_id, revoked_at=revoked_at, expires_at=expires_at))
+        with self._lock:
+            self._add(None, user_id, _timestamp(revoked_at), _timestamp(expires_at))
+
+
+revocation_list = RevocationList()
+
+
+def init_app(jwt):
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return revocation_list.is_revoked(jwt_payload)
+
+
+tokens_cli = AppGroup('tokens', help='Revoked access tokens.')
+
+
+@tokens_cli.command('purge')
+def purge_command():
+    """Delete revocations whose tokens have all expired (run from cron)."""
+    deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f'{deleted} expired revocations deleted.')
@@ -0,0 +1,82 @@
+"""Per-book sales counters (Book.units_sold, revenue, last_sold_at).
+
+Sales bump them with one UPDATE ... SET units_sold = units_sold + n in the
+sale's own transaction, so they are exact without reading the row first.
+The update bypasses the ORM on purpose: counters are not user edits and must
+not change Book.version (the ETag clients send back as If-Match).
+
+`flask books repair-counters` recomputes them from book_sales (and the
+archive and branch databases) in chunks of books, e.g. after a restore or an
+import. Sales committed while a chunk is being written can be missed, so run
+it while the tills are closed.
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, update, func, case, bindparam
+from models.models import db, Book, BookSale, BookSaleArchive
+
+_RECORD_SALE = update(Book.__table__).where(Book.__table__.c.id == bindparam('book_id')).values(
+    units_sold=Book.__table__.c.units_sold + bindparam('quantity'),
+    revenue=Book.__table__.c.revenue + bindparam('amount'),
+    last_sold_at=case(
+        (Book.__table__.c.last_sold_at.is_(None), bindparam('sold_at')),
+        (Book.__table__.c.last_sold_at < bindparam('sold_at'), bindparam('sold_at')),
+        else_=Book.__table__.c.last_sold_at
+    )
+)
+
+
+def record_sale(book_id, quantity, amount, sold_at):
+    """Count a sale line on its book. Does not commit."""
+    db.session.execute(_RECORD_SALE, {'book_id': book_id, 'quantity': quantity, 'amount': amount, 'sold_at': sold_at})
+
+
+def _aggregate(book_ids):
+    # {book_id: [units, revenue, last sold]} over every table and database holding sales
+    sources = [(BookSale, None), (BookSaleArchive, None)]
+    sources += [(BookSale, db.engines[bind_key]) for bind_key in current_app.config['BRANCH_BINDS'].values()]
+
+    totals = {}
+    for model, bind in sources:
+        statement = select(model.book_id, func.sum(model.quantity), func.sum(model.total_price), func.max(model.created_at)) \
+            .where(model.book_id.in_(book_ids)).group_by(model.book_id)
+        for book_id, units, revenue, last_sold_at in db.session.execute(
+                statement, bind_arguments={'bind': bind} if bind is not None else None):
+            total = totals.setdefault(book_id, [0, 0.0, None])
+            total[0] += int(units or 0)
+            total[1] += float(revenue or 0)
+            if last_sold_at is not None and (total[2] is None or last_sold_at > total[2]):
+                total[2] = last_sold_at
+    return totals
+
+
+books_cli = AppGroup('books', help='Book catalog maintenance.')
+
+
+@books_cli.command('repair-counters')
+@click.option('--chunk-size', type=int, default=1000, show_default=True)
+def repair_counters_command(chunk_size):
+    """Recompute units_sold, revenue and last_sold_at from the sales tables."""
+    table = Book.__table__
+    statement = update(table).where(table.c.id == bindparam('b_id')).values(
+        units_sold=bindparam('b_units'), revenue=bindparam('b_revenue'), last_sold_at=bindparam('b_last_sold_at'))
+
+    last_id = 0
+    repaired = 0
+    while True:
+        book_ids = db.session.execute(
+            select(Book.id).where(Book.id > last_id).order_by(Book.id).limit(chunk_size)).scalars().all()
+        if not book_ids:
+            break
+        totals = _aggregate(book_ids)
+        db.session.execute(statement, [{
+            'b_id': book_id,
+            'b_units': totals.get(book_id, (0,))[0],
+            'b_revenue': round(totals.get(book_id, (0, 0.0))[1], 2),
+            'b_last_sold_at': totals.get(book_id, (0, 0.0, None))[2]
+        } for book_id in book_ids])
+        db.session.commit()
+        repaired += len(book_ids)
+        last_id = book_ids[-1]
+    click.echo(f'Sales counters recomputed for {repaired} books.')
@@ -0,0 +1,111 @@
+"""Additive schema upgrades for databases created by an earlier release.
+
+db.create_all() only creates missing tables. upgrade() compares the models
+with the live schema and also adds the columns, indexes and unique constraints
+that existing tables gained since (users.branch_id, book_sales.client_id,
+books.version, ...), so a new column or index only has to be declared on the
+model. It never drops, renames or alters what is already there.
+
+NOT NULL columns are added with their model default as server default, so the
+existing rows get a value; a NOT NULL column without a scalar default is
+added as nullable and reported.
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import inspect, literal, Index, UniqueConstraint
+from sqlalchemy.schema import CreateTable, CreateIndex, AddConstraint
+from models.models import db
+from models.routing import BRANCH_TABLES, branch_bind
+
+
+def _column_ddl(table, column, dialect):
+    # Returns (ALTER TABLE statement, warning or None)
+    preparer = dialect.identifier_preparer
+    ddl = f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} ' \
+          f'{column.type.compile(dialect=dialect)}'
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        value = literal(default, column.type).compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+        ddl += f' DEFAULT {value}'
+    warning = None
+    if not column.nullable:
+        if default is None:
+            warning = f'{table.name}.{column.name} added as nullable: no scalar default to fill existing rows'
+        else:
+            ddl += ' NOT NULL'
+    return ddl, warning
+
+
+def upgrade(engine, tables, foreign_keys=True, dry_run=False):
+    """Bring tables up to date on engine; returns ([DDL statements], [warnings]).
+
+    foreign_keys=False for databases without the referenced tables (sharded branches).
+    """
+    statements = []
+    warnings = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        dialect = connection.dialect
+        existing_tables = set(inspector.get_table_names())
+
+        def run(statement):
+            if not isinstance(statement, str):
+                statement = str(statement.compile(dialect=dialect)).strip()
+            statements.append(statement)
+            if not dry_run:
+                connection.exec_driver_sql(statements[-1])
+
+        for table in tables:
+            if table.name not in existing_tables:
+                run(CreateTable(table, include_foreign_key_constraints=None if foreign_keys else []))
+                for index in table.indexes:
+                    run(CreateIndex(index))
+                continue
+
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                ddl, warning = _column_ddl(table, column, dialect)
+                run(ddl)
+                if warning:
+                    warnings.append(warning)
+                # SQLite cannot add a constraint to an existing table
+                if foreign_keys and dialect.name != 'sqlite':
+                    for foreign_key in column.foreign_keys:
+                        run(AddConstraint(foreign_key.constraint))
+
+            index_names = {index['name'] for index in inspector.get_indexes(table.name)}
+            index_names |= {constraint['name'] for constraint in inspector.get_unique_constraints(table.name)}
+            for index in table.indexes:
+                if index.name not in index_names:
+                    run(CreateIndex(index))
+            for constraint in table.constraints:
+                # A unique index under the constraint's name does the same job and can be
+                # added to an existing table on every backend
+                if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in index_names:
+                    run(CreateIndex(Index(constraint.name, *constraint.columns, unique=True)))
+    return statements, warnings
+
+
+schema_cli = AppGroup('schema', help='Database schema upgrades.')
+
+
+@schema_cli.command('upgrade')
+@click.option('--dry-run', is_flag=True, help='Print the statements without running them.')
+def upgrade_command(dry_run):
+    """Add missing tables, columns and indexes on the primary and every branch database."""
+    targets = [(db.engine, list(db.metadata.sorted_tables), True)]
+    branch_tables = [table for table in db.metadata.sorted_tables if table.name in BRANCH_TABLES]
+    targets += [(db.engines[branch_bind(branch_id)], branch_tables, False)
+                for branch_id in current_app.config['BRANCH_BINDS']]
+
+    for engine, tables, foreign_keys in targets:
+        statements, warnings = upgrade(engine, tables, foreign_keys=foreign_keys, dry_run=dry_run)
+        click.echo(f'{engine.url.render_as_string(hide_password=True)}: '
+                   f'{len(statements)} statements{" (dry run)" if dry_run else ""}.')
+        for statement in statements:
+            click.echo(f'  {statement};')
+        for warning in warnings:
+            click.echo(f'  warning: {warning}')
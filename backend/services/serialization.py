@@ -0,0 +1,50 @@
+from flask import request, jsonify, make_response
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, columnar JSON works without it
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+
+def listing_format(output_format, best_mimetype):
+    """Pick 'json', 'columnar' or 'msgpack' from ?format= and the best Accept match."""
+    if output_format in ('columnar', 'msgpack'):
+        return output_format
+    if output_format is None and best_mimetype == MSGPACK_MIMETYPE:
+        return 'msgpack'
+    return 'json'
+
+
+def columnar_payload(columns, rows):
+    return {
+        "columns": columns,
+        "data": [list(values) for values in zip(*rows)] if rows else [[] for _ in columns],
+        "count": len(rows)
+    }
+
+
+def listing_response(columns, rows):
+    """Serialize a listing given its column names and a list of row tuples.
+
+    Default: a JSON list of objects (the original format).
+    ?format=columnar: {"columns": [...], "data": [[column values], ...], "count": n}
+    ?format=msgpack or Accept: application/msgpack: the columnar payload as msgpack.
+    """
+    output_format = listing_format(request.args.get('format'), request.accept_mimetypes.best)
+
+    if output_format == 'json':
+        return jsonify([dict(zip(columns, row)) for row in rows]), 200
+
+    payload = columnar_payload(columns, rows)
+
+    if output_format == 'columnar':
+        return jsonify(payload), 200
+
+    if msgpack is None:
+        return jsonify({"message": "msgpack output is not available on this server"}), 406
+
+    response = make_response(msgpack.packb(payload, use_bin_type=True))
+    response.mimetype = MSGPACK_MIMETYPE
+    return response, 200
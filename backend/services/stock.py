@@ -0,0 +1,14 @@
+from services.catalog import catalog
+from services.events import broker
+
+
+def stock_changed(book_id, stock_quantity, delta, branch_id=None):
+    # Called after commit: refresh in-process views of the book and notify live clients.
+    # A sale also moved the book's sales counters, which the catalog holds
+    catalog.invalidate(book_id)
+    if branch_id is not None:
+        # Branch stock is not part of the catalog
+        broker.publish('stock', {"book_id": book_id, "branch_id": branch_id,
+                                 "stock_quantity": stock_quantity, "delta": delta})
+        return
+    broker.publish('stock', {"book_id": book_id, "branch_id": None, "stock_quantity": stock_quantity, "delta": delta})
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['RATELIMIT_ENABLED'] = 'false'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URI', f'sqlite:///{tmp_path}/test.db')
+    monkeypatch.setenv('AUDIT_SPILL_PATH', str(tmp_path / 'audit_spill.jsonl'))
+    monkeypatch.delenv('BRANCH_DATABASE_URIS', raising=False)
+
+    from app import create_app
+    from models.models import db
+    from services.catalog import catalog
+    from services.reorder import reorder_engine
+    from services.revocation import revocation_list
+    from services.idempotency import store
+
+    # Process-wide caches must not leak rows between test databases
+    for singleton in (catalog, reorder_engine, revocation_list, store):
+        singleton.__init__()
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        app.create_super_admin()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, username='admin', password='admin123'):
+    token = client.post('/api/auth/login', json={'username': username, 'password': password}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def admin_headers(client):
+    return login(client)
+
+
+@pytest.fixture
+def make_book(app):
+    from models.models import db, Book
+
+    def make_book(isbn='978-0000000001', stock_quantity=10, retail_price=20.0):
+        with app.app_context():
+            book = Book(isbn=isbn, title=f'Book {isbn}', author='Author', publisher='Publisher',
+                        retail_price=retail_price, stock_quantity=stock_quantity)
+            db.session.add(book)
+            db.session.commit()
+            return book.id
+    return make_book
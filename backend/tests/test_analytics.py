@@ -0,0 +1,83 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from routes.analytics import _cache
+    _cache.clear()
+
+
+def _purchase(client, headers, book_id, unit_cost, quantity, receive):
+    purchase_id, = client.post('/api/purchases', headers=headers, json={
+        'books': [{'book_id': book_id, 'purchase_price': unit_cost, 'quantity': quantity}]}).get_json()['purchase_ids']
+    client.post(f'/api/purchases/{purchase_id}/pay', headers=headers)
+    if receive:
+        client.post(f'/api/purchases/{purchase_id}/add-to-inventory', headers=headers, json={})
+
+
+def test_margin_totals_cover_the_whole_period(client, admin_headers, make_book):
+    received = make_book('978-0000000001', stock_quantity=0, retail_price=10.0)
+    ordered = make_book('978-0000000002', stock_quantity=5, retail_price=5.0)
+    _purchase(client, admin_headers, received, 4.0, 5, receive=True)
+    # Paid but not received yet: no landed cost
+    _purchase(client, admin_headers, ordered, 100.0, 5, receive=False)
+    client.post('/api/sales', headers=admin_headers, json={'book_id': received, 'quantity': 2})
+    client.post('/api/sales', headers=admin_headers, json={'book_id': ordered, 'quantity': 1})
+
+    margin = client.get('/api/analytics/margin?limit=1', headers=admin_headers).get_json()
+    assert [item['book_id'] for item in margin['items']] == [received]
+    # The book without a landed cost stays out of the margin totals
+    assert margin['total_revenue'] == 20.0 and margin['total_cost'] == 8.0 and margin['total_margin'] == 12.0
+    assert margin['uncosted_revenue'] == 5.0
+
+    margin = client.get('/api/analytics/margin', headers=admin_headers).get_json()
+    assert margin['items'][1]['book_id'] == ordered and margin['items'][1]['unit_cost'] is None
+
+
+def test_results_are_cached_per_branch(app, client, admin_headers, make_book):
+    from models.models import db, Branch, BookSale
+    book_id = make_book(retail_price=10.0)
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 1})
+    with app.app_context():
+        branch = Branch(code='north', name='North')
+        db.session.add(branch)
+        db.session.flush()
+        db.session.add(BookSale(book_id=book_id, quantity=3, unit_price=10.0, total_price=30.0,
+                                user_id=1, branch_id=branch.id))
+        db.session.commit()
+        branch_id = branch.id
+
+    central, = client.get('/api/analytics/top-books', headers=admin_headers).get_json()
+    branch, = client.get('/api/analytics/top-books',
+                         headers={**admin_headers, 'X-Branch-Id': str(branch_id)}).get_json()
+    assert central['units'] == 4 and branch['units'] == 3
+
+
+def test_velocity_accepts_utc_dates(client, admin_headers, make_book):
+    from datetime import datetime, timedelta
+    book_id = make_book(retail_price=10.0)
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 3})
+
+    start_date = (datetime.utcnow() - timedelta(days=2)).isoformat() + 'Z'
+    response = client.get(f'/api/analytics/sales-velocity?start_date={start_date}', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()[0]['units'] == 3
+
+
+def test_branch_velocity_uses_branch_stock(app, client, admin_headers, make_book):
+    from models.models import db, Branch, BranchStock, BookSale
+    book_id = make_book(stock_quantity=100, retail_price=10.0)
+    with app.app_context():
+        branch = Branch(code='north', name='North')
+        db.session.add(branch)
+        db.session.flush()
+        db.session.add(BranchStock(branch_id=branch.id, book_id=book_id, stock_quantity=6))
+        db.session.add(BookSale(book_id=book_id, quantity=30, unit_price=10.0, total_price=300.0,
+                                user_id=1, branch_id=branch.id))
+        db.session.commit()
+        branch_id = branch.id
+
+    item, = client.get('/api/analytics/sales-velocity?days=30',
+                       headers={**admin_headers, 'X-Branch-Id': str(branch_id)}).get_json()
+    # One copy a day against the branch's 6, not the 100 held centrally
+    assert item['stock_quantity'] == 6 and item['days_of_cover'] == 6.0
@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta
+
+
+def test_archive_reads_accept_utc_dates(app, client, admin_headers, make_book):
+    from services.archive import ARCHIVED_MODELS, archive_rows
+    book_id = make_book()
+    sale_id = client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 1}).get_json()['id']
+    with app.app_context():
+        for model, archive_model in ARCHIVED_MODELS:
+            archive_rows(model, archive_model, datetime.utcnow() + timedelta(seconds=1), 100)
+
+    # The frontend sends toISOString() dates, with a trailing Z
+    start_date = (datetime.utcnow() - timedelta(days=1)).isoformat() + 'Z'
+    query = f'include_archive=1&start_date={start_date}'
+    sales = client.get(f'/api/sales?{query}', headers=admin_headers)
+    assert sales.status_code == 200 and [sale['id'] for sale in sales.get_json()] == [sale_id]
+    transactions = client.get(f'/api/finance/transactions?{query}', headers=admin_headers)
+    assert transactions.status_code == 200 and len(transactions.get_json()) == 1
+    summary = client.get(f'/api/finance/summary?{query}', headers=admin_headers)
+    assert summary.status_code == 200 and summary.get_json()['total_income'] == 20.0
@@ -0,0 +1,39 @@
+import glob
+import json
+
+
+def test_savepoint_rollback_drops_its_entries(app, make_book):
+    from models.models import db, Book
+    kept = make_book('978-0000000001', stock_quantity=5)
+    dropped = make_book('978-0000000002', stock_quantity=5)
+    with app.app_context():
+        db.session.get(Book, kept).stock_quantity = 4
+        db.session.flush()
+        try:
+            with db.session.begin_nested():
+                db.session.get(Book, dropped).stock_quantity = 3
+                db.session.flush()
+                raise ValueError
+        except ValueError:
+            pass
+        pending = db.session.info['audit_pending']
+        assert [entry['entity_id'] for entry in pending] == [kept]
+        db.session.rollback()
+
+
+def test_replay_rotates_the_spill_file(app):
+    from models.models import db, AuditLog
+    path = app.config['AUDIT_SPILL_PATH']
+    entry = {"user_id": None, "action": "update", "entity": "books", "entity_id": 1,
+             "changes": "{}", "created_at": "2026-01-01T00:00:00"}
+    with open(path, 'w', encoding='utf-8') as spill_file:
+        spill_file.write(json.dumps(entry) + '\n')
+    # Left behind by an earlier replay that failed
+    with open(path + '.20250101000000000000', 'w', encoding='utf-8') as spill_file:
+        spill_file.write(json.dumps({**entry, "entity_id": 2}) + '\n')
+
+    result = app.test_cli_runner().invoke(args=['audit', 'replay'])
+    assert '2 audit entries replayed' in result.output
+    with app.app_context():
+        assert sorted(db.session.execute(db.select(AuditLog.entity_id)).scalars()) == [1, 2]
+    assert glob.glob(path + '*') == []
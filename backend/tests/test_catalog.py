@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+
+def test_refresh_sees_late_commits_and_deletes(app, make_book):
+    from sqlalchemy import delete, update
+    from models.models import db, Book
+    from services.catalog import catalog
+    kept = make_book('978-0000000001', stock_quantity=5)
+    deleted = make_book('978-0000000002', stock_quantity=5)
+    app.config['CATALOG_REFRESH_INTERVAL'] = 0
+
+    with app.app_context():
+        assert catalog.get(kept).stock_quantity == 5
+        # Another worker's transaction that started before the watermark commits now,
+        # and another worker deletes a book; neither invalidates this process
+        watermark = catalog._watermark
+        db.session.execute(update(Book).where(Book.id == kept)
+                           .values(stock_quantity=4, updated_at=watermark - timedelta(seconds=30)))
+        db.session.execute(delete(Book).where(Book.id == deleted))
+        db.session.commit()
+
+        assert catalog.get(kept).stock_quantity == 4
+        assert catalog.get(deleted) is None
+        assert catalog.get_by_isbn('978-0000000002') is None
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+
+
+def test_if_match_on_book_update(client, admin_headers, make_book):
+    book_id = make_book()
+    response = client.get(f'/api/books/{book_id}', headers=admin_headers)
+    etag = response.headers['ETag']
+
+    stale = client.put(f'/api/books/{book_id}', headers={**admin_headers, 'If-Match': '"999"'}, json={'title': 'Old copy'})
+    assert stale.status_code == 412
+    assert stale.headers['ETag'] == etag
+
+    updated = client.put(f'/api/books/{book_id}', headers={**admin_headers, 'If-Match': etag}, json={'title': 'New'})
+    assert updated.status_code == 200
+    assert updated.headers['ETag'] != etag
+
+    # The first ETag is spent now
+    again = client.put(f'/api/books/{book_id}', headers={**admin_headers, 'If-Match': etag}, json={'title': 'Again'})
+    assert again.status_code == 412
+
+
+def test_concurrent_write_is_detected(app, make_book):
+    from models.models import db, Book
+
+    book_id = make_book(stock_quantity=5)
+    with app.app_context():
+        book = db.session.get(Book, book_id)
+        # Another request sells a copy between this read and the write below
+        with db.engine.begin() as connection:
+            connection.execute(update(Book.__table__).where(Book.__table__.c.id == book_id)
+                               .values(stock_quantity=4, version=Book.__table__.c.version + 1))
+        book.stock_quantity -= 1
+        with pytest.raises(StaleDataError):
+            db.session.commit()
+        db.session.rollback()
+
+
+def test_sale_keeps_the_book_etag(client, admin_headers, make_book):
+    book_id = make_book(stock_quantity=5)
+    etag = client.get(f'/api/books/{book_id}', headers=admin_headers).headers['ETag']
+
+    assert client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 2}).status_code == 201
+    updated = client.put(f'/api/books/{book_id}', headers={**admin_headers, 'If-Match': etag}, json={'title': 'New'})
+    assert updated.status_code == 200
+    book = client.get(f'/api/books/{book_id}', headers=admin_headers).get_json()
+    assert book['title'] == 'New' and book['stock_quantity'] == 3
+
+
+def test_central_stock_never_goes_negative(app, make_book):
+    from models.models import db, Book
+    from services import branches
+
+    book_id = make_book(stock_quantity=5)
+    with app.app_context():
+        book = db.session.get(Book, book_id)
+        # Another request sells four copies after this one checked the stock
+        with db.engine.begin() as connection:
+            connection.execute(update(Book.__table__).where(Book.__table__.c.id == book_id).values(stock_quantity=1))
+        with pytest.raises(StaleDataError):
+            branches.move_stock(book, -2)
+        db.session.rollback()
+        assert branches.move_stock(db.session.get(Book, book_id), -1) == 0
+        db.session.commit()
+        assert db.session.get(Book, book_id).version == 1
@@ -0,0 +1,35 @@
+def _receive(client, headers, book_id, unit_cost, quantity):
+    purchase_id, = client.post('/api/purchases', headers=headers, json={
+        'books': [{'book_id': book_id, 'purchase_price': unit_cost, 'quantity': quantity}]}).get_json()['purchase_ids']
+    client.post(f'/api/purchases/{purchase_id}/pay', headers=headers)
+    assert client.post(f'/api/purchases/{purchase_id}/add-to-inventory', headers=headers, json={}).status_code == 200
+
+
+def _valuation(client, headers):
+    return client.get('/api/reports/inventory-valuation', headers=headers).get_json()
+
+
+def test_fifo_and_average_valuation(client, admin_headers, make_book):
+    book_id = make_book(stock_quantity=0, retail_price=10.0)
+    _receive(client, admin_headers, book_id, 4.0, 2)
+    _receive(client, admin_headers, book_id, 6.0, 2)
+
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 3})
+    item, = _valuation(client, admin_headers)['items']
+    # FIFO: 2 x 4 + 1 x 6 sold, 1 x 6 left; average cost is 5 throughout
+    assert item['units'] == 1
+    assert item['fifo_cogs'] == 14.0 and item['fifo_value'] == 6.0
+    assert item['average_cogs'] == 15.0 and item['average_value'] == 5.0
+
+
+def test_uncosted_sales_only_count_in_cogs(app, client, admin_headers, make_book):
+    # 2 copies predate cost tracking, 2 are received at 4
+    book_id = make_book(stock_quantity=2, retail_price=10.0)
+    _receive(client, admin_headers, book_id, 4.0, 2)
+
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 3})
+    item, = _valuation(client, admin_headers)['items']
+    # The third copy is sold beyond the layers: costed at the average, but it never left a layer
+    assert item['units'] == 0 and item['fifo_value'] == 0 and item['average_value'] == 0
+    assert item['fifo_cogs'] == 12.0 and item['average_cogs'] == 12.0
+
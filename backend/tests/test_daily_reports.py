@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+
+def _sell_on(app, client, headers, book_id, day):
+    sale_id = client.post('/api/sales', headers=headers, json={'book_id': book_id, 'quantity': 2}).get_json()['id']
+    from models.models import db, BookSale, FinancialTransaction
+    with app.app_context():
+        created_at = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+        db.session.get(BookSale, sale_id).created_at = created_at
+        FinancialTransaction.query.update({FinancialTransaction.created_at: created_at})
+        db.session.commit()
+
+
+def test_closed_day_is_frozen(app, client, admin_headers, make_book):
+    book_id = make_book(retail_price=10.0)
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    _sell_on(app, client, admin_headers, book_id, yesterday)
+
+    url = f'/api/reports/daily?start_date={yesterday.isoformat()}&end_date={yesterday.isoformat()}'
+    report, = client.get(url, headers=admin_headers).get_json()
+    assert report['closed'] and report['sales_count'] == 1 and report['units_sold'] == 2
+    assert report['income'] == 20.0
+    assert report['clerks'][0]['username'] == 'admin'
+
+    # A late row for the closed day does not change its snapshot
+    _sell_on(app, client, admin_headers, book_id, yesterday)
+    assert client.get(url, headers=admin_headers).get_json() == [report]
+
+
+def test_today_is_live(client, admin_headers, make_book):
+    book_id = make_book(retail_price=10.0)
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 1})
+
+    report, = client.get('/api/reports/daily', headers=admin_headers).get_json()
+    assert not report['closed'] and report['sales_count'] == 1
+
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 1})
+    report, = client.get('/api/reports/daily', headers=admin_headers).get_json()
+    assert report['sales_count'] == 2
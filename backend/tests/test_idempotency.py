@@ -0,0 +1,50 @@
+def _sell(client, headers, book_id, key, quantity=1):
+    return client.post('/api/sales', headers={**headers, 'Idempotency-Key': key},
+                       json={'book_id': book_id, 'quantity': quantity})
+
+
+def _stock(client, headers, book_id):
+    return client.get(f'/api/books/{book_id}', headers=headers).get_json()['stock_quantity']
+
+
+def test_retry_replays_the_first_response(client, admin_headers, make_book):
+    book_id = make_book(stock_quantity=5)
+    first = _sell(client, admin_headers, book_id, 'key-1')
+    retry = _sell(client, admin_headers, book_id, 'key-1')
+    assert retry.status_code == first.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert _stock(client, admin_headers, book_id) == 4
+
+    # Same key, different body
+    assert _sell(client, admin_headers, book_id, 'key-1', quantity=2).status_code == 422
+
+
+def test_keys_are_shared_between_workers(app, client, admin_headers, make_book):
+    from app import create_app
+    from services.idempotency import store
+    book_id = make_book(stock_quantity=5)
+    first = _sell(client, admin_headers, book_id, 'key-1')
+
+    # A second app on the same database stands in for another worker process;
+    # clearing the in-process store shows the replay comes from the table
+    store.__init__()
+    other_worker = create_app().test_client()
+    retry = _sell(other_worker, admin_headers, book_id, 'key-1')
+    assert retry.headers.get('Idempotent-Replayed') == 'true'
+    assert retry.get_json() == first.get_json()
+    assert _stock(client, admin_headers, book_id) == 4
+
+
+def test_expired_reservation_is_taken_over(app, client, admin_headers, make_book):
+    from datetime import datetime, timedelta
+    from models.models import db, IdempotencyKey
+    book_id = make_book(stock_quantity=5)
+    _sell(client, admin_headers, book_id, 'key-1')
+    with app.app_context():
+        # As if the first request's worker died before answering, long ago
+        IdempotencyKey.query.update({IdempotencyKey.status: None,
+                                     IdempotencyKey.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+    assert _sell(client, admin_headers, book_id, 'key-1').status_code == 201
+    assert _stock(client, admin_headers, book_id) == 3
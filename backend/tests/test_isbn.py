@@ -0,0 +1,51 @@
+from services.isbn import variants
+
+
+def test_variants_cover_both_forms():
+    assert variants('0-306-40615-2') == ['0-306-40615-2', '0306406152', '9780306406157']
+    assert variants('978-0-306-40615-7') == ['978-0-306-40615-7', '9780306406157', '0306406152']
+
+
+def test_lookup_by_other_isbn_form(client, admin_headers, make_book):
+    book_id = make_book('9780306406157')
+
+    response = client.get('/api/books/by-isbn/0-306-40615-2', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()['id'] == book_id
+
+    assert client.get('/api/books/by-isbn/9781234567897', headers=admin_headers).status_code == 404
+
+
+def test_batch_lookup(client, admin_headers, make_book):
+    book_id = make_book('9780306406157')
+
+    books = client.post('/api/books/by-isbn', headers=admin_headers,
+                        json={'isbns': ['0306406152', '9781234567897']}).get_json()
+    assert books['0306406152']['id'] == book_id
+    assert books['9781234567897'] is None
+
+    assert client.post('/api/books/by-isbn', headers=admin_headers, json={'isbns': 'x'}).status_code == 400
+
+
+def test_lookup_of_a_hyphenated_isbn(client, admin_headers, make_book):
+    book_id = make_book('978-0-306-40615-7')
+
+    for value in ('9780306406157', '0306406152', '0-306-40615-2', '978-0-306-40615-7'):
+        response = client.get(f'/api/books/by-isbn/{value}', headers=admin_headers)
+        assert response.status_code == 200 and response.get_json()['id'] == book_id
+
+    books = client.post('/api/books/by-isbn', headers=admin_headers, json={'isbns': ['9780306406157']}).get_json()
+    assert books['9780306406157']['id'] == book_id
+
+
+def test_index_isbns_fills_keys_of_older_rows(app, client, admin_headers, make_book):
+    from sqlalchemy import update
+    from models.models import db, Book
+    book_id = make_book('0-306-40615-2')
+    with app.app_context():
+        db.session.execute(update(Book).values(isbn_key=None))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['books', 'index-isbns'])
+    assert 'ISBN keys set for 1 books' in result.output
+    assert client.get('/api/books/by-isbn/978-0-306-40615-7', headers=admin_headers).get_json()['id'] == book_id
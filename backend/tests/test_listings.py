@@ -0,0 +1,39 @@
+def _sell(client, headers, book_id, quantity):
+    response = client.post('/api/sales', headers=headers, json={'book_id': book_id, 'quantity': quantity})
+    assert response.status_code == 201
+
+
+def test_sales_filters_sort_and_page(client, admin_headers, make_book):
+    first = make_book('978-0000000001', stock_quantity=50, retail_price=10.0)
+    second = make_book('978-0000000002', stock_quantity=50, retail_price=30.0)
+    for book_id, quantity in ((first, 1), (second, 2), (first, 3), (second, 1)):
+        _sell(client, admin_headers, book_id, quantity)
+
+    sales = client.get('/api/sales?isbn=978-0000000002&sort=-total_price', headers=admin_headers).get_json()
+    assert [sale['total_price'] for sale in sales] == [60.0, 30.0]
+
+    sales = client.get(f'/api/sales?book_id={first}&min_amount=20', headers=admin_headers).get_json()
+    assert [sale['quantity'] for sale in sales] == [3]
+
+    page = client.get('/api/sales?sort=quantity&limit=2&offset=1', headers=admin_headers).get_json()
+    assert [sale['quantity'] for sale in page] == [1, 2]
+
+
+def test_sales_rejects_unknown_sort_key(client, admin_headers):
+    response = client.get('/api/sales?sort=password', headers=admin_headers)
+    assert response.status_code == 400
+
+
+def test_purchases_status_filter(client, admin_headers):
+    books = [{'isbn': f'978-100000000{i}', 'title': 'T', 'author': 'A', 'publisher': 'P',
+              'purchase_price': 5.0 * i, 'quantity': 2} for i in (1, 2, 3)]
+    purchase_ids = client.post('/api/purchases', headers=admin_headers, json={'books': books}).get_json()['purchase_ids']
+    client.post(f'/api/purchases/{purchase_ids[0]}/cancel', headers=admin_headers)
+
+    pending = client.get('/api/purchases?status=pending&sort=-amount', headers=admin_headers).get_json()
+    assert [purchase['id'] for purchase in pending] == [purchase_ids[2], purchase_ids[1]]
+
+    cancelled = client.get('/api/purchases?status=cancelled', headers=admin_headers).get_json()
+    assert [purchase['id'] for purchase in cancelled] == [purchase_ids[0]]
+
+    assert client.get('/api/purchases?status=lost', headers=admin_headers).status_code == 400
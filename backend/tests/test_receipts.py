@@ -0,0 +1,41 @@
+import io
+import zipfile
+
+
+def test_receipt_is_cached_by_content(client, admin_headers, make_book):
+    book_id = make_book(retail_price=12.5)
+    sale_id = client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 2}).get_json()['id']
+
+    response = client.get(f'/api/receipts/sales/{sale_id}', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/html'
+    assert b'25.00' in response.data
+
+    # Same content, same hash: the client's copy is still current
+    again = client.get(f'/api/receipts/sales/{sale_id}',
+                       headers={**admin_headers, 'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_day_archive(client, admin_headers, make_book):
+    book_id = make_book()
+    sale_ids = [client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 1}).get_json()['id']
+                for _ in range(3)]
+
+    response = client.get('/api/receipts/sales', headers=admin_headers)
+    assert response.mimetype == 'application/zip'
+    names = zipfile.ZipFile(io.BytesIO(response.data)).namelist()
+    assert names == [f'receipt-{sale_id}.html' for sale_id in sale_ids]
+
+
+def test_pool_renders_batches():
+    from services.rendering import Renderer
+
+    renderer = Renderer(workers=2)
+    try:
+        documents = [{'store_name': 'Store', 'id': i, 'title': 'T', 'isbn': 'I', 'quantity': 1, 'unit_price': 1.0,
+                      'total_price': 1.0, 'created_at': '', 'clerk': ''} for i in range(4)]
+        rendered = renderer.render_many('receipt', documents)
+        assert [f'Receipt #{i}'.encode() in body for i, (body, _) in enumerate(rendered)] == [True] * 4
+    finally:
+        renderer.shutdown()
@@ -0,0 +1,14 @@
+def test_low_stock_reads_current_stock(app, client, admin_headers, make_book):
+    from sqlalchemy import update
+    from models.models import db, Book
+    low = make_book('978-0000000001', stock_quantity=2)
+    make_book('978-0000000002', stock_quantity=50)
+
+    books = client.get('/api/books/low-stock', headers=admin_headers).get_json()
+    assert [book['id'] for book in books] == [low]
+
+    # Restocked by another worker: no in-process notification reaches this one
+    with app.app_context():
+        db.session.execute(update(Book).where(Book.id == low).values(stock_quantity=40))
+        db.session.commit()
+    assert client.get('/api/books/low-stock', headers=admin_headers).get_json() == []
@@ -0,0 +1,40 @@
+from conftest import login
+
+
+def _create_clerk(client, admin_headers, username='clerk'):
+    response = client.post('/api/users', headers=admin_headers, json={
+        'username': username, 'password': 'pw', 'real_name': 'Clerk', 'employee_id': f'E-{username}',
+        'gender': 'F', 'age': 30
+    })
+    return response.get_json()['id']
+
+
+def test_logout_revokes_only_that_token(client, admin_headers):
+    _create_clerk(client, admin_headers)
+    first, second = login(client, 'clerk', 'pw'), login(client, 'clerk', 'pw')
+
+    assert client.post('/api/auth/logout', headers=first).status_code == 200
+    assert client.get('/api/auth/me', headers=first).status_code == 401
+    assert client.get('/api/auth/me', headers=second).status_code == 200
+
+
+def test_delete_user_revokes_issued_tokens(client, admin_headers):
+    user_id = _create_clerk(client, admin_headers)
+    headers = login(client, 'clerk', 'pw')
+
+    assert client.delete(f'/api/users/{user_id}', headers=admin_headers).status_code == 200
+    assert client.get('/api/books', headers=headers).status_code == 401
+
+
+def test_other_workers_pick_up_revocations(app, client, admin_headers):
+    import jwt
+    from services.revocation import RevocationList
+
+    _create_clerk(client, admin_headers)
+    headers = login(client, 'clerk', 'pw')
+    client.post('/api/auth/logout', headers=headers)
+    claims = jwt.decode(headers['Authorization'][len('Bearer '):], options={'verify_signature': False})
+
+    # A fresh list stands in for another process: it only knows what is in the table
+    with app.app_context():
+        assert RevocationList().is_revoked(claims)
@@ -0,0 +1,50 @@
+def test_sales_bump_counters_and_popularity_sort(app, client, admin_headers, make_book):
+    slow = make_book('978-0000000001', retail_price=10.0)
+    fast = make_book('978-0000000002', retail_price=5.0)
+    client.post('/api/sales', headers=admin_headers, json={'book_id': slow, 'quantity': 1})
+    client.post('/api/sales', headers=admin_headers, json={'book_id': fast, 'quantity': 3})
+
+    book = client.get(f'/api/books/{fast}', headers=admin_headers).get_json()
+    assert book['units_sold'] == 3 and book['revenue'] == 15.0 and book['last_sold_at']
+    # Neither the stock nor the counters update bumps the version
+    assert book['version'] == 1
+
+    books = client.get('/api/books?sort=popularity', headers=admin_headers).get_json()
+    assert [book['id'] for book in books] == [fast, slow]
+    assert client.get('/api/books?sort=units', headers=admin_headers).status_code == 400
+
+
+def test_repair_recomputes_counters(app, client, admin_headers, make_book):
+    from models.models import db, Book
+    book_id = make_book(retail_price=10.0)
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 2})
+    with app.app_context():
+        db.session.get(Book, book_id).units_sold = 99
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['books', 'repair-counters', '--chunk-size', '1'])
+    assert 'recomputed for 1 books' in result.output
+    book = client.get(f'/api/books/{book_id}', headers=admin_headers).get_json()
+    assert book['units_sold'] == 2 and book['revenue'] == 20.0
+
+
+def test_book_detail_serves_counters_from_the_catalog(app, client, admin_headers, make_book):
+    from sqlalchemy import event
+    from models.models import db
+    book_id = make_book(retail_price=10.0)
+    client.get(f'/api/books/{book_id}', headers=admin_headers)
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 2})
+    # The sale invalidated the entry: one reload, then no more reads of books
+    assert client.get(f'/api/books/{book_id}', headers=admin_headers).get_json()['units_sold'] == 2
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        book = client.get(f'/api/books/{book_id}', headers=admin_headers).get_json()
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert book['units_sold'] == 2 and book['revenue'] == 20.0
+    assert not [statement for statement in statements if 'FROM books' in statement]
@@ -0,0 +1,55 @@
+def _queued(client_id, book_id, quantity=1):
+    return {'client_id': client_id, 'created_at': '2024-01-01T10:00:00Z',
+            'items': [{'book_id': book_id, 'quantity': quantity}]}
+
+
+def test_sync_replay_is_not_applied_twice(client, admin_headers, make_book):
+    book_id = make_book(stock_quantity=5)
+    first = client.post('/api/sales/sync', headers=admin_headers, json={'sales': [_queued('till-1', book_id)]}).get_json()
+    assert first['results'][0]['status'] == 'created'
+
+    replay = client.post('/api/sales/sync', headers=admin_headers,
+                         json={'sales': [_queued('till-1', book_id), _queued('till-2', book_id, 9)]}).get_json()
+    assert [result['status'] for result in replay['results']] == ['duplicate', 'conflict']
+    assert replay['results'][0]['sale_ids'] == first['results'][0]['sale_ids']
+    assert client.get(f'/api/books/{book_id}', headers=admin_headers).get_json()['stock_quantity'] == 4
+
+
+def test_online_sale_then_sync_of_same_client_id(client, admin_headers, make_book):
+    book_id = make_book(stock_quantity=5)
+    other_id = make_book('978-0000000002', stock_quantity=5)
+    items = [{'book_id': book_id, 'quantity': 1}, {'book_id': other_id, 'quantity': 2}]
+    created = client.post('/api/sales', headers=admin_headers, json={'client_id': 'till-1', 'items': items})
+    assert created.status_code == 201
+
+    synced = client.post('/api/sales/sync', headers=admin_headers, json={'sales': [
+        {'client_id': 'till-1', 'items': items}]}).get_json()
+    assert synced['results'][0]['status'] == 'duplicate'
+    assert synced['results'][0]['sale_ids'] == created.get_json()['sale_ids']
+
+
+def test_create_sale_rejects_duplicate_books_and_bad_client_ids(client, admin_headers, make_book):
+    book_id = make_book(stock_quantity=5)
+    items = [{'book_id': book_id, 'quantity': 1}, {'book_id': book_id, 'quantity': 1}]
+    response = client.post('/api/sales', headers=admin_headers, json={'client_id': 'till-1', 'items': items})
+    assert response.status_code == 400 and 'twice' in response.get_json()['message']
+
+    for client_id in (12, 'x' * 65, ''):
+        response = client.post('/api/sales', headers=admin_headers,
+                               json={'client_id': client_id, 'items': [{'book_id': book_id, 'quantity': 1}]})
+        assert response.status_code == 400
+    assert client.get(f'/api/books/{book_id}', headers=admin_headers).get_json()['stock_quantity'] == 5
+
+
+def test_sync_finds_archived_client_ids(app, client, admin_headers, make_book):
+    from datetime import datetime
+    from models.models import BookSale, BookSaleArchive
+    from services.archive import archive_rows
+    book_id = make_book(stock_quantity=5)
+    first = client.post('/api/sales/sync', headers=admin_headers, json={'sales': [_queued('till-1', book_id)]}).get_json()
+    with app.app_context():
+        assert archive_rows(BookSale, BookSaleArchive, datetime.utcnow(), 100) == 1
+
+    replay = client.post('/api/sales/sync', headers=admin_headers, json={'sales': [_queued('till-1', book_id)]}).get_json()
+    assert replay['results'][0]['status'] == 'duplicate'
+    assert replay['results'][0]['sale_ids'] == first['results'][0]['sale_ids']
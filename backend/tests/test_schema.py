@@ -0,0 +1,36 @@
+from sqlalchemy import inspect, text
+
+
+def test_upgrade_adds_new_columns_and_indexes(app):
+    from models.models import db
+    from services.schema import upgrade
+    with app.app_context():
+        tables = db.metadata.sorted_tables
+        assert upgrade(db.engine, tables) == ([], [])
+
+        # books and book_sales as an earlier release created them
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP TABLE books'))
+            connection.execute(text('DROP TABLE book_sales'))
+            connection.execute(text(
+                'CREATE TABLE books (id INTEGER PRIMARY KEY, isbn VARCHAR(20) NOT NULL UNIQUE, title VARCHAR(200) NOT NULL, '
+                'author VARCHAR(100) NOT NULL, publisher VARCHAR(100) NOT NULL, retail_price FLOAT NOT NULL, '
+                'stock_quantity INTEGER NOT NULL, created_at DATETIME, updated_at DATETIME)'))
+            connection.execute(text(
+                'CREATE TABLE book_sales (id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL, quantity INTEGER NOT NULL, '
+                'unit_price FLOAT NOT NULL, total_price FLOAT NOT NULL, user_id INTEGER NOT NULL, created_at DATETIME)'))
+            connection.execute(text("INSERT INTO books VALUES (1, '978-1', 'T', 'A', 'P', 9.5, 3, NULL, NULL)"))
+
+        statements, warnings = upgrade(db.engine, tables)
+        assert not warnings
+        assert any('ADD COLUMN client_id' in statement for statement in statements)
+        assert any('uq_book_sales_client_id_book_id' in statement for statement in statements)
+
+        inspector = inspect(db.engine)
+        assert {'version', 'units_sold', 'revenue', 'last_sold_at'} <= {c['name'] for c in inspector.get_columns('books')}
+        assert 'ix_books_units_sold_id' in {index['name'] for index in inspector.get_indexes('books')}
+        with db.engine.connect() as connection:
+            assert connection.execute(text('SELECT version, units_sold FROM books')).one() == (1, 0)
+
+        # Nothing left to do the second time
+        assert upgrade(db.engine, tables) == ([], [])
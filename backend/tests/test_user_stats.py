@@ -0,0 +1,47 @@
+from conftest import login
+
+
+def _make_clerk(client, headers, username='clerk'):
+    response = client.post('/api/users', headers=headers, json={
+        'username': username, 'password': 'secret123', 'real_name': 'Clerk', 'employee_id': f'E-{username}',
+        'gender': 'F', 'age': 30})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['id']
+
+
+def test_stats_group_sales_and_purchases_per_user(client, admin_headers, make_book):
+    book_id = make_book(retail_price=10.0)
+    clerk_id = _make_clerk(client, admin_headers)
+    clerk_headers = login(client, 'clerk', 'secret123')
+    client.post('/api/sales', headers=clerk_headers, json={'book_id': book_id, 'quantity': 2})
+    client.post('/api/sales', headers=clerk_headers, json={'book_id': book_id, 'quantity': 1})
+    client.post('/api/purchases', headers=admin_headers,
+                json={'books': [{'book_id': book_id, 'purchase_price': 4.0, 'quantity': 5}]})
+
+    stats = {user['user_id']: user for user in client.get('/api/users/stats', headers=admin_headers).get_json()}
+    assert stats[clerk_id]['sales_count'] == 2 and stats[clerk_id]['units_sold'] == 3
+    assert stats[clerk_id]['revenue'] == 30.0 and stats[clerk_id]['last_activity_at']
+    admin = next(user for user in stats.values() if user['username'] == 'admin')
+    assert admin['sales_count'] == 0 and admin['purchase_count'] == 1 and admin['purchase_amount'] == 20.0
+
+    # A clerk only gets their own row
+    own = client.get('/api/users/stats', headers=clerk_headers).get_json()
+    assert [user['user_id'] for user in own] == [clerk_id]
+    assert client.get(f'/api/users/stats?user_id={admin["user_id"]}', headers=clerk_headers).status_code == 403
+    assert client.get('/api/users/stats?start_date=soon', headers=admin_headers).status_code == 400
+
+
+def test_stats_accept_utc_dates_with_an_archive(app, client, admin_headers, make_book):
+    from datetime import datetime, timedelta
+    from models.models import BookSale, BookSaleArchive
+    from services.archive import archive_rows
+    book_id = make_book(retail_price=10.0)
+    client.post('/api/sales', headers=admin_headers, json={'book_id': book_id, 'quantity': 2})
+    with app.app_context():
+        archive_rows(BookSale, BookSaleArchive, datetime.utcnow() + timedelta(seconds=1), 100)
+
+    start_date = (datetime.utcnow() - timedelta(days=1)).isoformat() + 'Z'
+    response = client.get(f'/api/users/stats?start_date={start_date}', headers=admin_headers)
+    assert response.status_code == 200
+    admin, = [user for user in response.get_json() if user['username'] == 'admin']
+    assert admin['units_sold'] == 2
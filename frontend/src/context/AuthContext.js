@@ -97,6 +97,14 @@ export const AuthProvider = ({ children }) => {
   };
 
   const handleLogout = () => {
+    // Revoke the token on the server; the header is set here because the
+    // token is removed from localStorage before the request goes out
+    const token = localStorage.getItem('token');
+    if (token) {
+      api.post('/api/auth/logout', null, { headers: { Authorization: `Bearer ${token}` } })
+        .catch(error => console.error('Logout error:', error));
+    }
+    
     // Remove token from localStorage
     localStorage.removeItem('token');
     
@@ -26,7 +26,7 @@ import { useNavigate } from 'react-router-dom';
 import { Formik, Form, Field } from 'formik';
 import * as Yup from 'yup';
 import { createPurchase } from '../services/purchaseService';
-import { searchBooks } from '../services/bookService';
+import { typeaheadBooks } from '../services/bookService';
 import LoadingSpinner from '../components/common/LoadingSpinner';
 import PageHeader from '../components/common/PageHeader';
 import { formatCurrency } from '../utils/formatters';
@@ -76,7 +76,7 @@ const AddPurchase = () => {
     setSearchResult(null);
     
     try {
-      const response = await searchBooks(searchTerm);
+      const response = await typeaheadBooks(searchTerm);
       if (response && response.length > 0) {
         // We found an existing book, pre-fill form
         const book = response[0];
@@ -27,11 +27,16 @@ import {
   Search as SearchIcon,
   Add as AddIcon,
   Delete as DeleteIcon,
-  ShoppingCart as ShoppingCartIcon
+  ShoppingCart as ShoppingCartIcon,
+  CloudOff as CloudOffIcon
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
-import { getBooks, searchBooks } from '../services/bookService';
-import { createSale } from '../services/saleService';
+import { getBooks, typeaheadBooks } from '../services/bookService';
+import { createSale, syncQueuedSales } from '../services/saleService';
+import {
+  queueSale, getQueuedSales, saveCatalog, loadCatalog, isOfflineError,
+  getSalesNeedingAttention, requeueSale, discardSale
+} from '../services/offlineSales';
 import PageHeader from '../components/common/PageHeader';
 import LoadingSpinner from '../components/common/LoadingSpinner';
 import StatusChip from '../components/common/StatusChip';
@@ -50,6 +55,9 @@ const AddSale = () => {
   const [quantity, setQuantity] = useState(1);
   const [quantityError, setQuantityError] = useState('');
   const [confirmDialogOpen, setConfirmDialogOpen] = useState(false);
+  const [queuedCount, setQueuedCount] = useState(0);
+  const [offlineMessage, setOfflineMessage] = useState('');
+  const [syncFailures, setSyncFailures] = useState([]);
   
   const navigate = useNavigate();
 
@@ -58,6 +66,49 @@ const AddSale = () => {
     fetchBooks();
   }, []);
 
+  // Send sales queued while offline now and whenever the connection comes back
+  useEffect(() => {
+    syncQueue();
+    window.addEventListener('online', syncQueue);
+    return () => window.removeEventListener('online', syncQueue);
+  }, []);
+
+  const syncQueue = async () => {
+    try {
+      const { created } = await syncQueuedSales();
+      if (created > 0) {
+        setOfflineMessage(`${created} offline sale(s) synced.`);
+      }
+    } catch (error) {
+      // Still offline, the queue is kept for the next attempt
+      console.error('Error syncing offline sales:', error);
+    }
+    try {
+      // Refused sales stay stored until a clerk retries or discards them
+      setSyncFailures(await getSalesNeedingAttention());
+    } catch (error) {
+      console.error('Error reading offline sales:', error);
+    }
+    try {
+      setQueuedCount((await getQueuedSales()).length);
+    } catch (error) {
+      console.error('Error reading offline sales:', error);
+    }
+  };
+
+  const handleRetryFailure = async (failure) => {
+    await requeueSale(failure);
+    await syncQueue();
+  };
+
+  const handleDiscardFailure = async (failure) => {
+    if (!window.confirm('Discard this offline sale? It will not be recorded.')) {
+      return;
+    }
+    await discardSale(failure.client_id);
+    setSyncFailures(await getSalesNeedingAttention());
+  };
+
   // Calculate total amount when cart items change
   useEffect(() => {
     const total = cartItems.reduce((sum, item) => sum + (item.quantity * item.book.retail_price), 0);
@@ -71,9 +122,17 @@ const AddSale = () => {
       // Filter out books with zero stock
       const availableBooks = Array.isArray(response) ? response.filter(book => book.stock_quantity > 0) : [];
       setBooks(availableBooks);
+      saveCatalog(availableBooks).catch(error => console.error('Error saving offline catalog:', error));
     } catch (error) {
       console.error('Error fetching books:', error);
-      setError('Failed to fetch available books. Please try again.');
+      if (isOfflineError(error)) {
+        // Sell from the last book list seen online
+        const cachedBooks = await loadCatalog().catch(() => []);
+        setBooks(cachedBooks.filter(book => book.stock_quantity > 0));
+        setOfflineMessage('Offline: showing the last known book list. Sales will be queued.');
+      } else {
+        setError('Failed to fetch available books. Please try again.');
+      }
     } finally {
       setIsLoading(false);
     }
@@ -89,13 +148,20 @@ const AddSale = () => {
     setError('');
     
     try {
-      const response = await searchBooks(searchTerm);
+      const response = await typeaheadBooks(searchTerm);
       // Filter out books with zero stock
       const availableBooks = Array.isArray(response) ? response.filter(book => book.stock_quantity > 0) : [];
       setSearchResults(availableBooks);
     } catch (error) {
       console.error('Error searching books:', error);
-      setError('Error searching books. Please try again.');
+      if (isOfflineError(error)) {
+        const term = searchTerm.trim().toLowerCase();
+        setSearchResults(books.filter(book =>
+          [book.isbn, book.title, book.author].some(field => field && field.toLowerCase().includes(term))
+        ));
+      } else {
+        setError('Error searching books. Please try again.');
+      }
     } finally {
       setIsSearching(false);
     }
@@ -164,29 +230,55 @@ const AddSale = () => {
     setIsLoading(true);
     setError('');
     
-    try {
-      // Format data for API
-      const saleItems = cartItems.map(item => ({
+    // Format data for API; the client id lets the server drop a replayed sale
+    const sale = {
+      client_id: window.crypto.randomUUID(),
+      created_at: new Date().toISOString(),
+      items: cartItems.map(item => ({
         book_id: item.book.id,
         quantity: item.quantity,
         unit_price: item.book.retail_price
-      }));
-      
-      await createSale({ items: saleItems });
+      }))
+    };
+    
+    try {
+      await createSale({ client_id: sale.client_id, items: sale.items });
       setConfirmDialogOpen(false);
       navigate('/sales');
     } catch (error) {
       console.error('Error creating sale:', error);
-      setError(
-        error.response?.data?.message || 
-        'Failed to complete sale. Please try again.'
-      );
+      if (isOfflineError(error)) {
+        await queueOfflineSale(sale);
+      } else {
+        setError(
+          error.response?.data?.message || 
+          'Failed to complete sale. Please try again.'
+        );
+      }
       setConfirmDialogOpen(false);
     } finally {
       setIsLoading(false);
     }
   };
 
+  const queueOfflineSale = async (sale) => {
+    try {
+      await queueSale(sale);
+    } catch (error) {
+      console.error('Error queueing offline sale:', error);
+      setError('Offline and unable to save the sale locally. Please try again.');
+      return;
+    }
+    // Take the sold copies off the local stock so the till does not oversell
+    const sold = Object.fromEntries(sale.items.map(item => [item.book_id, item.quantity]));
+    setBooks(books
+      .map(book => sold[book.id] ? { ...book, stock_quantity: book.stock_quantity - sold[book.id] } : book)
+      .filter(book => book.stock_quantity > 0));
+    setCartItems([]);
+    setQueuedCount(count => count + 1);
+    setOfflineMessage('Offline: sale saved on this device and will be synced when the connection is back.');
+  };
+
   const handleCancel = () => {
     navigate('/sales');
   };
@@ -216,6 +308,26 @@ const AddSale = () => {
               </Alert>
             )}
             
+            {offlineMessage && (
+              <Alert severity="info" icon={<CloudOffIcon />} sx={{ mb: 2 }} onClose={() => setOfflineMessage('')}>
+                {offlineMessage}
+                {queuedCount > 0 && ` ${queuedCount} sale(s) waiting to sync.`}
+              </Alert>
+            )}
+            
+            {syncFailures.length > 0 && (
+              <Alert severity="warning" sx={{ mb: 2 }}>
+                {syncFailures.length} offline sale(s) could not be applied:
+                {syncFailures.map(failure => (
+                  <Box key={failure.client_id} sx={{ display: 'flex', alignItems: 'center' }}>
+                    <Typography variant="body2" sx={{ flexGrow: 1 }}>{failure.result?.message}</Typography>
+                    <Button size="small" onClick={() => handleRetryFailure(failure)}>Retry</Button>
+                    <Button size="small" color="error" onClick={() => handleDiscardFailure(failure)}>Discard</Button>
+                  </Box>
+                ))}
+              </Alert>
+            )}
+            
             {/* Search Input */}
             <TextField
               fullWidth
@@ -79,11 +79,18 @@ const BookDetail = () => {
     setIsSubmitting(true);
     
     try {
-      await updateBook(id, values);
-      setBook({ ...book, ...values });
+      const response = await updateBook(id, values, book.version);
+      setBook({ ...book, ...values, version: response.version });
       setIsEditing(false);
     } catch (error) {
       console.error('Error updating book:', error);
+      if (error.response?.status === 412) {
+        // Someone else changed the book since it was loaded: show their version
+        await fetchBookDetails();
+        setIsEditing(true);
+        setSubmitError('This book was changed by someone else. Review the current values and save again.');
+        return;
+      }
       setSubmitError(
         error.response?.data?.message || 
         'Failed to update book. Please try again.'
@@ -374,6 +381,15 @@ const BookDetail = () => {
                 <Typography variant="h6">
                   {formatCurrency(book.stock_quantity * book.retail_price)}
                 </Typography>
+                
+                <Divider sx={{ my: 2 }} />
+                
+                <Typography variant="body2" color="text.secondary" gutterBottom>
+                  Units Sold
+                </Typography>
+                <Typography variant="h6">
+                  {book.units_sold || 0} ({formatCurrency(book.revenue || 0)})
+                </Typography>
               </CardContent>
             </Card>
           </Grid>
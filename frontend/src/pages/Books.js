@@ -28,6 +28,7 @@ import PageHeader from '../components/common/PageHeader';
 import LoadingSpinner from '../components/common/LoadingSpinner';
 import StatusChip from '../components/common/StatusChip';
 import { getBooks, searchBooks } from '../services/bookService';
+import { subscribeToEvents } from '../services/eventService';
 import { formatCurrency, getStockStatus } from '../utils/formatters';
 
 const Books = () => {
@@ -49,6 +50,18 @@ const Books = () => {
     fetchBooks();
   }, [page, rowsPerPage]);
 
+  // Apply live stock changes to the rows already on screen instead of polling
+  useEffect(() => {
+    return subscribeToEvents({
+      stock: (event) => {
+        setBooks(prevBooks => prevBooks.map(book => (
+          book.id === event.book_id ? { ...book, stock_quantity: event.stock_quantity } : book
+        )));
+      },
+      reset: () => fetchBooks()
+    });
+  }, []);
+
   const fetchBooks = async () => {
     setIsLoading(true);
     try {
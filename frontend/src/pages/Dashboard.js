@@ -19,7 +19,7 @@ import {
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { getBooks } from '../services/bookService';
+import { getBooks, getLowStockBooks } from '../services/bookService';
 import { getPurchases } from '../services/purchaseService';
 import { getSales } from '../services/saleService';
 import { getFinanceSummary } from '../services/financeService';
@@ -107,26 +107,26 @@ const Dashboard = () => {
       try {
         // Fetch all required data
         const booksResponse = await getBooks();
-        const purchasesResponse = await getPurchases();
-        const salesResponse = await getSales();
+        const lowStockResponse = await getLowStockBooks();
+        // Pending purchases and this month's sales are filtered server-side
+        const currentDate = new Date();
+        const monthStart = new Date(currentDate.getFullYear(), currentDate.getMonth(), 1);
+        const purchasesResponse = await getPurchases({ status: 'pending' });
+        const salesResponse = await getSales({ start_date: monthStart.toISOString() });
         const financeSummaryResponse = await getFinanceSummary();
 
         // Process books data
         const books = Array.isArray(booksResponse) ? booksResponse : [];
-        const lowStockBooks = books.filter(book => book.stock_quantity < 5).length;
+        // Low stock is decided server-side from each book's reorder point
+        const lowStockBooks = Array.isArray(lowStockResponse) ? lowStockResponse.length : 0;
 
         // Process purchases data
         const purchases = Array.isArray(purchasesResponse) ? purchasesResponse : [];
-        const pendingPurchases = purchases.filter(purchase => purchase.status === 'pending').length;
+        const pendingPurchases = purchases.length;
 
         // Process sales data
         const sales = Array.isArray(salesResponse) ? salesResponse : [];
-        const monthlySales = sales.filter(sale => {
-          const saleDate = new Date(sale.created_at);
-          const currentDate = new Date();
-          return saleDate.getMonth() === currentDate.getMonth() &&
-                 saleDate.getFullYear() === currentDate.getFullYear();
-        }).length;
+        const monthlySales = sales.length;
 
         // Set summary data
         setStats({
@@ -31,7 +31,7 @@ import {
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
 import { getPurchases, markAsPaid, cancelPurchase, addToInventory } from '../services/purchaseService';
-import { getBooks } from '../services/bookService';
+import { getBookByIsbn, getBooksByIsbn } from '../services/bookService';
 import PageHeader from '../components/common/PageHeader';
 import LoadingSpinner from '../components/common/LoadingSpinner';
 import ConfirmDialog from '../components/common/ConfirmDialog';
@@ -50,6 +50,7 @@ const Purchases = () => {
   const [retailPriceError, setRetailPriceError] = useState('');
   const [existingBook, setExistingBook] = useState(null);
   const [checkingInventory, setCheckingInventory] = useState(false);
+  const [inventoryBooks, setInventoryBooks] = useState({});
   
   const navigate = useNavigate();
 
@@ -60,8 +61,15 @@ const Purchases = () => {
   const fetchPurchases = async () => {
     setIsLoading(true);
     try {
-      const response = await getPurchases();
-      setPurchases(Array.isArray(response) ? response : []);
+      const response = await getPurchases({ sort: '-created_at' });
+      const allPurchases = Array.isArray(response) ? response : [];
+      setPurchases(allPurchases);
+      
+      // Annotate open purchases with the book already in inventory, one request for all of them
+      const openIsbns = [...new Set(allPurchases
+        .filter(purchase => purchase.status === 'pending' || purchase.status === 'paid')
+        .map(purchase => purchase.isbn))];
+      setInventoryBooks(openIsbns.length > 0 ? await getBooksByIsbn(openIsbns) : {});
     } catch (error) {
       console.error('Error fetching purchases:', error);
       setError('Failed to fetch purchases. Please try again.');
@@ -91,13 +99,12 @@ const Purchases = () => {
     setCheckingInventory(true);
     
     try {
-      // Check if book already exists in inventory
-      const booksResponse = await getBooks({ isbn: purchase.isbn });
-      const matchingBooks = Array.isArray(booksResponse) ? booksResponse.filter(book => book.isbn === purchase.isbn) : [];
+      // Check if book already exists in inventory (exact ISBN lookup, fresh stock and price)
+      const book = await getBookByIsbn(purchase.isbn);
       
-      if (matchingBooks.length > 0) {
-        setExistingBook(matchingBooks[0]);
-        setRetailPrice(matchingBooks[0].retail_price.toString());
+      if (book) {
+        setExistingBook(book);
+        setRetailPrice(book.retail_price.toString());
       } else {
         setExistingBook(null);
         setRetailPrice('');
@@ -122,9 +129,9 @@ const Purchases = () => {
     setIsLoading(true);
     try {
       if (confirmDialogAction === 'pay') {
-        await markAsPaid(selectedPurchase.id);
+        await markAsPaid(selectedPurchase.id, selectedPurchase.version);
       } else if (confirmDialogAction === 'cancel') {
-        await cancelPurchase(selectedPurchase.id);
+        await cancelPurchase(selectedPurchase.id, selectedPurchase.version);
       }
       await fetchPurchases();
     } catch (error) {
@@ -149,7 +156,7 @@ const Purchases = () => {
     try {
       // Always send a retail price to the backend
       // If it's an existing book, the backend will use the existing price unless we specify otherwise
-      await addToInventory(selectedPurchase.id, parseFloat(retailPrice));
+      await addToInventory(selectedPurchase.id, parseFloat(retailPrice), selectedPurchase.version);
       await fetchPurchases();
       setAddToInventoryDialogOpen(false);
       setSelectedPurchase(null);
@@ -222,7 +229,14 @@ const Purchases = () => {
                   <TableRow key={purchase.id}>
                     <TableCell>{formatDate(purchase.created_at)}</TableCell>
                     <TableCell>{purchase.isbn}</TableCell>
-                    <TableCell>{purchase.title}</TableCell>
+                    <TableCell>
+                      {purchase.title}
+                      {inventoryBooks[purchase.isbn] && (
+                        <Typography variant="caption" color="text.secondary" display="block">
+                          In inventory: {inventoryBooks[purchase.isbn].stock_quantity} at {formatCurrency(inventoryBooks[purchase.isbn].retail_price)}
+                        </Typography>
+                      )}
+                    </TableCell>
                     <TableCell>{purchase.publisher}</TableCell>
                     <TableCell align="right">{formatCurrency(purchase.purchase_price)}</TableCell>
                     <TableCell align="right">{purchase.quantity}</TableCell>
@@ -11,14 +11,17 @@ import {
   Typography,
   Grid,
   Card,
-  CardContent
+  CardContent,
+  Button
 } from '@mui/material';
 import { 
   ShoppingCartCheckout as ShoppingCartCheckoutIcon,
-  PointOfSale as PointOfSaleIcon
+  PointOfSale as PointOfSaleIcon,
+  Print as PrintIcon
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
-import { getSales } from '../services/saleService';
+import { getSales, getSaleReceipt, getDayReceipts } from '../services/saleService';
+import { subscribeToEvents } from '../services/eventService';
 import PageHeader from '../components/common/PageHeader';
 import LoadingSpinner from '../components/common/LoadingSpinner';
 import { formatCurrency, formatDate } from '../utils/formatters';
@@ -39,10 +42,27 @@ const Sales = () => {
     fetchSales();
   }, []);
 
+  // Prepend new sales as they are pushed by the server
+  useEffect(() => {
+    return subscribeToEvents({
+      sale: (sale) => {
+        setSales(prevSales => (
+          prevSales.some(existing => existing.id === sale.id) ? prevSales : [sale, ...prevSales]
+        ));
+        setSummary(prevSummary => ({
+          totalSales: prevSummary.totalSales + 1,
+          totalAmount: prevSummary.totalAmount + sale.total_price,
+          totalBooks: prevSummary.totalBooks + sale.quantity
+        }));
+      },
+      reset: () => fetchSales()
+    });
+  }, []);
+
   const fetchSales = async () => {
     setIsLoading(true);
     try {
-      const response = await getSales();
+      const response = await getSales({ sort: '-created_at' });
       
       const allSales = Array.isArray(response) ? response : [];
       setSales(allSales);
@@ -69,6 +89,39 @@ const Sales = () => {
     }
   };
 
+  // Open a blob returned by the receipt endpoints, or download it under filename
+  const openBlob = (blob, filename) => {
+    const url = URL.createObjectURL(blob);
+    if (filename) {
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = filename;
+      link.click();
+    } else {
+      window.open(url, '_blank');
+    }
+    setTimeout(() => URL.revokeObjectURL(url), 60000);
+  };
+
+  const handlePrintReceipt = async (saleId) => {
+    try {
+      openBlob(await getSaleReceipt(saleId));
+    } catch (error) {
+      console.error('Error printing receipt:', error);
+      setError('Failed to render the receipt. Please try again.');
+    }
+  };
+
+  const handleReprintDay = async () => {
+    try {
+      const today = new Date().toISOString().slice(0, 10);
+      openBlob(await getDayReceipts(today), `receipts-${today}.zip`);
+    } catch (error) {
+      console.error('Error reprinting receipts:', error);
+      setError('Failed to render the receipts. Please try again.');
+    }
+  };
+
   const handleAddSale = () => {
     navigate('/sales/add');
   };
@@ -130,6 +183,12 @@ const Sales = () => {
         </Grid>
       </Grid>
 
+      <Box sx={{ display: 'flex', justifyContent: 'flex-end', mb: 2 }}>
+        <Button variant="outlined" startIcon={<PrintIcon />} onClick={handleReprintDay}>
+          Reprint Today's Receipts
+        </Button>
+      </Box>
+
       {error ? (
         <Typography color="error" sx={{ mt: 2 }}>
           {error}
@@ -146,12 +205,13 @@ const Sales = () => {
                 <TableCell align="right">Quantity</TableCell>
                 <TableCell align="right">Total</TableCell>
                 <TableCell>Sold By</TableCell>
+                <TableCell align="center">Receipt</TableCell>
               </TableRow>
             </TableHead>
             <TableBody>
               {sales.length === 0 ? (
                 <TableRow>
-                  <TableCell colSpan={7} align="center">
+                  <TableCell colSpan={8} align="center">
                     No sales records found
                   </TableCell>
                 </TableRow>
@@ -165,6 +225,11 @@ const Sales = () => {
                     <TableCell align="right">{sale.quantity}</TableCell>
                     <TableCell align="right">{formatCurrency(sale.total_price)}</TableCell>
                     <TableCell>{sale.user?.username || 'Unknown'}</TableCell>
+                    <TableCell align="center">
+                      <Button size="small" startIcon={<PrintIcon />} onClick={() => handlePrintReceipt(sale.id)}>
+                        Print
+                      </Button>
+                    </TableCell>
                   </TableRow>
                 ))
               )}
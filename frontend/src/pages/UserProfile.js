@@ -18,7 +18,8 @@ import {
 import { Formik, Form, Field } from 'formik';
 import * as Yup from 'yup';
 import { useAuth } from '../context/AuthContext';
-import { updateProfile, changePassword, getUser } from '../services/userService';
+import { updateProfile, changePassword, getUser, getUserStats } from '../services/userService';
+import { formatCurrency, formatDate } from '../utils/formatters';
 import PageHeader from '../components/common/PageHeader';
 import LoadingSpinner from '../components/common/LoadingSpinner';
 
@@ -59,11 +60,15 @@ const UserProfile = () => {
   const [submitSuccess, setSubmitSuccess] = useState('');
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
+  const [stats, setStats] = useState(null);
 
   // Fetch complete user details when component mounts
   useEffect(() => {
     if (user && user.id) {
       fetchUserDetails();
+      getUserStats({ user_id: user.id })
+        .then(response => setStats(response?.[0] || null))
+        .catch(error => console.error('Error fetching user stats:', error));
     }
   }, [user?.id]);
 
@@ -142,6 +147,29 @@ const UserProfile = () => {
         showButton={false}
       />
 
+      {stats && (
+        <Paper sx={{ p: 2, mb: 3 }}>
+          <Grid container spacing={2}>
+            <Grid item xs={6} md={3}>
+              <Typography variant="body2" color="text.secondary">Sales</Typography>
+              <Typography variant="h6">{stats.sales_count} ({stats.units_sold} books)</Typography>
+            </Grid>
+            <Grid item xs={6} md={3}>
+              <Typography variant="body2" color="text.secondary">Revenue</Typography>
+              <Typography variant="h6">{formatCurrency(stats.revenue)}</Typography>
+            </Grid>
+            <Grid item xs={6} md={3}>
+              <Typography variant="body2" color="text.secondary">Purchase Orders</Typography>
+              <Typography variant="h6">{stats.purchase_count} ({formatCurrency(stats.purchase_amount)})</Typography>
+            </Grid>
+            <Grid item xs={6} md={3}>
+              <Typography variant="body2" color="text.secondary">Last Active</Typography>
+              <Typography variant="h6">{stats.last_activity_at ? formatDate(stats.last_activity_at) : '-'}</Typography>
+            </Grid>
+          </Grid>
+        </Paper>
+      )}
+      
       <Paper sx={{ p: 3 }}>
         <Tabs 
           value={tabIndex} 
@@ -18,13 +18,14 @@ import {
   PersonAdd as PersonAddIcon
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
-import { getUsers } from '../services/userService';
+import { getUsers, getUserStats } from '../services/userService';
 import PageHeader from '../components/common/PageHeader';
 import LoadingSpinner from '../components/common/LoadingSpinner';
-import { formatDate } from '../utils/formatters';
+import { formatDate, formatCurrency } from '../utils/formatters';
 
 const Users = () => {
   const [users, setUsers] = useState([]);
+  const [stats, setStats] = useState({});
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState('');
   
@@ -37,8 +38,9 @@ const Users = () => {
   const fetchUsers = async () => {
     setIsLoading(true);
     try {
-      const response = await getUsers();
+      const [response, statsResponse] = await Promise.all([getUsers(), getUserStats()]);
       setUsers(Array.isArray(response) ? response : []);
+      setStats(Object.fromEntries((statsResponse || []).map(entry => [entry.user_id, entry])));
     } catch (error) {
       console.error('Error fetching users:', error);
       setError('Failed to fetch users. Please try again.');
@@ -94,13 +96,16 @@ const Users = () => {
                 <TableCell>Gender</TableCell>
                 <TableCell>Age</TableCell>
                 <TableCell>Created</TableCell>
+                <TableCell align="right">Sales</TableCell>
+                <TableCell align="right">Revenue</TableCell>
+                <TableCell>Last Active</TableCell>
                 <TableCell align="center">Actions</TableCell>
               </TableRow>
             </TableHead>
             <TableBody>
               {users.length === 0 ? (
                 <TableRow>
-                  <TableCell colSpan={8} align="center">
+                  <TableCell colSpan={11} align="center">
                     No users found
                   </TableCell>
                 </TableRow>
@@ -128,6 +133,9 @@ const Users = () => {
                     <TableCell>{user.gender}</TableCell>
                     <TableCell>{user.age}</TableCell>
                     <TableCell>{formatDate(user.created_at)}</TableCell>
+                    <TableCell align="right">{stats[user.id]?.sales_count ?? 0}</TableCell>
+                    <TableCell align="right">{formatCurrency(stats[user.id]?.revenue ?? 0)}</TableCell>
+                    <TableCell>{stats[user.id]?.last_activity_at ? formatDate(stats[user.id].last_activity_at) : '-'}</TableCell>
                     <TableCell align="center">
                       <IconButton 
                         color="primary" 
@@ -0,0 +1,31 @@
+import api from './api';
+
+// Get best-selling books for a period (params: start_date, end_date, sort, limit)
+export const getTopBooks = async (params = {}) => {
+  try {
+    const response = await api.get('/api/analytics/top-books', { params });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
+// Get units sold per day and days of stock cover (params: days, book_id, limit)
+export const getSalesVelocity = async (params = {}) => {
+  try {
+    const response = await api.get('/api/analytics/sales-velocity', { params });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
+// Get revenue against landed purchase cost per book
+export const getMargin = async (params = {}) => {
+  try {
+    const response = await api.get('/api/analytics/margin', { params });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { decode } from '@msgpack/msgpack';
 
 const api = axios.create({
   baseURL: process.env.REACT_APP_API_URL || 'http://localhost:5000',
@@ -11,7 +12,16 @@ const api = axios.create({
 // Add a response interceptor for handling errors
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    // Throttled reads are retried once after the delay the server asks for
+    const { config, response } = error;
+    if (response && response.status === 429 && config && !config._rateLimitRetried
+        && config.method.toLowerCase() === 'get') {
+      config._rateLimitRetried = true;
+      const retryAfter = parseInt(response.headers['retry-after'], 10) || 1;
+      await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+      return api(config);
+    }
     console.error('API Error:', error);
     // Handle 401 Unauthorized errors (token expired)
     if (error.response && error.response.status === 401) {
@@ -56,4 +66,62 @@ api.interceptors.request.use(
   }
 );
 
+// POST with an Idempotency-Key so that retries after a network failure
+// replay the first result on the server instead of repeating the write
+export const postIdempotent = async (url, data, retries = 2, headers = {}) => {
+  const idempotencyKey = window.crypto.randomUUID();
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await api.post(url, data, { headers: { ...headers, 'Idempotency-Key': idempotencyKey } });
+    } catch (error) {
+      // Only retry when no response came back at all
+      if (error.response || attempt >= retries) {
+        throw error;
+      }
+      await new Promise(resolve => setTimeout(resolve, 500 * (attempt + 1)));
+    }
+  }
+};
+
+// If-Match header for a write based on the copy of a record read at this version;
+// the server answers 412 when the record changed since (omitted without a version)
+export const ifMatch = (version) => (version === undefined || version === null ? {} : { 'If-Match': `"${version}"` });
+
+// Expand a columnar listing ({columns, data: [column arrays]}) back into row objects
+export const expandColumnar = ({ columns, data, count }) => {
+  const rows = new Array(count);
+  for (let i = 0; i < count; i++) {
+    const row = {};
+    for (let c = 0; c < columns.length; c++) {
+      row[columns[c]] = data[c][i];
+    }
+    rows[i] = row;
+  }
+  return rows;
+};
+
+// Set once the server answers 406 to msgpack so later listings go straight to JSON
+let msgpackUnavailable = false;
+
+// GET a listing endpoint in its compact form: msgpack when the server has it,
+// columnar JSON otherwise. Resolves to the same array of objects either way.
+export const getListing = async (url, params = {}) => {
+  if (!msgpackUnavailable) {
+    try {
+      const response = await api.get(url, {
+        params: { ...params, format: 'msgpack' },
+        responseType: 'arraybuffer'
+      });
+      return expandColumnar(decode(new Uint8Array(response.data)));
+    } catch (error) {
+      if (!error.response || error.response.status !== 406) {
+        throw error;
+      }
+      msgpackUnavailable = true;
+    }
+  }
+  const response = await api.get(url, { params: { ...params, format: 'columnar' } });
+  return expandColumnar(response.data);
+};
+
 export default api; 
\ No newline at end of file
@@ -0,0 +1,12 @@
+import api from './api';
+
+// Get a page of audit log entries (super admin only)
+// params: page, per_page, entity, entity_id, user_id, action
+export const getAuditLogs = async (params = {}) => {
+  try {
+    const response = await api.get('/api/audit', { params });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
@@ -1,10 +1,9 @@
-import api from './api';
+import api, { getListing, ifMatch } from './api';
 
 // Get all books with optional search and filter params
 export const getBooks = async (params = {}) => {
   try {
-    const response = await api.get('/api/books', { params });
-    return response.data;
+    return await getListing('/api/books', params);
   } catch (error) {
     throw error;
   }
@@ -20,6 +19,39 @@ export const getBook = async (id) => {
   }
 };
 
+// Exact ISBN-10/ISBN-13 lookup; null when the book is not in inventory
+export const getBookByIsbn = async (isbn) => {
+  try {
+    const response = await api.get(`/api/books/by-isbn/${encodeURIComponent(isbn)}`);
+    return response.data;
+  } catch (error) {
+    if (error.response && error.response.status === 404) {
+      return null;
+    }
+    throw error;
+  }
+};
+
+// Resolve many ISBNs in one request: {isbn: book or null}
+export const getBooksByIsbn = async (isbns) => {
+  try {
+    const response = await api.post('/api/books/by-isbn', { isbns });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
+// Get books below their reorder point (computed from sales velocity)
+export const getLowStockBooks = async () => {
+  try {
+    const response = await api.get('/api/books/low-stock');
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
 // Add a new book
 export const addBook = async (bookData) => {
   try {
@@ -31,9 +63,9 @@ export const addBook = async (bookData) => {
 };
 
 // Update a book
-export const updateBook = async (id, bookData) => {
+export const updateBook = async (id, bookData, version) => {
   try {
-    const response = await api.put(`/api/books/${id}`, bookData);
+    const response = await api.put(`/api/books/${id}`, bookData, { headers: ifMatch(version) });
     return response.data;
   } catch (error) {
     throw error;
@@ -43,9 +75,18 @@ export const updateBook = async (id, bookData) => {
 // Search books by term (can be ISBN, title, author, publisher)
 export const searchBooks = async (searchTerm) => {
   try {
-    const response = await api.get('/api/books/search', { params: { q: searchTerm } });
+    return await getListing('/api/books/search', { q: searchTerm });
+  } catch (error) {
+    throw error;
+  }
+};
+
+// Type-ahead lookup served from the server's in-memory catalog
+export const typeaheadBooks = async (searchTerm, limit = 20) => {
+  try {
+    const response = await api.get('/api/books/typeahead', { params: { q: searchTerm, limit } });
     return response.data;
   } catch (error) {
     throw error;
   }
-}; 
\ No newline at end of file
+};
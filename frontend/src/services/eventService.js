@@ -0,0 +1,77 @@
+import api from './api';
+
+// Subscribe to live server events (stock, sale, reset).
+// Uses fetch streaming rather than EventSource so the JWT can travel in the
+// Authorization header. Reconnects with the last seen event id so that missed
+// events are replayed by the server. Returns an unsubscribe function.
+export const subscribeToEvents = (handlers = {}) => {
+  let lastEventId = null;
+  let controller = null;
+  let stopped = false;
+  let retryDelay = 1000;
+
+  const dispatch = (block) => {
+    let id = null;
+    let type = 'message';
+    const dataLines = [];
+    block.split('\n').forEach((line) => {
+      if (line.startsWith('id:')) id = line.slice(3).trim();
+      else if (line.startsWith('event:')) type = line.slice(6).trim();
+      else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+    });
+    if (id !== null) lastEventId = id;
+    if (dataLines.length === 0) return; // keep-alive comment
+    const handler = handlers[type];
+    if (handler) {
+      handler(JSON.parse(dataLines.join('\n')));
+    }
+  };
+
+  const connect = async () => {
+    controller = new AbortController();
+    const headers = { Accept: 'text/event-stream' };
+    const token = localStorage.getItem('token');
+    if (token) headers.Authorization = `Bearer ${token}`;
+    if (lastEventId !== null) headers['Last-Event-ID'] = lastEventId;
+
+    try {
+      const response = await fetch(`${api.defaults.baseURL}/api/events/stream`, {
+        headers,
+        credentials: 'include',
+        signal: controller.signal
+      });
+      if (!response.ok) throw new Error(`Event stream failed: ${response.status}`);
+      retryDelay = 1000;
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (!stopped) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary >= 0) {
+          dispatch(buffer.slice(0, boundary));
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf('\n\n');
+        }
+      }
+    } catch (error) {
+      if (stopped) return;
+      console.error('Event stream error:', error);
+    }
+
+    if (!stopped) {
+      setTimeout(connect, retryDelay);
+      retryDelay = Math.min(retryDelay * 2, 30000);
+    }
+  };
+
+  connect();
+
+  return () => {
+    stopped = true;
+    if (controller) controller.abort();
+  };
+};
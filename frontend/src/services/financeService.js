@@ -18,4 +18,13 @@ export const getFinanceSummary = async (params = {}) => {
   } catch (error) {
     throw error;
   }
-}; 
\ No newline at end of file
+}; 
+// End-of-day (Z) reports per day: closed days are frozen snapshots, today is live
+export const getDailyReports = async (params = {}) => {
+  try {
+    const response = await api.get('/api/reports/daily', { params });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
@@ -0,0 +1,100 @@
+// Local store for the till while the backend is unreachable: sales rung up offline
+// wait in IndexedDB until they can be sent to /api/sales/sync, and the last book
+// list is kept so books can still be picked offline. Sales the server refused
+// (conflict, invalid) are kept apart until a clerk retries or discards them.
+
+const DB_NAME = 'booksale-till';
+const DB_VERSION = 2;
+const QUEUE_STORE = 'queued_sales';
+const ATTENTION_STORE = 'sales_needing_attention';
+const CATALOG_STORE = 'catalog';
+
+let dbPromise = null;
+
+const openDb = () => {
+  if (!dbPromise) {
+    dbPromise = new Promise((resolve, reject) => {
+      const request = window.indexedDB.open(DB_NAME, DB_VERSION);
+      request.onupgradeneeded = () => {
+        const db = request.result;
+        if (!db.objectStoreNames.contains(QUEUE_STORE)) {
+          db.createObjectStore(QUEUE_STORE, { keyPath: 'client_id' });
+        }
+        if (!db.objectStoreNames.contains(ATTENTION_STORE)) {
+          db.createObjectStore(ATTENTION_STORE, { keyPath: 'client_id' });
+        }
+        if (!db.objectStoreNames.contains(CATALOG_STORE)) {
+          db.createObjectStore(CATALOG_STORE, { keyPath: 'id' });
+        }
+      };
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => {
+        dbPromise = null;
+        reject(request.error);
+      };
+    });
+  }
+  return dbPromise;
+};
+
+// Run fn(store) in one transaction; resolves with fn's result once the transaction commits.
+// With a list of store names fn gets the stores in the same order.
+const withStore = async (storeName, mode, fn) => {
+  const db = await openDb();
+  return new Promise((resolve, reject) => {
+    const transaction = db.transaction(storeName, mode);
+    const result = Array.isArray(storeName)
+      ? fn(...storeName.map(name => transaction.objectStore(name)))
+      : fn(transaction.objectStore(storeName));
+    transaction.oncomplete = () => resolve(result && 'result' in result ? result.result : result);
+    transaction.onerror = () => reject(transaction.error);
+    transaction.onabort = () => reject(transaction.error);
+  });
+};
+
+// True when a request failed without any answer from the server
+export const isOfflineError = (error) => !navigator.onLine || (error && !error.response);
+
+// Queue a sale ({client_id, created_at, items}) for the next sync
+export const queueSale = (sale) => withStore(QUEUE_STORE, 'readwrite', (store) => store.put(sale));
+
+// Queued sales, oldest first
+export const getQueuedSales = async () => {
+  const sales = await withStore(QUEUE_STORE, 'readonly', (store) => store.getAll());
+  return sales.sort((a, b) => a.created_at.localeCompare(b.created_at));
+};
+
+export const removeQueuedSales = (clientIds) => withStore(QUEUE_STORE, 'readwrite', (store) => {
+  clientIds.forEach((clientId) => store.delete(clientId));
+});
+
+// Move refused sales out of the queue, each with the server's result, in one transaction
+export const setAsideQueuedSales = (failures) => withStore([QUEUE_STORE, ATTENTION_STORE], 'readwrite', (queue, attention) => {
+  failures.forEach(({ sale, result }) => {
+    attention.put({ ...sale, result });
+    queue.delete(sale.client_id);
+  });
+});
+
+// Refused sales waiting for a clerk, oldest first
+export const getSalesNeedingAttention = async () => {
+  const sales = await withStore(ATTENTION_STORE, 'readonly', (store) => store.getAll());
+  return sales.sort((a, b) => a.created_at.localeCompare(b.created_at));
+};
+
+// Put a refused sale back in the queue (e.g. once the stock arrived), same client_id
+export const requeueSale = (sale) => withStore([QUEUE_STORE, ATTENTION_STORE], 'readwrite', (queue, attention) => {
+  const { result, ...queued } = sale;
+  queue.put(queued);
+  attention.delete(sale.client_id);
+});
+
+export const discardSale = (clientId) => withStore(ATTENTION_STORE, 'readwrite', (store) => store.delete(clientId));
+
+// Keep the latest book list for offline use
+export const saveCatalog = (books) => withStore(CATALOG_STORE, 'readwrite', (store) => {
+  store.clear();
+  books.forEach((book) => store.put(book));
+});
+
+export const loadCatalog = () => withStore(CATALOG_STORE, 'readonly', (store) => store.getAll());
@@ -1,4 +1,4 @@
-import api from './api';
+import api, { postIdempotent, ifMatch } from './api';
 
 // Get all purchases with optional filter params
 export const getPurchases = async (params = {}) => {
@@ -23,7 +23,7 @@ export const getPurchase = async (id) => {
 // Create a new purchase order
 export const createPurchase = async (purchaseData) => {
   try {
-    const response = await api.post('/api/purchases', purchaseData);
+    const response = await postIdempotent('/api/purchases', purchaseData);
     return response.data;
   } catch (error) {
     throw error;
@@ -31,9 +31,9 @@ export const createPurchase = async (purchaseData) => {
 };
 
 // Update purchase status to paid
-export const markAsPaid = async (id) => {
+export const markAsPaid = async (id, version) => {
   try {
-    const response = await api.post(`/api/purchases/${id}/pay`);
+    const response = await postIdempotent(`/api/purchases/${id}/pay`, undefined, 2, ifMatch(version));
     return response.data;
   } catch (error) {
     throw error;
@@ -41,9 +41,9 @@ export const markAsPaid = async (id) => {
 };
 
 // Update purchase status to cancelled (returned)
-export const cancelPurchase = async (id) => {
+export const cancelPurchase = async (id, version) => {
   try {
-    const response = await api.post(`/api/purchases/${id}/cancel`);
+    const response = await api.post(`/api/purchases/${id}/cancel`, undefined, { headers: ifMatch(version) });
     return response.data;
   } catch (error) {
     throw error;
@@ -51,11 +51,20 @@ export const cancelPurchase = async (id) => {
 };
 
 // Add purchased books to inventory
-export const addToInventory = async (id, retailPrice) => {
+export const addToInventory = async (id, retailPrice, version) => {
   try {
-    const response = await api.post(`/api/purchases/${id}/add-to-inventory`, { retail_price: retailPrice });
+    const response = await api.post(`/api/purchases/${id}/add-to-inventory`, { retail_price: retailPrice }, { headers: ifMatch(version) });
     return response.data;
   } catch (error) {
     throw error;
   }
-}; 
\ No newline at end of file
+}; 
+// Printable invoice of one purchase order (HTML)
+export const getPurchaseInvoice = async (id) => {
+  try {
+    const response = await api.get(`/api/receipts/purchases/${id}`, { responseType: 'blob' });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
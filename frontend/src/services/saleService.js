@@ -1,10 +1,10 @@
-import api from './api';
+import api, { getListing, postIdempotent } from './api';
+import { getQueuedSales, removeQueuedSales, setAsideQueuedSales } from './offlineSales';
 
 // Get all sales with optional filter params
 export const getSales = async (params = {}) => {
   try {
-    const response = await api.get('/api/sales', { params });
-    return response.data;
+    return await getListing('/api/sales', params);
   } catch (error) {
     throw error;
   }
@@ -20,12 +20,64 @@ export const getSale = async (id) => {
   }
 };
 
+// Printable receipt of one sale (HTML)
+export const getSaleReceipt = async (id) => {
+  try {
+    const response = await api.get(`/api/receipts/sales/${id}`, { responseType: 'blob' });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
+// Every receipt of a day (YYYY-MM-DD, default today) as one zip archive
+export const getDayReceipts = async (date) => {
+  try {
+    const response = await api.get('/api/receipts/sales', { params: date ? { date } : {}, responseType: 'blob' });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
 // Create a new sale
 export const createSale = async (saleData) => {
   try {
-    const response = await api.post('/api/sales', saleData);
+    const response = await postIdempotent('/api/sales', saleData);
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+}; 
+// Apply a batch of queued offline sales; every sale gets its own result
+export const syncSales = async (sales) => {
+  try {
+    const response = await api.post('/api/sales/sync', { sales });
     return response.data;
   } catch (error) {
     throw error;
   }
-}; 
\ No newline at end of file
+};
+
+// Send everything queued while offline, in batches. Created and duplicate sales
+// leave the queue; conflicts and invalid sales are set aside with their result
+// for a clerk to retry or discard; unanswered ones stay for the next attempt.
+// Resolves to {created, failed: [sales set aside in this run]}.
+export const syncQueuedSales = async (batchSize = 200) => {
+  const queued = await getQueuedSales();
+  let created = 0;
+  const failed = [];
+  for (let start = 0; start < queued.length; start += batchSize) {
+    const batch = queued.slice(start, start + batchSize);
+    const { results } = await syncSales(batch);
+    const sales = Object.fromEntries(batch.map(sale => [sale.client_id, sale]));
+    const refused = results.filter(result => result.status === 'conflict' || result.status === 'invalid');
+    await removeQueuedSales(results
+      .filter(result => result.status === 'created' || result.status === 'duplicate')
+      .map(result => result.client_id));
+    await setAsideQueuedSales(refused.map(result => ({ sale: sales[result.client_id], result })));
+    created += results.filter(result => result.status === 'created').length;
+    failed.push(...refused);
+  }
+  return { created, failed };
+};
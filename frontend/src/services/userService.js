@@ -10,6 +10,16 @@ export const getUsers = async () => {
   }
 };
 
+// Per-user sales and purchase totals; super admins get every user, others themselves
+export const getUserStats = async (params = {}) => {
+  try {
+    const response = await api.get('/api/users/stats', { params });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
 // Get a single user by ID
 export const getUser = async (id) => {
   try {